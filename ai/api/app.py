@@ -1,175 +1,1196 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
+from typing import List, Optional
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
 import numpy as np
-import joblib
+import asyncio
+import base64
+import functools
+import io
 import os
 import sys
+import tempfile
+import threading
+import time
 
 # Add scripts directory to path to import modules
 scripts_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
 sys.path.insert(0, scripts_dir)
-from text_normalizer import normalize_for_inference
-
-# Import SemanticClassifier from shared module so joblib can unpickle
-# This ensures the class is available in the correct module namespace
-from semantic_classifier import SemanticClassifier
-# Register it in sys.modules so joblib can find it
-import semantic_classifier
-sys.modules['semantic_classifier'] = semantic_classifier
-
-# Also register for old model format (if model was saved with train_model.SemanticClassifier)
-# We'll create an alias in train_model namespace
-import importlib.util
-train_model_path = os.path.join(scripts_dir, "train_model.py")
-if os.path.exists(train_model_path):
-    spec = importlib.util.spec_from_file_location("train_model", train_model_path)
-    train_model_module = importlib.util.module_from_spec(spec)
-    sys.modules["train_model"] = train_model_module
-    # Add SemanticClassifier to train_model namespace for backward compatibility
-    train_model_module.SemanticClassifier = SemanticClassifier
-
-app = FastAPI(title="Municipal AI Service")
-
-# Load embedding model
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-
-# Load category and priority models
+from text_normalizer import normalize_batch, normalize_for_inference
+from predictor import predict_normalized, run_inference_batch
+from bulk_classify import BULK_CHUNK_SIZE, BULK_FORMATS, BulkStats, iter_output, read_records
+from micro_batcher import MicroBatcher
+from inference_executor import REQUEST_DEADLINE_MS, DeadlineExceeded, InferenceExecutor, QueueFull, deadline_after
+from vector_index import ComplaintVectorIndex
+from duplicate_clusters import (
+    DUPLICATE_BLOCK_SIZE, DUPLICATE_THRESHOLD, ENCODE_CHUNK_SIZE, DuplicateClusterer, build_report,
+    distinct_texts, in_window,
+)
+from analytics_cube import ComplaintCountCube
+from complaint_snapshot import SNAPSHOT_DIR, is_snapshot, iter_snapshot_records
+from similarity_matrix import (
+    HIGHLY_SIMILAR_THRESHOLD, LEVELS, RELATED_THRESHOLD, cosine_matrix, level_codes, level_counts,
+    similarity_level, top_k_rows,
+)
+from encoder import get_encoder, encode_texts, get_embedding_cache
+# Loads slim head bundles and, for compatibility, legacy pickled bundles
+# (registers the module aliases those pickles need)
+from model_bundle import load_model_bundle
+from model_slots import ModelSlots, ReloadInProgress
+from lexical_cascade import load_lexical_head
+from shadow_eval import SHADOW_MODEL_DIR, SHADOW_TASKS, ShadowEvaluator
+from service_metrics import MODEL_LOAD_SECONDS, REGISTRY, STARTUP_PHASE_SECONDS, MetricsMiddleware, stage_timer
+from sampling_profiler import PROFILE_INTERVAL_MS, SamplingProfiler
+
+# Startup mode:
+#   "background" (default) - models load and warm up after the server starts
+#                            listening; /health/ready turns 200 once warm
+#   "blocking"             - the server only starts listening once warm
+STARTUP_MODE = os.environ.get("AI_STARTUP_MODE", "background")
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MODEL_DIR = os.path.join(BASE_DIR, "model")
 
-category_model = None
-priority_model = None
-
-try:
-    category_model_path = os.path.join(MODEL_DIR, "category_model.pkl")
-    if os.path.exists(category_model_path):
-        print(f"Attempting to load category model from: {category_model_path}")
-        category_model = joblib.load(category_model_path)
-        print(f"[OK] Loaded category model: {category_model_path}")
-        if hasattr(category_model, 'model_version'):
-            print(f"  Model version: {category_model.model_version}")
-        if hasattr(category_model, 'predict_proba'):
-            print(f"  Model has predict_proba method: OK")
+# Optional .npz file the index is loaded from at startup and saved to on shutdown,
+# every AI_INDEX_SAVE_INTERVAL seconds while it has unsaved changes (0: only on
+# shutdown and POST /index/save) and after a backfill completes
+INDEX_PATH = os.environ.get("AI_INDEX_PATH") or None
+INDEX_SAVE_INTERVAL = float(os.environ.get("AI_INDEX_SAVE_INTERVAL", "30"))
+
+# Worker processes serving this app (set by scripts/serve.py). With more than
+# one, every worker holds its own index, analytics cube, model slots and shadow
+# evaluator, so endpoints that change them are rejected (see require_single_worker)
+SERVE_WORKERS = int(os.environ.get("AI_SERVE_WORKERS", "1"))
+
+# Texts run through the full pipeline before the service reports ready, so
+# lazy kernel initialization is not paid by the first real request
+WARMUP_TEXTS = [
+    "Street light not working near Ward 3",
+    "Water pipeline burst near Main Road flooding the area and blocking traffic for hours",
+    "garbage not collected",
+    "Large pothole causing accidents near Bus Stand needs urgent repair",
+]
+
+# Set by load_models() during startup
+embedding_model = None
+complaint_index = None
+
+# Classifier heads: the active slot serves; /admin/reload loads the standby slot and swaps
+model_slots = ModelSlots()
+
+# Candidate heads scored on live /predict embeddings (None unless candidates exist)
+shadow_evaluator = None
+
+startup_state = {"status": "starting", "phases": {}, "error": None}
+
+
+@contextmanager
+def startup_phase(name):
+    """Time one startup phase; logged, kept for /health/ready and exported as a metric."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        startup_state["phases"][name] = round(elapsed, 3)
+        STARTUP_PHASE_SECONDS.set(elapsed, name)
+        print(f"  Startup phase {name}: {elapsed:.2f}s")
+
+
+def load_models():
+    """Load the shared encoder, classifier heads and vector index."""
+    global embedding_model, complaint_index
+
+    # Load the shared embedding model (one copy per process, used by every head)
+    with startup_phase("encoder"):
+        embedding_model = get_encoder()
+    MODEL_LOAD_SECONDS.set(startup_state["phases"]["encoder"], "encoder")
+
+    # Load category and priority models
+    category_model = priority_model = None
+    category_model_path = priority_model_path = None
+    try:
+        print(f"Attempting to load category model from: {MODEL_DIR}")
+        with startup_phase("category"):
+            category_model, category_model_path = load_model_bundle("category", MODEL_DIR)
+        MODEL_LOAD_SECONDS.set(startup_state["phases"]["category"], "category")
+        if category_model is not None:
+            print(f"[OK] Loaded category model: {category_model_path}")
+            if hasattr(category_model, 'model_version'):
+                print(f"  Model version: {category_model.model_version}")
+            if hasattr(category_model, 'predict_proba'):
+                print(f"  Model has predict_proba method: OK")
+            else:
+                print(f"  ERROR: Model missing predict_proba method!")
         else:
-            print(f"  ERROR: Model missing predict_proba method!")
-    else:
-        print(f"⚠ Warning: Category model file not found at: {category_model_path}")
-except Exception as e:
-    import traceback
-    print(f"⚠ ERROR: Could not load category model: {e}")
-    print(f"Full traceback:")
-    traceback.print_exc()
-    category_model = None
-
-try:
-    priority_model_path = os.path.join(MODEL_DIR, "priority_model.pkl")
-    if os.path.exists(priority_model_path):
-        priority_model = joblib.load(priority_model_path)
-        print(f"[OK] Loaded priority model: {priority_model_path}")
-except Exception as e:
-    print(f"⚠ Warning: Could not load priority model: {e}")
+            print(f"⚠ Warning: Category model file not found in: {MODEL_DIR}")
+    except Exception as e:
+        import traceback
+        print(f"⚠ ERROR: Could not load category model: {e}")
+        print(f"Full traceback:")
+        traceback.print_exc()
+        category_model = None
+
+    try:
+        with startup_phase("priority"):
+            priority_model, priority_model_path = load_model_bundle("priority", MODEL_DIR)
+        MODEL_LOAD_SECONDS.set(startup_state["phases"]["priority"], "priority")
+        if priority_model is not None:
+            print(f"[OK] Loaded priority model: {priority_model_path}")
+    except Exception as e:
+        print(f"⚠ Warning: Could not load priority model: {e}")
+    lexical_model = lexical_model_path = None
+    try:
+        with startup_phase("lexical"):
+            lexical_model, lexical_model_path = load_lexical_head("category", MODEL_DIR)
+        if lexical_model is not None:
+            print(f"[OK] Loaded lexical cascade head: {lexical_model_path} (threshold {lexical_model.threshold})")
+    except Exception as e:
+        print(f"⚠ Warning: Could not load lexical cascade head: {e}")
+    model_slots.install(category_model, priority_model,
+                        {"category": category_model_path, "priority": priority_model_path,
+                         "lexical": lexical_model_path},
+                        lexical_model)
+
+    with startup_phase("shadow"):
+        try:
+            set_shadow_evaluator(load_shadow_evaluator())
+        except Exception as e:
+            print(f"⚠ Warning: Could not load shadow candidate models: {e}")
+
+    with startup_phase("index"):
+        index = None
+        if INDEX_PATH and os.path.exists(INDEX_PATH):
+            try:
+                index = ComplaintVectorIndex.load(INDEX_PATH)
+                print(f"[OK] Loaded complaint index: {INDEX_PATH} ({len(index)} complaints)")
+            except Exception as e:
+                print(f"⚠ Warning: Could not load complaint index: {e}")
+        if index is None:
+            index = ComplaintVectorIndex(embedding_model.get_sentence_embedding_dimension())
+        complaint_index = index
+
+
+def warm_up():
+    """Run the warm-up texts through normalize, encode (single and batched) and both heads."""
+    with startup_phase("warmup"):
+        texts = normalize_batch(WARMUP_TEXTS)
+        encode_texts(texts[:1], use_cache=False)
+        embeddings = encode_texts(texts, use_cache=False)
+        slot = model_slots.active
+        predict_normalized(texts, slot.category_model, slot.priority_model, embeddings=embeddings)
+        if slot.lexical_model is not None:
+            predict_normalized(texts, slot.lexical_model, slot.priority_model, embeddings=embeddings)
+
+
+def load_shadow_evaluator():
+    """Shadow evaluator over the candidate head bundles in SHADOW_MODEL_DIR, or None if there are none."""
+    heads = {task: load_model_bundle(task, SHADOW_MODEL_DIR)[0] for task in SHADOW_TASKS}
+    if not any(heads.values()):
+        return None
+    evaluator = ShadowEvaluator(heads)
+    versions = ", ".join(f"{task} {getattr(head, 'model_version', None)}" for task, head in evaluator.heads.items())
+    print(f"[OK] Shadow evaluation enabled: {versions} (from {SHADOW_MODEL_DIR})")
+    return evaluator
+
+
+def set_shadow_evaluator(evaluator):
+    """Replace the shadow evaluator (None disables shadow evaluation)."""
+    global shadow_evaluator
+    previous, shadow_evaluator = shadow_evaluator, evaluator
+    if previous is not None:
+        previous.close()
+
+
+def load_standby_heads():
+    """Load the head bundles currently in MODEL_DIR for a reload (category is required)."""
+    category_model, category_model_path = load_model_bundle("category", MODEL_DIR)
+    if category_model is None:
+        raise FileNotFoundError(f"Category model file not found in: {MODEL_DIR}")
+    priority_model, priority_model_path = load_model_bundle("priority", MODEL_DIR)
+    lexical_model, lexical_model_path = load_lexical_head("category", MODEL_DIR)
+    return {
+        "category_model": category_model,
+        "priority_model": priority_model,
+        "lexical_model": lexical_model,
+        "paths": {"category": category_model_path, "priority": priority_model_path, "lexical": lexical_model_path},
+    }
+
+
+def warm_slot(slot):
+    """Score the warm-up texts with a standby slot's heads; any prediction error aborts the reload."""
+    texts = normalize_batch(WARMUP_TEXTS)
+    embeddings = encode_texts(texts, use_cache=False)
+    results = predict_normalized(texts, slot.category_model, slot.priority_model, embeddings=embeddings)
+    if slot.lexical_model is not None:
+        results += predict_normalized(texts, slot.lexical_model, slot.priority_model, embeddings=embeddings)
+    errors = {result["error"] for result in results if "error" in result}
+    if errors:
+        raise RuntimeError(f"Warm-up failed: {errors.pop()}")
+
+
+def save_index(force=False):
+    """
+    Save the index to AI_INDEX_PATH if it has unsaved changes (or force).
+
+    Returns:
+        True if the index was written
+    """
+    index = complaint_index
+    if not INDEX_PATH or index is None or (not force and index.unsaved_changes == 0):
+        return False
+    index.save(INDEX_PATH)
+    return True
+
+
+def run_index_saver(stop):
+    """Background thread: save a changed index every INDEX_SAVE_INTERVAL seconds until stop is set."""
+    while not stop.wait(INDEX_SAVE_INTERVAL):
+        try:
+            save_index()
+        except Exception as e:
+            print(f"⚠ Warning: Could not save complaint index: {e}")
+
+
+def reload_models(background=False):
+    """Load the bundles in MODEL_DIR into the standby slot, warm it and swap it in."""
+    return model_slots.reload(load_standby_heads, warm_slot, background=background)
+
+
+def preload_models():
+    """
+    Load models before the server starts (used by the pre-forking server in
+    scripts/serve.py, so forked workers share the weights copy-on-write).
+    The lifespan of each worker then only warms up.
+    """
+    with startup_phase("preload"):
+        load_models()
+
+
+def start_service():
+    """Load models (unless preloaded) and warm up; runs in a worker thread from the lifespan."""
+    print(f"Starting AI service (startup mode: {STARTUP_MODE})")
+    try:
+        with startup_phase("total"):
+            if embedding_model is None:
+                load_models()
+            warm_up()
+        startup_state["status"] = "ready"
+        print(f"[OK] AI service ready in {startup_state['phases']['total']:.2f}s")
+    except Exception as e:
+        import traceback
+        startup_state["status"] = "failed"
+        startup_state["error"] = str(e)
+        print(f"⚠ ERROR: AI service startup failed: {e}")
+        traceback.print_exc()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    loader = threading.Thread(target=start_service, name="model-loader", daemon=True)
+    loader.start()
+    stop_saver = threading.Event()
+    saver = None
+    if INDEX_PATH and INDEX_SAVE_INTERVAL > 0:
+        saver = threading.Thread(target=run_index_saver, args=(stop_saver,), name="index-saver", daemon=True)
+        saver.start()
+    if STARTUP_MODE == "blocking":
+        await asyncio.to_thread(loader.join)
+    yield
+    inference_executor.shutdown()
+    set_shadow_evaluator(None)
+    stop_saver.set()
+    if saver is not None:
+        await asyncio.to_thread(saver.join)
+    try:
+        if await asyncio.to_thread(save_index):
+            print(f"[OK] Saved complaint index: {INDEX_PATH} ({len(complaint_index)} complaints)")
+    except Exception as e:
+        print(f"⚠ Warning: Could not save complaint index on shutdown: {e}")
+
+
+def require_ready():
+    """Dependency for endpoints that need the models: 503 until startup finished."""
+    if startup_state["status"] != "ready":
+        raise HTTPException(
+            status_code=503,
+            detail=f"Service {startup_state['status']}",
+            headers={"Retry-After": "5"},
+        )
+
+
+def require_single_worker(request: Request):
+    """
+    Dependency for endpoints that change per-process state: 409 when
+    scripts/serve.py runs several workers, since the change would reach
+    only the worker that happened to accept the connection.
+    """
+    if SERVE_WORKERS > 1:
+        raise HTTPException(
+            status_code=409,
+            detail=f"{request.url.path} changes per-worker state and is disabled with {SERVE_WORKERS} workers",
+        )
+
+
+def request_deadline(request: Request):
+    """
+    Dependency: monotonic deadline for this request. Callers may send their
+    own timeout as X-Request-Timeout-Ms; the default matches the Node
+    server's 10 s axios timeout, after which nobody reads the answer.
+    """
+    timeout_ms = REQUEST_DEADLINE_MS
+    header = request.headers.get("x-request-timeout-ms")
+    if header:
+        try:
+            timeout_ms = min(float(header), REQUEST_DEADLINE_MS)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="X-Request-Timeout-Ms must be a number")
+    return deadline_after(timeout_ms)
+
+
+app = FastAPI(title="Municipal AI Service", lifespan=lifespan)
+
+# CPU-heavy work (encode, heads, index search) runs here, not in the default threadpool
+inference_executor = InferenceExecutor()
+
+
+@app.exception_handler(QueueFull)
+async def queue_full_handler(request: Request, exc: QueueFull):
+    return JSONResponse({"detail": str(exc)}, status_code=429, headers={"Retry-After": str(exc.retry_after)})
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse({"detail": str(exc)}, status_code=504)
+
+# Runtime-toggled sampling profiler (idle unless started via /profile/start)
+profiler = SamplingProfiler()
+app.add_middleware(MetricsMiddleware, on_request_finished=profiler.request_finished)
+
+
+@app.get("/health/live")
+def health_live():
+    """Liveness: the process is up and serving HTTP (models may still be loading)."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+def health_ready():
+    """Readiness: 200 once models are loaded and warmed up, else 503."""
+    body = {
+        "status": startup_state["status"],
+        "startupMode": STARTUP_MODE,
+        "phases": startup_state["phases"],
+    }
+    if startup_state["error"]:
+        body["error"] = startup_state["error"]
+    if startup_state["status"] != "ready":
+        return JSONResponse(body, status_code=503)
+    body["model_version"] = model_slots.active.model_version
+    body["modelSlot"] = model_slots.active.name
+    return body
 
 class EmbedRequest(BaseModel):
     text: str
 
+class EmbedBatchRequest(BaseModel):
+    texts: List[str]
+    ids: Optional[List[str]] = None
+    normalize: bool = False  # L2-normalize each vector
+    format: str = "json"     # "json" (nested lists) or "base64" (packed float32)
+
 class SimilarityRequest(BaseModel):
     text1: str
     text2: str
 
+class SimilarityMatrixRequest(BaseModel):
+    queries: List[str]
+    candidates: Optional[List[str]] = None  # omitted: score the queries against each other
+    topK: Optional[int] = None              # best k candidates per query instead of the full matrix
+    minScore: Optional[float] = None        # top-k mode: drop matches below this score
+    format: str = "json"                    # full matrix: "json" (nested lists) or "base64" (packed float32)
+
 def cosine(a, b):
     return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
 
-@app.post("/embed")
-def embed(req: EmbedRequest):
-    vec = embedding_model.encode(req.text).tolist()
+def process_inference_batch(items):
+    """Run one micro-batch of /embed and /predict requests against the active model slot."""
+    # Read once: the whole batch is answered by one slot even if a reload swaps meanwhile
+    slot = model_slots.active
+    shadow = shadow_evaluator
+    return run_inference_batch(items, slot.category_model, slot.priority_model,
+                               on_predicted=shadow.submit if shadow is not None else None,
+                               lexical_model=slot.lexical_model)
+
+# Concurrent /embed and /predict requests share one batched encoder pass
+inference_batcher = MicroBatcher(process_inference_batch, executor=inference_executor)
+
+@app.post("/embed", dependencies=[Depends(require_ready)])
+async def embed(req: EmbedRequest, response: Response, deadline: float = Depends(request_deadline)):
+    vec, batch_size = await inference_batcher.submit(("embed", req.text), deadline)
+    response.headers["X-Batch-Size"] = str(batch_size)
     return {"embedding": vec}
 
-@app.post("/similarity")
-def similarity(req: SimilarityRequest):
-    v1 = embedding_model.encode(req.text1)
-    v2 = embedding_model.encode(req.text2)
+@app.get("/cache/stats", dependencies=[Depends(require_ready)])
+def cache_stats():
+    """Embedding cache hit/miss/eviction counters."""
+    cache = get_embedding_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+@app.get("/batching/stats")
+def batching_stats():
+    """Micro-batching settings, realized batch sizes and inference executor counters."""
+    return {**inference_batcher.stats(), "executor": inference_executor.stats()}
+
+# Maximum number of texts accepted by one /embed/batch call
+EMBED_BATCH_MAX_TEXTS = 256
+
+@app.post("/embed/batch", dependencies=[Depends(require_ready)])
+async def embed_batch(req: EmbedBatchRequest, deadline: float = Depends(request_deadline)):
+    """
+    Embed many texts with a single batched encode call.
+    With format="base64" the vectors are returned as one little-endian
+    float32 row-major matrix (count x dim), base64-encoded.
+    """
+    if len(req.texts) > EMBED_BATCH_MAX_TEXTS:
+        raise HTTPException(status_code=400, detail=f"At most {EMBED_BATCH_MAX_TEXTS} texts per batch")
+    if req.ids is not None and len(req.ids) != len(req.texts):
+        raise HTTPException(status_code=400, detail="ids must have the same length as texts")
+    if req.format not in ("json", "base64"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'base64'")
+
+    if req.texts:
+        encode = functools.partial(encode_texts, req.texts, normalize=req.normalize)
+        vectors = await inference_executor.run(encode, deadline=deadline)
+    else:
+        vectors = np.zeros((0, embedding_model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    response = {
+        "count": int(vectors.shape[0]),
+        "dim": int(vectors.shape[1]),
+        "normalized": req.normalize,
+        "format": req.format,
+    }
+    if req.ids is not None:
+        response["ids"] = req.ids
+    if req.format == "base64":
+        response["data"] = base64.b64encode(vectors.astype("<f4").tobytes()).decode("ascii")
+    else:
+        response["embeddings"] = vectors.tolist()
+    return response
+
+@app.post("/similarity", dependencies=[Depends(require_ready)])
+async def similarity(req: SimilarityRequest, deadline: float = Depends(request_deadline)):
+    v1, v2 = await inference_executor.run(encode_texts, [req.text1, req.text2], deadline=deadline)
     score = cosine(v1, v2)
 
     return {
         "similarityScore": round(score, 3),
-        "level": (
-            "HIGHLY_SIMILAR" if score >= 0.85 else
-            "RELATED" if score >= 0.5 else
-            "UNRELATED"
-        )
+        "level": similarity_level(score)
+    }
+
+# Maximum number of queries (and of candidates) in one /similarity/matrix call
+SIMILARITY_MATRIX_MAX_TEXTS = 256
+
+@app.post("/similarity/matrix", dependencies=[Depends(require_ready)])
+async def similarity_matrix(req: SimilarityMatrixRequest, deadline: float = Depends(request_deadline)):
+    """
+    Score N queries against M candidates (or the queries against each other)
+    with one batched encode and one normalized matrix multiply.
+
+    With topK, each query gets its best matches as parallel index / score /
+    level arrays (a query never matches itself when candidates are omitted).
+    Otherwise the full N x M matrix is returned, rounded to 3 decimals
+    (format="json") or as a base64 little-endian float32 row-major matrix
+    (format="base64"). Levels use the /similarity thresholds.
+    """
+    candidates = req.candidates
+    if len(req.queries) > SIMILARITY_MATRIX_MAX_TEXTS or (candidates and len(candidates) > SIMILARITY_MATRIX_MAX_TEXTS):
+        raise HTTPException(status_code=400, detail=f"At most {SIMILARITY_MATRIX_MAX_TEXTS} queries and candidates")
+    if req.format not in ("json", "base64"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'base64'")
+    if req.topK is not None and req.topK < 1:
+        raise HTTPException(status_code=400, detail="topK must be at least 1")
+    # Built here rather than returned as a dict: skips FastAPI's per-value encoding
+    return JSONResponse(await inference_executor.run(run_similarity_matrix, req, deadline=deadline))
+
+def run_similarity_matrix(req):
+    """Encode distinct texts once, build the score matrix and the compact response."""
+    texts = req.queries + (req.candidates or [])
+    unique = list(dict.fromkeys(texts))
+    if unique:
+        position = {text: i for i, text in enumerate(unique)}
+        vectors = encode_texts(unique)[[position[text] for text in texts]]
+    else:
+        vectors = np.zeros((0, embedding_model.get_sentence_embedding_dimension()), dtype=np.float32)
+    n = len(req.queries)
+    self_matrix = req.candidates is None
+    scores = cosine_matrix(vectors[:n], None if self_matrix else vectors[n:])
+
+    response = {
+        "queries": n,
+        "candidates": int(scores.shape[1]),
+        "thresholds": {"HIGHLY_SIMILAR": HIGHLY_SIMILAR_THRESHOLD, "RELATED": RELATED_THRESHOLD},
+        "levelCounts": level_counts(scores, exclude_diagonal=self_matrix),
     }
+    if req.topK is not None:
+        indices, top_scores = top_k_rows(scores, req.topK, req.minScore, exclude_diagonal=self_matrix)
+        response["matches"] = [
+            {
+                "indices": rows.tolist(),
+                "scores": np.round(values.astype(np.float64), 3).tolist(),
+                "levels": [LEVELS[code] for code in level_codes(values)],
+            }
+            for rows, values in zip(indices, top_scores)
+        ]
+    elif req.format == "base64":
+        response["format"] = "base64"
+        response["data"] = base64.b64encode(scores.astype("<f4").tobytes()).decode("ascii")
+    else:
+        response["format"] = "json"
+        response["scores"] = np.round(scores.astype(np.float64), 3).tolist()
+    return response
 
 
 class ComplaintRequest(BaseModel):
     text: str
 
 
-@app.post("/predict")
-def predict_complaint(data: ComplaintRequest):
+@app.post("/predict", dependencies=[Depends(require_ready)])
+async def predict_complaint(data: ComplaintRequest, response: Response, deadline: float = Depends(request_deadline)):
     """
     Predict category and priority for a complaint.
     Returns "Uncertain" category if confidence < 0.65.
     Text is normalized for robustness (handles typos, informal English).
+    Text is normalized and embedded once; the same vector feeds both heads.
+    Concurrent requests are micro-batched into one encoder and head pass.
+    With a lexical cascade head loaded, complaints it is confident about
+    are answered without the encoder; model_version stays the slot's and
+    categorySource names the head that answered ("lexical" or "semantic").
+    Returns 429 when the inference queue is full, 504 past the deadline.
     """
     # Normalize input text for robustness
-    text = normalize_for_inference(data.text)
+    with stage_timer("normalize"):
+        text = normalize_for_inference(data.text)
     
-    result = {
-        "decision": "AI_PREDICTED"
-    }
-    
-    # Extract model version if available
-    model_version = None
-    if category_model and hasattr(category_model, 'model_version'):
-        model_version = category_model.model_version
-    elif priority_model and hasattr(priority_model, 'model_version'):
-        model_version = priority_model.model_version
-    
-    # ---------------- CATEGORY PREDICTION ----------------
-    if category_model is None:
-        result["category"] = "Uncertain"
-        result["categoryConfidence"] = 0.0
-        result["error"] = "Category model not loaded"
-    else:
+    result, batch_size = await inference_batcher.submit(("predict", text), deadline)
+    response.headers["X-Batch-Size"] = str(batch_size)
+    return result
+
+
+# Request bodies above this size are spooled to a temporary file
+BULK_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Largest chunkSize /predict/bulk accepts (a chunk's texts, vectors and rows are held at once)
+BULK_MAX_CHUNK_SIZE = 5000
+
+
+@app.post("/predict/bulk", dependencies=[Depends(require_ready)])
+async def predict_bulk(request: Request, format: str = "jsonl", output: str = "jsonl",
+                       chunkSize: int = BULK_CHUNK_SIZE):
+    """
+    Bulk re-classification for backfills. The body is JSONL (or CSV with a
+    header, format=csv) of records with "text" or "title"/"description" and
+    an optional "id". Results stream back chunk by chunk as JSONL (or CSV,
+    output=csv) with the same rules as /predict; rows/sec is logged when the
+    stream ends. Each chunk runs as one job on the inference executor, so a
+    backfill interleaves with live requests instead of starving them; the
+    stream is admitted once (429 if the queue is full) and has no deadline.
+    A line that cannot be parsed becomes a row with an "error"; chunkSize
+    is limited to BULK_MAX_CHUNK_SIZE.
+    """
+    if format not in BULK_FORMATS or output not in BULK_FORMATS:
+        raise HTTPException(status_code=400, detail="format and output must be 'jsonl' or 'csv'")
+    if not 1 <= chunkSize <= BULK_MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail=f"chunkSize must be between 1 and {BULK_MAX_CHUNK_SIZE}")
+    inference_executor.admit()
+
+    # Spool the upload first: the body is fully received before streaming starts
+    spool = tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_MAX_BYTES)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+
+    async def generate():
+        stats = BulkStats()
         try:
-            # Note: category_model.predict_proba already normalizes internally,
-            # but we normalize here too for consistency and in case model doesn't
-            category_probs = category_model.predict_proba([text])[0]
-            cat_index = int(np.argmax(category_probs))
-            category_confidence = float(category_probs[cat_index])
-            
-            # If confidence < 0.65, return "Uncertain"
-            if category_confidence < 0.65:
-                result["category"] = "Uncertain"
-                result["categoryConfidence"] = round(category_confidence, 3)
-            else:
-                category = category_model.classes_[cat_index]
-                result["category"] = category
-                result["categoryConfidence"] = round(category_confidence, 3)
-        except Exception as e:
-            result["category"] = "Uncertain"
-            result["categoryConfidence"] = 0.0
-            result["error"] = f"Prediction error: {str(e)}"
-    
-    # ---------------- PRIORITY PREDICTION ----------------
-    if priority_model is None:
-        result["priority"] = "Medium"  # Default fallback
-        result["priorityConfidence"] = 0.0
+            # Undecodable bytes become U+FFFD instead of ending the stream mid-response
+            source = io.TextIOWrapper(spool, encoding="utf-8", errors="replace", newline="")
+            records = read_records(source, format, invalid="record")
+            # One slot for the whole stream, so a backfill never mixes model versions
+            slot = model_slots.active
+            pieces = iter_output(records, slot.category_model, slot.priority_model, output, chunkSize, stats,
+                                 slot.lexical_model)
+            while True:
+                piece = await inference_executor.run(next, pieces, None, bounded=False)
+                if piece is None:
+                    break
+                yield piece
+        finally:
+            spool.close()
+            summary = stats.as_dict()
+            print(f"[OK] /predict/bulk: {summary['rows']} rows in {summary['seconds']}s "
+                  f"({summary['rowsPerSec']} rows/sec)")
+
+    media_type = "text/csv" if output == "csv" else "application/x-ndjson"
+    return StreamingResponse(generate(), media_type=media_type)
+
+
+# ---------------- NEAR-DUPLICATE CLUSTERING ----------------
+# Maximum complaints per /clusters/duplicates call
+CLUSTER_MAX_ITEMS = 50000
+
+
+class ClusterItem(BaseModel):
+    id: str
+    text: str
+    createdAt: Optional[datetime] = None
+    ward: Optional[str] = None
+
+class DuplicateClusterRequest(BaseModel):
+    items: List[ClusterItem]
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    threshold: float = DUPLICATE_THRESHOLD
+    minSize: int = 2
+
+
+@app.post("/clusters/duplicates", dependencies=[Depends(require_ready)])
+async def duplicate_clusters(req: DuplicateClusterRequest):
+    """
+    Group near-duplicate complaints (e.g. everything reported after one
+    burst water main) in the [since, until) createdAt window. Returns
+    clusters of at least minSize complaints with member ids, representative,
+    size, wards and time span. Normalization, encoding chunks and similarity
+    row blocks run as separate inference jobs, so live requests interleave with the run;
+    the job is admitted once (429 if the queue is full) and has no deadline.
+    """
+    if len(req.items) > CLUSTER_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {CLUSTER_MAX_ITEMS} items per run")
+    inference_executor.admit()
+
+    started = time.perf_counter()
+    since_ms = to_epoch_ms(req.since) if req.since else None
+    until_ms = to_epoch_ms(req.until) if req.until else None
+    items = [
+        (item, to_epoch_ms(item.createdAt) if item.createdAt else None)
+        for item in req.items
+    ]
+    items = [(item, created) for item, created in items if in_window(created, since_ms, until_ms)]
+    ids = [item.id for item, _ in items]
+    texts = [item.text for item, _ in items]
+
+    normalized = await inference_executor.run(normalize_batch, texts, bounded=False)
+    unique, rows = distinct_texts(normalized)
+    parts = []
+    for chunk_start in range(0, len(unique), ENCODE_CHUNK_SIZE):
+        encode = functools.partial(encode_texts, unique[chunk_start:chunk_start + ENCODE_CHUNK_SIZE], use_cache=False)
+        parts.append(await inference_executor.run(encode, bounded=False))
+    embeddings = np.vstack(parts)[rows] if parts else np.zeros((0, 1), dtype=np.float32)
+
+    clusterer = DuplicateClusterer(embeddings, req.threshold, DUPLICATE_BLOCK_SIZE)
+    for start in clusterer.row_blocks():
+        await inference_executor.run(clusterer.process_row_block, start, bounded=False)
+    report = await inference_executor.run(
+        build_report, clusterer, ids, texts, [created for _, created in items],
+        [item.ward for item, _ in items], max(1, req.minSize), time.perf_counter() - started,
+        bounded=False,
+    )
+    print(f"[OK] /clusters/duplicates: {report['clusterCount']} clusters over {report['complaints']} complaints "
+          f"in {report['seconds']}s")
+    return JSONResponse(report)
+
+
+# ---------------- RESOLVED COMPLAINT VECTOR INDEX ----------------
+def to_epoch_ms(value):
+    """Convert a datetime (naive values are treated as UTC) to epoch milliseconds."""
+    if value.tzinfo is None:
+        return int((value - datetime(1970, 1, 1)).total_seconds() * 1000)
+    return int(value.timestamp() * 1000)
+
+
+class IndexItem(BaseModel):
+    id: str
+    text: Optional[str] = None
+    embedding: Optional[List[float]] = None
+    category: str
+    ward: str
+    createdAt: datetime
+
+class IndexUpsertRequest(BaseModel):
+    items: List[IndexItem]
+
+class IndexDeleteRequest(BaseModel):
+    ids: List[str]
+
+class SearchRequest(BaseModel):
+    text: Optional[str] = None
+    embedding: Optional[List[float]] = None
+    k: int = 10
+    category: Optional[str] = None
+    ward: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    excludeIds: Optional[List[str]] = None
+    minScore: Optional[float] = None
+    nprobe: Optional[int] = None  # IVF lists to probe (approximate mode)
+    exact: bool = False           # force brute-force search
+
+class AnnTrainRequest(BaseModel):
+    nLists: Optional[int] = None
+    nIter: int = 20
+
+
+@app.post("/index/upsert", dependencies=[Depends(require_ready), Depends(require_single_worker)])
+async def index_upsert(req: IndexUpsertRequest):
+    """Insert or replace resolved complaints; texts are embedded in one batch."""
+    if len(req.items) > EMBED_BATCH_MAX_TEXTS:
+        raise HTTPException(status_code=400, detail=f"At most {EMBED_BATCH_MAX_TEXTS} items per upsert")
+    if any(item.text is None and item.embedding is None for item in req.items):
+        raise HTTPException(status_code=400, detail="Each item needs either text or embedding")
+    # Bulk sync from Node uses a 30 s timeout, so no request deadline here
+    return await inference_executor.run(run_index_upsert, req)
+
+
+def run_index_upsert(req):
+    """Embed item texts and write the batch into the index."""
+    if not req.items:
+        return {"inserted": 0, "updated": 0, "count": len(complaint_index)}
+
+    vectors = np.zeros((len(req.items), complaint_index.dim), dtype=np.float32)
+    text_rows = [i for i, item in enumerate(req.items) if item.embedding is None]
+    if text_rows:
+        vectors[text_rows] = encode_texts([req.items[i].text for i in text_rows])
+    for i, item in enumerate(req.items):
+        if item.embedding is not None:
+            if len(item.embedding) != complaint_index.dim:
+                raise HTTPException(status_code=400, detail=f"Embedding for {item.id} must have {complaint_index.dim} values")
+            vectors[i] = item.embedding
+
+    inserted = complaint_index.upsert(
+        [item.id for item in req.items],
+        vectors,
+        [item.category for item in req.items],
+        [item.ward for item in req.items],
+        [to_epoch_ms(item.createdAt) for item in req.items],
+    )
+    return {"inserted": inserted, "updated": len(req.items) - inserted, "count": len(complaint_index)}
+
+
+@app.post("/index/delete", dependencies=[Depends(require_ready), Depends(require_single_worker)])
+def index_delete(req: IndexDeleteRequest):
+    removed = complaint_index.delete(req.ids)
+    return {"removed": removed, "count": len(complaint_index)}
+
+
+@app.post("/index/save", dependencies=[Depends(require_ready), Depends(require_single_worker)])
+def index_save():
+    """Persist the index to AI_INDEX_PATH now (it is also saved automatically)."""
+    if not INDEX_PATH:
+        raise HTTPException(status_code=400, detail="AI_INDEX_PATH is not configured")
+    save_index(force=True)
+    return {"saved": INDEX_PATH, "count": len(complaint_index)}
+
+
+@app.post("/index/backfilled", dependencies=[Depends(require_ready), Depends(require_single_worker)])
+def index_backfilled():
+    """
+    Mark the index as backfilled: the caller has upserted every resolved
+    complaint in the repeat-detection window. Until then /search reports
+    backfilled=false and callers should not treat a miss as "no history".
+    The flag is saved with the index (at once, if AI_INDEX_PATH is set).
+    """
+    complaint_index.mark_backfilled()
+    save_index()
+    return complaint_index.stats()
+
+
+@app.post("/index/ann/train", dependencies=[Depends(require_ready), Depends(require_single_worker)])
+async def index_ann_train(req: AnnTrainRequest):
+    """(Re)train the IVF coarse quantizer on the indexed complaints."""
+    if len(complaint_index) == 0:
+        raise HTTPException(status_code=400, detail="Index is empty")
+    train = functools.partial(complaint_index.train_ann, n_lists=req.nLists, n_iter=req.nIter)
+    n_lists = await inference_executor.run(train)
+    return {"nLists": n_lists, "count": len(complaint_index)}
+
+
+@app.get("/index/stats", dependencies=[Depends(require_ready)])
+def index_stats():
+    return {**complaint_index.stats(), "readOnly": SERVE_WORKERS > 1}
+
+
+@app.post("/search", dependencies=[Depends(require_ready)])
+async def search(req: SearchRequest, deadline: float = Depends(request_deadline)):
+    """
+    Top-k cosine search over indexed resolved complaints, with category,
+    ward and createdAt window filters applied inside the index. readOnly is
+    true under a multi-worker serve.py: the index is the one loaded at
+    startup and misses complaints resolved since it was saved.
+    """
+    if (req.text is None) == (req.embedding is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of text or embedding")
+    if req.embedding is not None and len(req.embedding) != complaint_index.dim:
+        raise HTTPException(status_code=400, detail=f"Embedding must have {complaint_index.dim} values")
+    return await inference_executor.run(run_search, req, deadline=deadline)
+
+
+def run_search(req):
+    """Encode the query (if given as text) and search the index."""
+    if req.embedding is not None:
+        query = np.asarray(req.embedding, dtype=np.float32)
     else:
-        try:
-            priority_probs = priority_model.predict_proba([text])[0]
-            pri_index = int(np.argmax(priority_probs))
-            priority = priority_model.classes_[pri_index]
-            priority_confidence = float(priority_probs[pri_index])
-            result["priority"] = priority
-            result["priorityConfidence"] = round(priority_confidence, 3)
-        except Exception as e:
-            result["priority"] = "Medium"
-            result["priorityConfidence"] = 0.0
-    
-    # Add model version to response for governance tracking
-    if model_version:
-        result["model_version"] = model_version
-    
+        query = encode_texts([req.text])[0]
+
+    results = complaint_index.search(
+        query,
+        k=max(0, req.k),
+        category=req.category,
+        ward=req.ward,
+        since_ms=to_epoch_ms(req.since) if req.since else None,
+        until_ms=to_epoch_ms(req.until) if req.until else None,
+        exclude_ids=req.excludeIds,
+        min_score=req.minScore,
+        nprobe=req.nprobe,
+        exact=req.exact,
+    )
+    for result in results:
+        result["score"] = round(result["score"], 4)
+    return {"indexedCount": len(complaint_index), "backfilled": complaint_index.backfilled,
+            "readOnly": SERVE_WORKERS > 1, "results": results}
+
+
+# ---------------- SPIKE AND HOTSPOT ANALYTICS ----------------
+# Ward x category x priority x day counts; rebuilt from an export, then kept
+# current by /analytics/complaints (the Node server posts each new complaint).
+# The cube lives in memory only: until a rebuild has run (after every
+# restart) it holds no history, so spikes and hotspots answer 503.
+analytics_cube = ComplaintCountCube()
+analytics_built = False
+ANALYTICS_SNAPSHOT_COLUMNS = ["id", "ward", "category", "priority", "createdAt"]
+
+# Guards swapping the cube; while a rebuild runs, updates are also journaled
+# here and replayed into the new cube before it replaces the old one
+analytics_lock = threading.Lock()
+analytics_journal = None
+
+
+class AnalyticsComplaint(BaseModel):
+    id: str
+    ward: Optional[str] = None
+    category: Optional[str] = None
+    priority: Optional[str] = None
+    createdAt: datetime
+
+class AnalyticsUpsertRequest(BaseModel):
+    items: List[AnalyticsComplaint]
+
+class AnalyticsDeleteRequest(BaseModel):
+    ids: List[str]
+
+
+def analytics_now_ms(now):
+    return to_epoch_ms(now) if now is not None else int(time.time() * 1000)
+
+
+def require_analytics_built():
+    """Dependency for spike / hotspot reads: 503 until /analytics/rebuild has loaded the history."""
+    if not analytics_built:
+        raise HTTPException(status_code=503, detail="Analytics cube not built; POST /analytics/rebuild first")
+
+
+def apply_analytics_updates(cube, updates):
+    """Apply journaled ("upsert", rows) / ("delete", ids) updates to a cube; returns the last result."""
+    result = 0
+    for kind, values in updates:
+        if kind == "upsert":
+            result = sum(cube.upsert(*row) for row in values)
+        else:
+            result = cube.delete(values)
     return result
+
+
+def record_analytics_update(kind, values):
+    """Apply one update to the live cube, journaling it if a rebuild is running."""
+    with analytics_lock:
+        if analytics_journal is not None:
+            analytics_journal.append((kind, values))
+        return apply_analytics_updates(analytics_cube, [(kind, values)]), len(analytics_cube)
+
+
+@app.post("/analytics/complaints", dependencies=[Depends(require_single_worker)])
+def analytics_upsert(req: AnalyticsUpsertRequest):
+    """Count new or changed complaints (keyed by id, so re-sending one moves its count)."""
+    rows = [(item.id, item.ward, item.category, item.priority, to_epoch_ms(item.createdAt)) for item in req.items]
+    counted, complaints = record_analytics_update("upsert", rows)
+    return {"received": len(req.items), "counted": counted, "complaints": complaints}
+
+
+@app.post("/analytics/complaints/delete", dependencies=[Depends(require_single_worker)])
+def analytics_delete(req: AnalyticsDeleteRequest):
+    removed, complaints = record_analytics_update("delete", list(req.ids))
+    return {"removed": removed, "complaints": complaints}
+
+
+@app.post("/analytics/rebuild", dependencies=[Depends(require_single_worker)])
+async def analytics_rebuild(request: Request, format: str = "jsonl", snapshot: Optional[str] = None):
+    """
+    Replace the cube with one built from a bulk export (JSONL, or CSV with a
+    header, of id/_id, ward, category, priority, createdAt), or with
+    ?snapshot=<name> from a Parquet snapshot in AI_SNAPSHOT_DIR. The old
+    cube keeps answering until the new one is complete; updates received
+    meanwhile are replayed into it before the swap. 409 while another
+    rebuild is running.
+    """
+    global analytics_journal
+    snapshot_path = None
+    if snapshot is not None:
+        snapshot_path = os.path.join(SNAPSHOT_DIR, snapshot)
+        if os.path.basename(snapshot) != snapshot or snapshot in ("", ".", "..") or not is_snapshot(snapshot_path):
+            raise HTTPException(status_code=404, detail=f"Snapshot not found: {snapshot}")
+    elif format not in BULK_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be 'jsonl' or 'csv'")
+    with analytics_lock:
+        if analytics_journal is not None:
+            raise HTTPException(status_code=409, detail="An analytics rebuild is already running")
+        analytics_journal = []
+    try:
+        return await run_analytics_rebuild(request, format, snapshot_path)
+    finally:
+        with analytics_lock:
+            analytics_journal = None
+
+
+async def run_analytics_rebuild(request, format, snapshot_path):
+    """Build a cube from the request body or a snapshot, replay the journal into it and swap it in."""
+    spool = tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_MAX_BYTES)
+    if snapshot_path is None:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+
+    def build():
+        with spool:
+            if snapshot_path is not None:
+                cube = ComplaintCountCube(analytics_cube.tz)
+                read, counted = cube.ingest_records(iter_snapshot_records(snapshot_path, ANALYTICS_SNAPSHOT_COLUMNS))
+                return cube, read, counted
+            cube = ComplaintCountCube(analytics_cube.tz)
+            read, counted = cube.ingest_records(read_records(io.TextIOWrapper(spool, encoding="utf-8", newline=""), format))
+        return cube, read, counted
+
+    started = time.perf_counter()
+    try:
+        cube, read, counted = await asyncio.to_thread(build)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    replayed = await asyncio.to_thread(swap_analytics_cube, cube)
+    if replayed:
+        print(f"  Replayed {replayed} analytics updates received during the rebuild")
+    print(f"[OK] Analytics cube rebuilt from {read} records ({counted} counted) in {time.perf_counter() - started:.2f}s")
+    return {"read": read, "counted": counted, **cube.stats()}
+
+
+def swap_analytics_cube(cube):
+    """Replay the journal into a rebuilt cube and make it the live one; returns the updates replayed."""
+    global analytics_cube, analytics_built
+    with analytics_lock:
+        apply_analytics_updates(cube, analytics_journal)
+        analytics_cube = cube
+        analytics_built = True
+        return len(analytics_journal)
+
+
+@app.get("/analytics/spikes", dependencies=[Depends(require_analytics_built)])
+def analytics_spikes(now: Optional[datetime] = None):
+    """detectSpikes' result (same windows, thresholds and rounding) from the count cube."""
+    return analytics_cube.detect_spikes(analytics_now_ms(now))
+
+
+@app.get("/analytics/hotspots", dependencies=[Depends(require_analytics_built)])
+def analytics_hotspots(now: Optional[datetime] = None):
+    """identifyHotspots' result (same window, weights and thresholds) from the count cube."""
+    return analytics_cube.identify_hotspots(analytics_now_ms(now))
+
+
+@app.get("/analytics/stats")
+def analytics_stats():
+    return {"built": analytics_built, **analytics_cube.stats()}
+
+
+# ---------------- METRICS AND PROFILING ----------------
+def collect_service_metrics():
+    """Scrape-time values owned by the batcher, embedding cache and index."""
+    ready = startup_state["status"] == "ready"
+    families = [
+        ("ai_ready", "gauge", "1 once models are loaded and warmed up",
+         [({}, int(ready))]),
+        ("ai_batch_queue_depth", "gauge", "Requests waiting for a micro-batch",
+         [({}, inference_batcher.queue_depth())]),
+    ]
+    executor_stats = inference_executor.stats()
+    families += [
+        ("ai_inference_queue_depth", "gauge", "Jobs waiting for an inference thread",
+         [({}, executor_stats["queued"])]),
+        ("ai_inference_running", "gauge", "Jobs running on inference threads",
+         [({}, executor_stats["running"])]),
+    ]
+    if not ready:
+        return families
+    families.append(("ai_index_complaints", "gauge", "Complaints in the vector index",
+                     [({}, len(complaint_index))]))
+    cache = get_embedding_cache()
+    if cache is not None:
+        stats = cache.stats()
+        families += [
+            ("ai_embed_cache_lookups_total", "counter", "Embedding cache lookups by result",
+             [({"result": "memory_hit"}, stats["hits"]), ({"result": "disk_hit"}, stats["diskHits"]),
+              ({"result": "miss"}, stats["misses"])]),
+            ("ai_embed_cache_evictions_total", "counter", "Embedding cache LRU evictions",
+             [({}, stats["evictions"])]),
+            ("ai_embed_cache_entries", "gauge", "Embeddings held in the memory tier",
+             [({}, stats["memoryEntries"])]),
+            ("ai_embed_cache_hit_ratio", "gauge", "Embedding cache hit ratio since start",
+             [({}, stats["hitRate"])]),
+        ]
+    return families
+
+REGISTRY.add_collector(collect_service_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text-format metrics."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+class ProfileRequest(BaseModel):
+    requests: int = 100
+    intervalMs: float = PROFILE_INTERVAL_MS
+
+
+@app.post("/profile/start")
+def profile_start(req: ProfileRequest):
+    """
+    Sample all threads until `requests` more requests have completed, then
+    write a collapsed-stack profile (flamegraph.pl / speedscope input).
+    """
+    if not profiler.start(requests=req.requests, interval_ms=req.intervalMs):
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    return profiler.status()
+
+
+@app.post("/profile/stop")
+def profile_stop():
+    path = profiler.stop()
+    return {"profile": path, **profiler.status()}
+
+
+@app.get("/profile/status")
+def profile_status():
+    return profiler.status()
+
+
+# ---------------- MODEL RELOAD ----------------
+def require_parent_reload():
+    """Reject HTTP reloads under a multi-worker serve.py: one request would reach one worker."""
+    if SERVE_WORKERS > 1:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Model slots are per-worker with {SERVE_WORKERS} workers; send SIGHUP to the serve.py parent",
+        )
+
+
+@app.post("/admin/reload", dependencies=[Depends(require_ready)])
+async def admin_reload(wait: bool = False):
+    """
+    Load the head bundles now in the model directory into the standby slot,
+    warm them and swap them in; requests keep being served by the active
+    slot meanwhile and in-flight ones finish on it. Returns 202 at once
+    (poll /admin/models), or with wait=true the new slot once it serves.
+    409 while another reload is running, and under a multi-worker
+    scripts/serve.py (send the parent SIGHUP instead).
+    """
+    require_parent_reload()
+    try:
+        if not wait:
+            reload_models(background=True)
+            return JSONResponse({"status": "reloading", **model_slots.status()}, status_code=202)
+        slot = await asyncio.to_thread(reload_models)
+    except ReloadInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed: {e}")
+    return {"status": "reloaded", **model_slots.status(), "active": slot.describe()}
+
+
+@app.post("/admin/rollback", dependencies=[Depends(require_ready)])
+def admin_rollback():
+    """Swap the previous heads (standby slot) back in (single-worker only, like /admin/reload)."""
+    require_parent_reload()
+    try:
+        slot = model_slots.rollback()
+    except ReloadInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if slot is None:
+        raise HTTPException(status_code=409, detail="No standby model slot to roll back to")
+    return {"status": "rolled back", **model_slots.status()}
+
+
+@app.get("/cascade/stats")
+def cascade_stats():
+    """Lexical cascade: threshold, answered / escalated counts and the training-time calibration report."""
+    lexical_model = model_slots.active.lexical_model
+    if lexical_model is None:
+        return {"enabled": False}
+    return {"enabled": True, **lexical_model.stats()}
+
+
+@app.get("/admin/models")
+def admin_models():
+    """Active and standby slots (model_version, bundle paths, load time) and the last reload."""
+    return model_slots.status()
+
+
+# ---------------- SHADOW EVALUATION ----------------
+@app.get("/shadow/stats")
+def shadow_stats():
+    """
+    Candidate vs live aggregates: agreement, "Uncertain" rates, confidence
+    deltas, confusion, recent disagreements, and the shadow's own cost.
+    """
+    evaluator = shadow_evaluator
+    if evaluator is None:
+        return {"enabled": False, "candidateDir": SHADOW_MODEL_DIR}
+    return evaluator.stats()
+
+
+@app.post("/shadow/reset", dependencies=[Depends(require_single_worker)])
+def shadow_reset():
+    """Start the aggregates over (e.g. after a traffic change)."""
+    if shadow_evaluator is None:
+        raise HTTPException(status_code=404, detail="Shadow evaluation is not enabled")
+    shadow_evaluator.reset()
+    return shadow_evaluator.stats()
+
+
+@app.post("/shadow/load", dependencies=[Depends(require_ready), Depends(require_single_worker)])
+async def shadow_load():
+    """(Re)load the candidate heads from AI_SHADOW_MODEL_DIR; aggregates start over."""
+    try:
+        evaluator = await asyncio.to_thread(load_shadow_evaluator)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not load candidates: {e}")
+    if evaluator is None:
+        raise HTTPException(status_code=404, detail=f"No candidate head bundles in {SHADOW_MODEL_DIR}")
+    set_shadow_evaluator(evaluator)
+    return evaluator.stats()
+
+
+@app.post("/shadow/stop", dependencies=[Depends(require_single_worker)])
+def shadow_stop():
+    """Stop shadow evaluation (until /shadow/load or a restart)."""
+    set_shadow_evaluator(None)
+    return {"enabled": False}
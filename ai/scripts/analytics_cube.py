@@ -0,0 +1,412 @@
+"""
+Complaint Count Cube - spike and hotspot analytics without collection scans
+Keeps a dense NumPy count cube of ward x category x priority x local day,
+updated incrementally as complaints arrive (or rebuilt from a bulk
+export), and answers the dashboard's spike and hotspot rules with window
+sums over the day axis.
+
+The rules and windows are the ones in the Node server's aggregations:
+    detectSpikes (server/services/spikeDetectionService.js)
+        current window  [local midnight 7 days ago, now)
+        baseline window [local midnight 37 days ago, current window start)
+        baselineWeeklyAvg = baseline * 7 / 30; spikeRatio = current / avg
+        spike if avg >= MIN_BASELINE_COMPLAINTS and ratio >= SPIKE_MULTIPLIER_THRESHOLD
+    identifyHotspots (server/services/hotspotService.js)
+        window [now - 30 days (same local wall time), no upper bound),
+        complaints with a priority only
+        hotspotScore = sum(PRIORITY_WEIGHT[priority] * count)
+        hotspot if count >= MIN_COMPLAINTS and score >= HOTSPOT_SCORE_THRESHOLD
+
+Day buckets are local calendar days in the server's time zone. Windows
+that start or end inside a day (the hotspot cutoff, "now") are made exact
+from the per-day event timestamps of that one day.
+
+Settings (environment variables):
+    AI_ANALYTICS_TZ  - IANA time zone of the Node server (default: TZ, then the system zone)
+
+Usage:
+    python scripts/analytics_cube.py export.jsonl
+    python scripts/analytics_cube.py export.csv --now 2026-10-17T09:30:00+05:30
+    python scripts/analytics_cube.py data/snapshots/2026-10-17   # Parquet snapshot (complaint_snapshot.py)
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from array import array
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from duplicate_clusters import parse_created_at
+
+
+# detectSpikes
+CURRENT_WINDOW_DAYS = 7
+BASELINE_WINDOW_DAYS = 30
+SPIKE_MULTIPLIER_THRESHOLD = 2.0
+MIN_BASELINE_COMPLAINTS = 5
+SEVERITY_SEVERE_MIN = 3.0
+
+# identifyHotspots
+TIME_WINDOW_DAYS = 30
+MIN_COMPLAINTS = 10
+HOTSPOT_SCORE_THRESHOLD = 25
+PRIORITY_WEIGHT = {"High": 3, "Medium": 2, "Low": 1}
+SEVERITY_HIGH_MIN = 35
+
+# Event codes pack (ward, category, priority) label indexes into one int64
+_WARD_SHIFT = 32
+_CATEGORY_SHIFT = 16
+_FIELD_MASK = 0xFFFF
+
+
+def local_timezone():
+    """Time zone for day buckets: AI_ANALYTICS_TZ, else TZ, else the system zone, else UTC."""
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+    for name in (os.environ.get("AI_ANALYTICS_TZ"), os.environ.get("TZ")):
+        if name:
+            try:
+                return ZoneInfo(name.lstrip(":"))
+            except (ZoneInfoNotFoundError, ValueError):
+                print(f"⚠ Warning: Unknown time zone {name!r}, ignoring")
+    try:
+        with open("/etc/localtime", "rb") as f:
+            return ZoneInfo.from_file(f)
+    except (OSError, ValueError):
+        return timezone.utc
+
+
+ANALYTICS_TZ = local_timezone()
+
+
+def _wall_to_ms(wall, tz):
+    """Epoch ms of a naive local wall time, resolved like JavaScript Date:
+    ambiguous times take the earlier instant, times in a DST gap use the
+    offset from before the transition (both are zoneinfo's fold=0)."""
+    return int(wall.replace(tzinfo=tz, fold=0).timestamp() * 1000)
+
+
+def local_day(ms, tz):
+    """Local calendar day (proleptic ordinal) of an epoch-ms timestamp."""
+    return datetime.fromtimestamp(ms / 1000, tz).date().toordinal()
+
+
+def local_midnight_ms(day, tz):
+    """Epoch ms of Date.setHours(0, 0, 0, 0) on a local day ordinal."""
+    return _wall_to_ms(datetime.combine(date.fromordinal(day), datetime.min.time()), tz)
+
+
+def spike_windows(now_ms, tz):
+    """(baseline start, current start) in epoch ms, as computed by detectSpikes."""
+    today = local_day(now_ms, tz)
+    current_start = local_midnight_ms(today - CURRENT_WINDOW_DAYS, tz)
+    baseline_start = local_midnight_ms(today - CURRENT_WINDOW_DAYS - BASELINE_WINDOW_DAYS, tz)
+    return baseline_start, current_start
+
+
+def hotspot_cutoff(now_ms, tz):
+    """Epoch ms of identifyHotspots' cutoff: now with setDate(getDate() - 30)."""
+    wall = datetime.fromtimestamp(now_ms / 1000, tz).replace(tzinfo=None)
+    return _wall_to_ms(wall - timedelta(days=TIME_WINDOW_DAYS), tz)
+
+
+def mongo_round(value, places):
+    """$round: round half to even on the double's exact value (what round() does)."""
+    return round(value, places)
+
+
+class _Labels:
+    """Label <-> index map; index 0 may be reserved for a missing value."""
+
+    def __init__(self, reserve_none=False):
+        self.labels = [None] if reserve_none else []
+        self.index = {None: 0} if reserve_none else {}
+
+    def encode(self, label):
+        code = self.index.get(label)
+        if code is None:
+            if len(self.labels) > _FIELD_MASK:
+                raise ValueError("Too many distinct labels for the count cube")
+            code = self.index[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+    def __len__(self):
+        return len(self.labels)
+
+
+class ComplaintCountCube:
+    """
+    Counts of complaints by ward x category x priority x local day.
+
+    Complaints are keyed by id, so re-sending a complaint (e.g. after its
+    priority changed) moves its count instead of adding a second one.
+    Complaints without a ward or category are not counted, as in both
+    aggregations; a missing priority is counted for spikes only.
+
+    Args:
+        tz: Time zone of the day buckets (the Node server's zone)
+    """
+
+    def __init__(self, tz=ANALYTICS_TZ):
+        self.tz = tz
+        self._lock = threading.Lock()
+        self._wards = _Labels()
+        self._categories = _Labels()
+        self._priorities = _Labels(reserve_none=True)
+        self._counts = np.zeros((0, 0, 1, 0), dtype=np.int32)
+        self._first_day = None
+        # Per local day: event timestamps and codes, for windows that cut a day
+        self._day_ms = {}
+        self._day_codes = {}
+        # id -> (code, created ms, day)
+        self._by_id = {}
+
+    def __len__(self):
+        return len(self._by_id)
+
+    # ---------------- updates ----------------
+    def _ensure_capacity(self, ward, category, priority, day):
+        w, c, p, d = self._counts.shape
+        if self._first_day is None:
+            self._first_day = day - 63
+            d = 0
+        if day < self._first_day:
+            # Prepend days (with headroom) for complaints older than any seen
+            extra = max(self._first_day - day + 63, d)
+            self._counts = np.concatenate([np.zeros((w, c, p, extra), np.int32), self._counts], axis=3)
+            self._first_day -= extra
+            d += extra
+        offset = day - self._first_day
+        shape = (
+            max(w, ward + 1) if ward < w else max(ward + 1, 2 * w, 8),
+            max(c, category + 1) if category < c else max(category + 1, 2 * c, 8),
+            max(p, priority + 1) if priority < p else max(priority + 1, 2 * p, 4),
+            d if offset < d else max(offset + 64, 2 * d),
+        )
+        if shape != self._counts.shape:
+            grown = np.zeros(shape, dtype=np.int32)
+            grown[:w, :c, :p, :d] = self._counts
+            self._counts = grown
+
+    def _add(self, complaint_id, code, ms):
+        ward, category, priority = code >> _WARD_SHIFT, (code >> _CATEGORY_SHIFT) & _FIELD_MASK, code & _FIELD_MASK
+        day = local_day(ms, self.tz)
+        self._ensure_capacity(ward, category, priority, day)
+        self._counts[ward, category, priority, day - self._first_day] += 1
+        if day not in self._day_ms:
+            self._day_ms[day] = array("q")
+            self._day_codes[day] = array("q")
+        self._day_ms[day].append(ms)
+        self._day_codes[day].append(code)
+        self._by_id[complaint_id] = (code, ms, day)
+
+    def _remove(self, complaint_id):
+        entry = self._by_id.pop(complaint_id, None)
+        if entry is None:
+            return False
+        code, ms, day = entry
+        ward, category, priority = code >> _WARD_SHIFT, (code >> _CATEGORY_SHIFT) & _FIELD_MASK, code & _FIELD_MASK
+        self._counts[ward, category, priority, day - self._first_day] -= 1
+        times, codes = self._day_ms[day], self._day_codes[day]
+        for i in range(len(times)):
+            if times[i] == ms and codes[i] == code:
+                del times[i]
+                del codes[i]
+                break
+        return True
+
+    def upsert(self, complaint_id, ward, category, priority, created_at_ms):
+        """
+        Count one complaint, replacing any earlier version with the same id.
+
+        Returns:
+            True if the complaint is counted (it has a ward and category)
+        """
+        with self._lock:
+            self._remove(complaint_id)
+            if ward is None or category is None or created_at_ms is None:
+                return False
+            code = (
+                (self._wards.encode(ward) << _WARD_SHIFT)
+                | (self._categories.encode(category) << _CATEGORY_SHIFT)
+                | self._priorities.encode(priority)
+            )
+            self._add(complaint_id, code, int(created_at_ms))
+            return True
+
+    def delete(self, complaint_ids):
+        """Stop counting complaints; returns how many were counted."""
+        with self._lock:
+            return sum(self._remove(complaint_id) for complaint_id in complaint_ids)
+
+    def ingest_records(self, records):
+        """
+        Upsert export records (id/_id, ward, category, priority, createdAt).
+
+        Returns:
+            (records read, complaints counted)
+        """
+        read = counted = 0
+        for row, record in enumerate(records):
+            read += 1
+            complaint_id = record.get("id", record.get("_id"))
+            if isinstance(complaint_id, dict):
+                complaint_id = complaint_id.get("$oid")
+            counted += self.upsert(
+                str(complaint_id) if complaint_id is not None else f"row-{row}",
+                _field(record, "ward"),
+                _field(record, "category"),
+                _field(record, "priority"),
+                parse_created_at(record.get("createdAt")),
+            )
+        return read, counted
+
+    @classmethod
+    def from_records(cls, records, tz=ANALYTICS_TZ):
+        """Build a cube from an iterable of export records."""
+        cube = cls(tz)
+        cube.ingest_records(records)
+        return cube
+
+    # ---------------- window sums ----------------
+    def _day_range(self, first_day, last_day):
+        """Cube slice for local days [first_day, last_day] (either may be None = open)."""
+        size = self._counts.shape[3]
+        start = 0 if first_day is None else min(max(first_day - self._first_day, 0), size)
+        stop = size if last_day is None else min(max(last_day - self._first_day + 1, 0), size)
+        return self._counts[..., start:stop].sum(axis=3, dtype=np.int64)
+
+    def _day_events(self, day, keep):
+        """Counts (ward, category, priority) of one day's events whose timestamp passes keep(ms array)."""
+        counts = np.zeros(self._counts.shape[:3], dtype=np.int64)
+        if day not in self._day_ms:
+            return counts
+        # Copies, not buffer views: a live view would block appends to the arrays
+        times = np.array(self._day_ms[day], dtype=np.int64)
+        codes = np.array(self._day_codes[day], dtype=np.int64)[keep(times)]
+        np.add.at(counts, (codes >> _WARD_SHIFT, (codes >> _CATEGORY_SHIFT) & _FIELD_MASK, codes & _FIELD_MASK), 1)
+        return counts
+
+    def spike_counts(self, now_ms):
+        """(current, baseline) counts per ward x category for detectSpikes' windows."""
+        today = local_day(now_ms, self.tz)
+        baseline_first = today - CURRENT_WINDOW_DAYS - BASELINE_WINDOW_DAYS
+        current_first = today - CURRENT_WINDOW_DAYS
+        with self._lock:
+            if self._first_day is None:
+                return np.zeros((0, 0), np.int64), np.zeros((0, 0), np.int64)
+            baseline = self._day_range(baseline_first, current_first - 1)
+            # [current start, now): whole days up to today, minus today's events at or after now
+            current = self._day_range(current_first, today) - self._day_events(today, lambda t: t >= now_ms)
+        return current.sum(axis=2), baseline.sum(axis=2)
+
+    def hotspot_counts(self, now_ms):
+        """Counts per ward x category x priority (missing priority excluded) in identifyHotspots' window."""
+        cutoff = hotspot_cutoff(now_ms, self.tz)
+        cutoff_day = local_day(cutoff, self.tz)
+        with self._lock:
+            if self._first_day is None:
+                return np.zeros((0, 0, 0), np.int64)
+            # [cutoff, ...): days after the cutoff day, plus the cutoff day's events from the cutoff on
+            counts = self._day_range(cutoff_day + 1, None) + self._day_events(cutoff_day, lambda t: t >= cutoff)
+        counts[:, :, 0] = 0
+        return counts
+
+    # ---------------- rules ----------------
+    def detect_spikes(self, now_ms):
+        """detectSpikes' output for the given time, ordered by spikeRatio descending."""
+        current, baseline = self.spike_counts(now_ms)
+        average = baseline * 7 / BASELINE_WINDOW_DAYS
+        ratio = np.divide(current, average, out=np.zeros(average.shape), where=average > 0)
+        wards, categories = np.nonzero((average >= MIN_BASELINE_COMPLAINTS) & (ratio >= SPIKE_MULTIPLIER_THRESHOLD))
+        spikes = [
+            {
+                "ward": self._wards.labels[w],
+                "category": self._categories.labels[c],
+                "baselineWeeklyAvg": mongo_round(float(average[w, c]), 1),
+                "currentWeekCount": int(current[w, c]),
+                "spikeRatio": mongo_round(float(ratio[w, c]), 1),
+                "severity": "Severe" if ratio[w, c] >= SEVERITY_SEVERE_MIN else "Moderate",
+            }
+            for w, c in zip(wards.tolist(), categories.tolist())
+        ]
+        spikes.sort(key=lambda s: (-s["spikeRatio"], s["ward"], s["category"]))
+        return spikes
+
+    def identify_hotspots(self, now_ms):
+        """identifyHotspots' output for the given time, ordered by hotspotScore descending."""
+        counts = self.hotspot_counts(now_ms)
+        weights = np.array([PRIORITY_WEIGHT.get(label, 0) for label in self._priorities.labels]
+                           + [0] * (counts.shape[2] - len(self._priorities)), dtype=np.int64)
+        totals = counts.sum(axis=2)
+        scores = counts @ weights
+        wards, categories = np.nonzero((totals >= MIN_COMPLAINTS) & (scores >= HOTSPOT_SCORE_THRESHOLD))
+        hotspots = [
+            {
+                "ward": self._wards.labels[w],
+                "category": self._categories.labels[c],
+                "complaintCount": int(totals[w, c]),
+                "hotspotScore": int(scores[w, c]),
+                "severity": "High" if scores[w, c] >= SEVERITY_HIGH_MIN else "Medium",
+            }
+            for w, c in zip(wards.tolist(), categories.tolist())
+        ]
+        hotspots.sort(key=lambda h: (-h["hotspotScore"], h["ward"], h["category"]))
+        return hotspots
+
+    def stats(self):
+        with self._lock:
+            return {
+                "complaints": len(self._by_id),
+                "wards": len(self._wards),
+                "categories": len(self._categories),
+                "priorities": len(self._priorities) - 1,
+                "days": int(self._counts.shape[3]),
+                "firstDay": date.fromordinal(self._first_day).isoformat() if self._first_day is not None else None,
+                "cubeBytes": int(self._counts.nbytes),
+                "timeZone": getattr(self.tz, "key", None) or ("localtime" if self.tz is not timezone.utc else "UTC"),
+            }
+
+
+def _field(record, name):
+    """Export field value; empty values (blank CSV cells) count as missing."""
+    value = record.get(name)
+    return None if value == "" else value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spike and hotspot analytics from a complaint export")
+    parser.add_argument("input", help="JSONL or CSV export (id/_id, ward, category, priority, createdAt), or a snapshot directory")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="Input format (default: from extension)")
+    parser.add_argument("--now", default=None, help="Evaluate as of this ISO time (default: current time)")
+    args = parser.parse_args()
+
+    import time
+    from bulk_classify import detect_format, read_records
+    from complaint_snapshot import is_snapshot, iter_snapshot_records
+
+    started = time.perf_counter()
+    cube = ComplaintCountCube()
+    if is_snapshot(args.input):
+        read, counted = cube.ingest_records(iter_snapshot_records(args.input, ["id", "ward", "category", "priority", "createdAt"]))
+    else:
+        with open(args.input, encoding="utf-8", newline="") as f:
+            read, counted = cube.ingest_records(read_records(f, args.format or detect_format(args.input)))
+    print(f"[OK] Built cube from {read} records ({counted} counted) in {time.perf_counter() - started:.2f}s",
+          file=sys.stderr)
+
+    now_ms = parse_created_at(args.now) if args.now else int(time.time() * 1000)
+    started = time.perf_counter()
+    result = {"spikes": cube.detect_spikes(now_ms), "hotspots": cube.identify_hotspots(now_ms), "cube": cube.stats()}
+    print(f"[OK] Spikes and hotspots in {(time.perf_counter() - started) * 1000:.2f} ms", file=sys.stderr)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
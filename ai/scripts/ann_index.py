@@ -0,0 +1,100 @@
+"""
+Approximate Nearest-Neighbour Building Blocks (pure NumPy, CPU only)
+- spherical k-means coarse quantizer for an inverted-file (IVF) index
+- int8 scalar quantization of normalized embeddings
+- recall measurement against exact (brute-force) search
+
+Used by vector_index.ComplaintVectorIndex; see benchmark_ann.py for the
+recall-vs-latency benchmark.
+"""
+
+import numpy as np
+
+
+# Rows scored per matrix multiply when assigning vectors to lists
+ASSIGN_CHUNK_ROWS = 65536
+
+
+def spherical_kmeans(vectors, n_lists, n_iter=20, max_train_points=None, seed=42):
+    """
+    Train coarse centroids on L2-normalized vectors (cosine k-means).
+
+    Args:
+        vectors: float32 array (n, dim), rows L2-normalized
+        n_lists: Number of centroids (inverted lists)
+        n_iter: Lloyd iterations
+        max_train_points: Train on a random sample of at most this many rows
+        seed: Random seed for sampling and initialization
+
+    Returns:
+        float32 array (n_lists, dim) of normalized centroids
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    if n == 0:
+        raise ValueError("Cannot train centroids on an empty index")
+    n_lists = max(1, min(n_lists, n))
+    if max_train_points and n > max_train_points:
+        vectors = vectors[rng.choice(n, max_train_points, replace=False)]
+        n = len(vectors)
+
+    centroids = vectors[rng.choice(n, n_lists, replace=False)].astype(np.float32, copy=True)
+    for _ in range(n_iter):
+        assignments = assign_lists(vectors, centroids)
+        counts = np.bincount(assignments, minlength=n_lists)
+        # Per-list sums via one sort + segmented reduction
+        order = np.argsort(assignments, kind="stable")
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(vectors[order], starts, axis=0)
+        # Re-seed empty lists with random points
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(n, len(empty), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = (sums / np.maximum(norms, 1e-12)).astype(np.float32)
+    return centroids
+
+
+def assign_lists(vectors, centroids):
+    """Nearest centroid (by cosine) for each row, computed in chunks."""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_CHUNK_ROWS):
+        chunk = vectors[start:start + ASSIGN_CHUNK_ROWS]
+        assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+def probe_lists(query, centroids, nprobe):
+    """Ids of the nprobe lists whose centroids are closest to the query."""
+    nprobe = max(1, min(nprobe, len(centroids)))
+    scores = centroids @ query
+    return np.argpartition(-scores, nprobe - 1)[:nprobe]
+
+
+def quantize_int8(vectors):
+    """
+    Symmetric per-row int8 quantization.
+
+    Returns:
+        (codes int8 (n, dim), scales float32 (n,)) with vector ~= codes * scale
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def dequantize_int8(codes, scales):
+    """Reconstruct float32 vectors from int8 codes and per-row scales."""
+    return codes.astype(np.float32) * scales[:, None]
+
+
+def recall_at_k(approx_ids, exact_ids):
+    """Fraction of exact top-k ids recovered by the approximate search."""
+    exact = set(exact_ids)
+    if not exact:
+        return 1.0
+    return len(exact.intersection(approx_ids)) / len(exact)
@@ -0,0 +1,100 @@
+"""
+ANN Benchmark - recall vs latency of the IVF complaint index
+Compares approximate (IVF, optional int8 storage) search against exact
+brute-force search on the same vectors.
+
+Usage:
+    python scripts/benchmark_ann.py                       # synthetic clustered vectors
+    python scripts/benchmark_ann.py --embeddings emb.npy  # real MiniLM embeddings
+    python scripts/benchmark_ann.py --rows 300000 --nprobe 1 4 8 16 32 --json out.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ann_index import recall_at_k
+from vector_index import ComplaintVectorIndex
+
+
+def synthetic_vectors(rows, dim, n_topics, seed):
+    """Clustered unit vectors that mimic templated complaint embeddings."""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    vectors = topics[rng.integers(0, n_topics, rows)]
+    vectors += 0.35 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return vectors
+
+
+def build_index(vectors, storage, mode):
+    index = ComplaintVectorIndex(vectors.shape[1], initial_capacity=len(vectors),
+                                 storage=storage, mode=mode, ann_min_size=len(vectors) + 1)
+    ids = [str(i) for i in range(len(vectors))]
+    index.upsert(ids, vectors, ["Water"] * len(ids), ["Ward 1"] * len(ids),
+                 np.zeros(len(ids), dtype=np.int64))
+    return index
+
+
+def time_searches(index, queries, k, **kwargs):
+    """Return (results per query, mean latency in ms)."""
+    start = time.perf_counter()
+    results = [[r["id"] for r in index.search(q, k=k, **kwargs)] for q in queries]
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", help=".npy matrix of embeddings (default: synthetic)")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=0, help="IVF lists (default 4*sqrt(rows))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.embeddings:
+        vectors = np.load(args.embeddings, mmap_mode="r").astype(np.float32)
+    else:
+        vectors = synthetic_vectors(args.rows, args.dim, max(16, args.rows // 500), args.seed)
+    query_rows = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    # Perturb queries so they are near, not identical to, indexed rows
+    queries = vectors[query_rows] + 0.1 * rng.standard_normal((len(query_rows), vectors.shape[1])).astype(np.float32)
+
+    print(f"Vectors: {vectors.shape}, queries: {len(queries)}, k={args.k}")
+    exact_index = build_index(vectors, "float32", "exact")
+    exact_results, exact_ms = time_searches(exact_index, queries, args.k)
+    print(f"  exact float32          : {exact_ms:8.3f} ms/query  recall 1.000")
+
+    report = {"rows": len(vectors), "dim": int(vectors.shape[1]), "k": args.k,
+              "exactMs": exact_ms, "runs": []}
+    for storage in ("float32", "int8"):
+        index = build_index(vectors, storage, "ivf")
+        start = time.perf_counter()
+        n_lists = index.train_ann(n_lists=args.n_lists or None)
+        train_s = time.perf_counter() - start
+        print(f"  ivf {storage:7s} trained {n_lists} lists in {train_s:.1f}s "
+              f"({index.stats()['memoryBytes'] / 1e6:.1f} MB vectors)")
+        for nprobe in args.nprobe:
+            results, ms = time_searches(index, queries, args.k, nprobe=nprobe)
+            recall = float(np.mean([recall_at_k(a, e) for a, e in zip(results, exact_results)]))
+            print(f"  ivf {storage:7s} nprobe={nprobe:<4d}: {ms:8.3f} ms/query  recall {recall:.3f}")
+            report["runs"].append({"storage": storage, "nLists": n_lists, "nprobe": nprobe,
+                                   "msPerQuery": ms, "recall": recall, "trainSeconds": train_s})
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[OK] Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Normalizer Parity Check and Micro-Benchmark
+Verifies that normalize_text / normalize_batch produce byte-identical
+output to normalize_text_reference, then times them.
+
+Usage:
+    python scripts/benchmark_normalizer.py                 # fuzz corpus + dataset
+    python scripts/benchmark_normalizer.py --fuzz 200000   # larger fuzz corpus
+Exits with status 1 on any mismatch.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from text_normalizer import (
+    ABBREVIATIONS,
+    normalize_batch,
+    normalize_text,
+    normalize_text_reference,
+)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_DIR, "data", "complaints.csv")
+
+# Edge cases around word boundaries, punctuation and whitespace
+EDGE_CASES = [
+    "", " ", "st", "St.", "st..", "st.!", "st!!", "(st)", "st,st", "u r 2 late!!!",
+    "pls fix the lite on main st.", "Wtr   leak\tnear\nward 4??", "4 4 4", "2.", ".u",
+    "n. w, b; c: r?", "st.,", "dr...", "ST:", "san-francisco", "elec.pwr", "thx!!!??...",
+    " st rd　", "İstanbul st", "x\x1cst\x1dy", "…st", "st​", "u!?",
+]
+
+FUZZ_WORDS = list(ABBREVIATIONS) + [
+    "street", "light", "garbage", "water", "pipe", "leak", "near", "ward", "road", "Not",
+    "WORKING", "pothole", "", "ST", "Rd", "u", "2", "4",
+]
+FUZZ_SEPARATORS = [" ", "  ", "\t", "\n", " ", " ", "\x0b", "\x1c", "​", ""]
+FUZZ_PUNCT = ["", "", "", ".", ",", "!", "?", ";", ":", "..", "!!", "??", "...", "!?", ".,", "-", "'"]
+
+
+def fuzz_corpus(n, seed=42):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        parts = []
+        for _ in range(rng.randint(0, 12)):
+            parts.append(rng.choice(FUZZ_PUNCT[:3] + ["(", "\""]) if rng.random() < 0.1 else "")
+            parts.append(rng.choice(FUZZ_WORDS))
+            parts.append(rng.choice(FUZZ_PUNCT))
+            parts.append(rng.choice(FUZZ_SEPARATORS))
+        corpus.append("".join(parts))
+    return corpus
+
+
+def whitespace_corpus():
+    """Every code point that str.split() or re's \\s might treat as whitespace."""
+    return [f"st{chr(c)}u{chr(c)}" for c in range(0x110000) if chr(c).isspace() or c in (0x1c, 0x1d, 0x1e, 0x1f, 0x85)]
+
+
+def load_dataset_texts():
+    if not os.path.exists(DATA_PATH):
+        return []
+    import pandas as pd
+    try:
+        df = pd.read_csv(DATA_PATH)
+    except Exception:
+        return []
+    if 'title' in df.columns and 'description' in df.columns:
+        texts = (df['title'] + '. ' + df['description']).tolist()
+        return texts + df.get('text', df['title']).tolist()
+    return df['text'].tolist() if 'text' in df.columns else []
+
+
+def check_parity(texts):
+    """Return list of (text, expected, actual) mismatches across all APIs."""
+    mismatches = []
+    expected = [normalize_text_reference(t) for t in texts]
+    batch = normalize_batch(texts)
+    for text, want, got_single, got_batch in zip(texts, expected, map(normalize_text, texts), batch):
+        if want != got_single or want != got_batch:
+            mismatches.append((text, want, got_single if want != got_single else got_batch))
+    for value in (None, float("nan"), 3):
+        if normalize_text(value) != "":
+            mismatches.append((value, "", normalize_text(value)))
+    return mismatches
+
+
+def bench(name, fn, texts, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(texts)
+        best = min(best, time.perf_counter() - start)
+    print(f"  {name:28s}: {best * 1000:9.1f} ms  ({len(texts) / best:,.0f} texts/s)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fuzz", type=int, default=50000, help="Number of random fuzz texts")
+    args = parser.parse_args()
+
+    dataset = load_dataset_texts()
+    corpus = EDGE_CASES + whitespace_corpus() + fuzz_corpus(args.fuzz) + dataset
+    print(f"Checking parity on {len(corpus)} texts ({len(dataset)} from dataset)...")
+    mismatches = check_parity(corpus)
+    if mismatches:
+        print(f"  MISMATCH on {len(mismatches)} texts, first few:")
+        for text, want, got in mismatches[:10]:
+            print(f"    input={text!r}\n      expected={want!r}\n      actual  ={got!r}")
+        sys.exit(1)
+    print("  [OK] Byte-identical output")
+
+    texts = (dataset or fuzz_corpus(20000, seed=7))
+    print(f"\nBenchmark on {len(texts)} texts:")
+    ref = bench("reference (per text)", lambda ts: [normalize_text_reference(t) for t in ts], texts)
+    new = bench("normalize_batch", normalize_batch, texts)
+    print(f"  Speedup: {ref / new:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+AI Service Benchmark - latency / throughput of /predict, /embed, /similarity
+Drives the FastAPI app either in-process (ASGI transport, no sockets) or
+over local HTTP against a uvicorn server started for the run. Request
+texts come from the generate_dataset.py templates.
+
+Reports, per endpoint and concurrency level:
+    p50 / p95 / p99 / mean latency (ms), requests/sec, errors,
+    mean realized micro-batch size (X-Batch-Size)
+plus per-stage timing (normalize / encode / head) measured in-process at
+batch size 1 and 32, and the service's peak RSS.
+
+The embedding cache is disabled for the run (AI_EMBED_CACHE_SIZE=0) so
+repeated template texts do not skip the encoder; pass --cache to keep it.
+Other AI_* settings (e.g. AI_ENCODER_BACKEND, AI_BATCH_WINDOW_MS) are read
+from the environment; their effective values are recorded in the output.
+
+Usage:
+    python scripts/benchmark_service.py --json fp32.json
+    AI_ENCODER_BACKEND=torch-int8 python scripts/benchmark_service.py --json int8.json
+    python scripts/benchmark_service.py --transport http --concurrency 1 8 32 --json http.json
+    python scripts/benchmark_service.py --compare fp32.json int8.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SCRIPTS_DIR)
+sys.path.insert(0, SCRIPTS_DIR)
+
+ENDPOINTS = ("predict", "embed", "similarity")
+STAGE_BATCH_SIZES = (1, 32)
+
+
+def make_texts(count, seed):
+    """Raw complaint texts ("<title>. <description>") from the dataset templates."""
+    from generate_dataset import generate_chunk, plan_chunks
+
+    texts = []
+    for chunk in plan_chunks(count, count):
+        for title, description, _, _, _ in generate_chunk(seed, *chunk):
+            texts.append(f"{title}. {description}")
+    return texts
+
+
+def request_for(endpoint, texts, i):
+    """(path, json body) for the i-th request to an endpoint."""
+    text = texts[i % len(texts)]
+    if endpoint == "predict":
+        return "/predict", {"text": text}
+    if endpoint == "embed":
+        return "/embed", {"text": text}
+    return "/similarity", {"text1": text, "text2": texts[(i + 1) % len(texts)]}
+
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)), 3) if values else None
+
+
+async def run_level(client, endpoint, texts, concurrency, total_requests):
+    """Closed-loop load: `concurrency` workers issue total_requests requests."""
+    latencies = []
+    batch_sizes = []
+    errors = 0
+    counter = iter(range(total_requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            path, body = request_for(endpoint, texts, i)
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+                response = None
+            latencies.append((time.perf_counter() - started) * 1000)
+            if not ok:
+                errors += 1
+            elif "x-batch-size" in response.headers:
+                batch_sizes.append(int(response.headers["x-batch-size"]))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total_requests,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(total_requests / elapsed, 1),
+        "p50Ms": percentile(latencies, 50),
+        "p95Ms": percentile(latencies, 95),
+        "p99Ms": percentile(latencies, 99),
+        "meanMs": round(float(np.mean(latencies)), 3),
+        "meanBatchSize": round(float(np.mean(batch_sizes)), 2) if batch_sizes else None,
+    }
+
+
+async def run_load(client, endpoints, texts, levels, requests_per_level, warmup):
+    results = {}
+    for endpoint in endpoints:
+        await run_level(client, endpoint, texts, 1, warmup)
+        results[endpoint] = {}
+        for concurrency in levels:
+            result = await run_level(client, endpoint, texts, concurrency, max(requests_per_level, concurrency))
+            results[endpoint][str(concurrency)] = result
+            print(f"  {endpoint:10} c={concurrency:<4} p50 {result['p50Ms']:8.2f}  p95 {result['p95Ms']:8.2f}  "
+                  f"p99 {result['p99Ms']:8.2f} ms  {result['rps']:8.1f} req/s  errors {result['errors']}")
+    return results
+
+
+def stage_timings(texts, repeats=20):
+    """
+    Per-stage cost in ms/text: normalize, encode (shared encoder, no cache)
+    and each loaded head on precomputed embeddings.
+    """
+    from encoder import encode_texts
+    from model_bundle import load_model_bundle
+    from predictor import is_semantic_head
+    from text_normalizer import normalize_batch
+
+    model_dir = os.path.join(BASE_DIR, "model")
+    heads = {}
+    for task in ("category", "priority"):
+        model, _ = load_model_bundle(task, model_dir)
+        if model is not None:
+            heads[task] = model
+
+    def best_ms(fn, batch):
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            fn(batch)
+            timings.append(time.perf_counter() - started)
+        return round(min(timings) * 1000 / len(batch), 4)
+
+    results = {}
+    for batch_size in STAGE_BATCH_SIZES:
+        raw = texts[:batch_size]
+        normalized = normalize_batch(raw)
+        embeddings = encode_texts(normalized, use_cache=False)
+        stages = {
+            "normalize": best_ms(normalize_batch, raw),
+            "encode": best_ms(lambda b: encode_texts(b, use_cache=False), normalized),
+        }
+        for task, model in heads.items():
+            if is_semantic_head(model):
+                stages[f"{task}Head"] = best_ms(model.predict_proba_from_embeddings, embeddings)
+            else:
+                stages[f"{task}Head"] = best_ms(model.predict_proba, normalized)
+        results[str(batch_size)] = stages
+        print(f"  stages b={batch_size:<3} " + "  ".join(f"{k} {v:.3f}" for k, v in stages.items()) + " ms/text")
+    return results
+
+
+def service_settings():
+    """Effective service settings (environment or defaults) for this run."""
+    import embedding_cache
+    import encoder
+    import inference_executor
+    import micro_batcher
+
+    return {
+        "encoderName": encoder.ENCODER_NAME,
+        "encoderBackend": encoder.ENCODER_BACKEND,
+        "onnxFile": encoder.ONNX_FILE,
+        "batchWindowMs": micro_batcher.BATCH_WINDOW_MS,
+        "batchMaxSize": micro_batcher.BATCH_MAX_SIZE,
+        "inferenceWorkers": inference_executor.INFERENCE_WORKERS,
+        "inferenceMaxQueue": inference_executor.INFERENCE_MAX_QUEUE,
+        "requestDeadlineMs": inference_executor.REQUEST_DEADLINE_MS,
+        "embedCacheSize": embedding_cache.EMBED_CACHE_SIZE,
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_peak_rss_mb(pid):
+    """Peak RSS (VmHWM) of another process on Linux, else None."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def self_peak_rss_mb():
+    """Peak RSS of this process, or None where the resource module is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def wait_until_ready(client, timeout, server=None):
+    """Poll /health/ready until the service has loaded and warmed its models."""
+    import httpx
+
+    deadline = time.time() + timeout
+    while True:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            response = await client.get("/health/ready")
+            if response.status_code == 200:
+                return response.json()
+            if response.json().get("status") == "failed":
+                raise RuntimeError(f"Service startup failed: {response.json().get('error')}")
+        except httpx.TransportError:
+            pass
+        if time.time() > deadline:
+            raise RuntimeError("Service did not become ready in time")
+        await asyncio.sleep(0.5)
+
+
+async def bench_asgi(args, texts):
+    import httpx
+
+    sys.path.insert(0, BASE_DIR)
+    from api.app import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            await wait_until_ready(client, args.startup_timeout)
+            load = await run_load(client, args.endpoints, texts, args.concurrency, args.requests, args.warmup)
+    return load, self_peak_rss_mb()
+
+
+async def bench_http(args, texts, env):
+    import httpx
+
+    port = free_port()
+    command = [sys.executable, "-m", "uvicorn", "api.app:app", "--host", "127.0.0.1",
+               "--port", str(port), "--log-level", "warning"]
+    server = subprocess.Popen(command, cwd=BASE_DIR, env=env)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=600,
+                                     limits=httpx.Limits(max_connections=max(args.concurrency))) as client:
+            await wait_until_ready(client, args.startup_timeout, server)
+            load = await run_load(client, args.endpoints, texts, args.concurrency, args.requests, args.warmup)
+        return load, process_peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def compare(path_a, path_b):
+    """Print latency / throughput deltas of run B against run A."""
+    with open(path_a, encoding="utf-8") as f:
+        a = json.load(f)
+    with open(path_b, encoding="utf-8") as f:
+        b = json.load(f)
+
+    def change(old, new):
+        if old in (None, 0) or new is None:
+            return "    n/a"
+        return f"{(new - old) / old * 100:+6.1f}%"
+
+    print(f"A: {path_a} ({a['meta']['settings']})")
+    print(f"B: {path_b} ({b['meta']['settings']})\n")
+    print(f"{'endpoint':10} {'c':>4}  {'p50 A':>8} {'p50 B':>8} {'Δ':>7}  {'p99 A':>8} {'p99 B':>8} {'Δ':>7}  "
+          f"{'rps A':>8} {'rps B':>8} {'Δ':>7}")
+    for endpoint, levels in a["endpoints"].items():
+        for level, ra in levels.items():
+            rb = b["endpoints"].get(endpoint, {}).get(level)
+            if rb is None:
+                continue
+            print(f"{endpoint:10} {level:>4}  {ra['p50Ms']:8.2f} {rb['p50Ms']:8.2f} {change(ra['p50Ms'], rb['p50Ms'])}  "
+                  f"{ra['p99Ms']:8.2f} {rb['p99Ms']:8.2f} {change(ra['p99Ms'], rb['p99Ms'])}  "
+                  f"{ra['rps']:8.1f} {rb['rps']:8.1f} {change(ra['rps'], rb['rps'])}")
+    for batch_size, stages in (a.get("stages") or {}).items():
+        other = (b.get("stages") or {}).get(batch_size, {})
+        for stage, value in stages.items():
+            if stage in other:
+                print(f"stage {stage:14} b={batch_size:<3} {value:8.3f} -> {other[stage]:8.3f} ms/text "
+                      f"{change(value, other[stage])}")
+    print(f"peak RSS MB: {a.get('peakRssMb')} -> {b.get('peakRssMb')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AI service endpoints")
+    parser.add_argument("--transport", choices=["asgi", "http"], default="asgi")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--texts", type=int, default=2000, help="Distinct request texts")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache", action="store_true", help="Keep the embedding cache enabled")
+    parser.add_argument("--no-stages", action="store_true", help="Skip the in-process per-stage timing")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("A", "B"), help="Compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if not args.cache:
+        os.environ["AI_EMBED_CACHE_SIZE"] = "0"
+        os.environ.pop("AI_EMBED_CACHE_PATH", None)
+    settings = service_settings()
+    texts = make_texts(args.texts, args.seed)
+
+    print(f"Benchmarking {', '.join(args.endpoints)} over {args.transport} "
+          f"(concurrency {args.concurrency}, {args.requests} requests per level)")
+    if args.transport == "asgi":
+        load, peak_rss = asyncio.run(bench_asgi(args, texts))
+    else:
+        load, peak_rss = asyncio.run(bench_http(args, texts, dict(os.environ)))
+
+    stages = None if args.no_stages else stage_timings(texts)
+
+    import torch
+    output = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "transport": args.transport,
+            "settings": settings,
+            "requestsPerLevel": args.requests,
+            "texts": args.texts,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "torchThreads": torch.get_num_threads(),
+            "cpuCount": os.cpu_count(),
+            "machine": platform.machine(),
+        },
+        "endpoints": load,
+        "stages": stages,
+        "peakRssMb": peak_rss,
+    }
+    print(f"  peak RSS: {peak_rss} MB ({'service process' if args.transport == 'http' else 'benchmark process'})")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+        print(f"[OK] Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
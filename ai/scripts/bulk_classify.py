@@ -0,0 +1,317 @@
+"""
+Bulk Complaint Classification
+Re-predicts category and priority for many stored complaints, e.g. after
+shipping a new MODEL_VERSION. Input is streamed (JSONL or CSV) in chunks;
+each chunk is normalized, encoded once and scored by both heads with the
+same rules as the /predict endpoint ("Uncertain" below 0.65). Results are
+written out chunk by chunk, so memory stays bounded regardless of input size.
+With a lexical head in the model directory (lexical_cascade.py), rows it
+is confident about skip the encoder for the category head, as in /predict.
+
+Each input record needs either a "text" field or "title"/"description"
+fields (combined as "<title>. <description>", like the Node server does).
+An "id" (or "_id") field is copied to the output. A line that cannot be
+parsed becomes an output row with an "error" instead of ending the run.
+
+Usage:
+    python scripts/bulk_classify.py complaints.jsonl -o predictions.jsonl
+    python scripts/bulk_classify.py data/complaints.csv -o predictions.csv --chunk-size 512
+    cat complaints.jsonl | python scripts/bulk_classify.py - > predictions.jsonl
+
+The AI service exposes the same pipeline as POST /predict/bulk.
+
+Settings (environment variables):
+    AI_BULK_CHUNK_SIZE    - rows per normalize/encode/predict chunk (default 256)
+    AI_BULK_ENCODE_BATCH  - encoder batch size inside a chunk (default 64)
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from encoder import encode_texts
+from predictor import DEFAULT_PRIORITY, plan_cascade, predict_planned
+from text_normalizer import normalize_batch
+
+
+BULK_CHUNK_SIZE = int(os.environ.get("AI_BULK_CHUNK_SIZE", "256"))
+BULK_ENCODE_BATCH = int(os.environ.get("AI_BULK_ENCODE_BATCH", "64"))
+
+BULK_FORMATS = ("jsonl", "csv")
+
+# Column order for CSV output
+OUTPUT_FIELDS = [
+    "row", "id", "decision", "category", "categoryConfidence",
+    "priority", "priorityConfidence", "model_version", "categorySource", "error",
+]
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.path.join(BASE_DIR, "model")
+
+
+def detect_format(path, default="jsonl"):
+    """Pick "csv" or "jsonl" from a file extension."""
+    if path and path != "-":
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".csv":
+            return "csv"
+        if extension in (".jsonl", ".ndjson", ".json"):
+            return "jsonl"
+    return default
+
+
+class InvalidRecord(dict):
+    """An input line that could not be parsed; classified as an error row."""
+
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+
+def read_records(stream, fmt, invalid="raise"):
+    """
+    Lazily parse records from a text stream.
+
+    Args:
+        stream: Text file object (read line by line)
+        fmt: "jsonl" or "csv" (CSV needs a header row)
+        invalid: "raise" (ValueError) or "record" (yield an InvalidRecord
+            and keep reading) for a line that cannot be parsed
+
+    Yields:
+        One dict per record; blank JSONL lines are skipped
+    """
+    def bad(message):
+        if invalid == "raise":
+            raise ValueError(message)
+        return InvalidRecord(message)
+
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        while True:
+            try:
+                yield next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield bad(f"Invalid CSV on line {reader.line_num}: {e}")
+        return
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield bad(f"Invalid JSON on line {line_number}: {e}")
+            continue
+        if not isinstance(record, dict):
+            yield bad(f"Line {line_number} is not a JSON object")
+            continue
+        yield record
+
+
+def record_text(record):
+    """Complaint text for a record: "text", else "<title>. <description>"."""
+    text = record.get("text")
+    if text:
+        return str(text)
+    title = record.get("title") or ""
+    description = record.get("description") or ""
+    if not title and not description:
+        return None
+    return f"{title}. {description}".strip()
+
+
+def record_id(record):
+    """Record id from "id" or "_id" (a Mongo extended-JSON {"$oid": ...} is unwrapped); None if missing."""
+    value = record.get("id", record.get("_id"))
+    if isinstance(value, dict):
+        value = value.get("$oid")
+    return None if value is None else str(value)
+
+
+def chunked(iterable, size):
+    """Yield lists of at most size items."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def classify_chunk(records, category_model, priority_model, first_row=0, lexical_model=None):
+    """
+    Classify one chunk of records with one encoder pass and one pass per head
+    (with a lexical head, only escalated rows are encoded for the category head).
+
+    Returns:
+        List of output rows (dicts) in input order
+    """
+    texts = [record_text(record) for record in records]
+    valid = [i for i, text in enumerate(texts) if text is not None]
+    normalized = normalize_batch([texts[i] for i in valid])
+
+    predictions = []
+    if normalized:
+        plan = plan_cascade(normalized, category_model, priority_model, lexical_model)
+        vectors = None
+        if plan["vector_rows"]:
+            # Backfills touch each complaint once: skip the embedding cache
+            vectors = encode_texts([normalized[j] for j in plan["vector_rows"]],
+                                   batch_size=BULK_ENCODE_BATCH, use_cache=False)
+        predictions, _ = predict_planned(
+            normalized, plan, category_model, priority_model, lexical_model, vectors
+        )
+
+    rows = []
+    by_row = dict(zip(valid, predictions))
+    for i, record in enumerate(records):
+        row = {"row": first_row + i, "id": record_id(record)}
+        if i in by_row:
+            row.update(by_row[i])
+        else:
+            row.update({"decision": "AI_PREDICTED", "category": "Uncertain", "categoryConfidence": 0.0,
+                        "priority": DEFAULT_PRIORITY, "priorityConfidence": 0.0,
+                        "error": getattr(record, "error", "Missing text")})
+        rows.append(row)
+    return rows
+
+
+class BulkStats:
+    """Row counter and throughput for a bulk run."""
+
+    def __init__(self):
+        self.rows = 0
+        self.chunks = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+
+    def record(self, rows):
+        self.rows += len(rows)
+        self.chunks += 1
+        self.errors += sum(1 for row in rows if row.get("error"))
+
+    def as_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "chunks": self.chunks,
+            "errors": self.errors,
+            "seconds": round(elapsed, 3),
+            "rowsPerSec": round(self.rows / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+def classify_records(records, category_model, priority_model, chunk_size=BULK_CHUNK_SIZE, stats=None,
+                     lexical_model=None):
+    """
+    Stream records through the prediction pipeline chunk by chunk.
+
+    Args:
+        records: Iterable of record dicts (consumed lazily)
+        category_model: Category classifier (or None if not loaded)
+        priority_model: Priority classifier (or None if not loaded)
+        chunk_size: Rows per chunk
+        stats: Optional BulkStats updated after each chunk
+        lexical_model: Optional lexical cascade head (see lexical_cascade.py)
+
+    Yields:
+        Lists of output rows, one list per chunk
+    """
+    first_row = 0
+    for chunk in chunked(records, max(1, chunk_size)):
+        rows = classify_chunk(chunk, category_model, priority_model, first_row, lexical_model)
+        first_row += len(chunk)
+        if stats is not None:
+            stats.record(rows)
+        yield rows
+
+
+def format_rows(rows, fmt, header=False):
+    """Serialize one chunk of output rows as JSONL or CSV text."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=OUTPUT_FIELDS, extrasaction="ignore", lineterminator="\n")
+        if header:
+            writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue()
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+
+def iter_output(records, category_model, priority_model, output_format="jsonl",
+                chunk_size=BULK_CHUNK_SIZE, stats=None, lexical_model=None):
+    """Yield serialized output text, one piece per chunk (CSV header first)."""
+    if output_format == "csv":
+        yield format_rows([], "csv", header=True)
+    for rows in classify_records(records, category_model, priority_model, chunk_size, stats, lexical_model):
+        yield format_rows(rows, output_format)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk re-classify stored complaints")
+    parser.add_argument("input", help="JSONL or CSV file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    parser.add_argument("--input-format", choices=BULK_FORMATS, help="Default: from the input extension, else jsonl")
+    parser.add_argument("--output-format", choices=BULK_FORMATS, help="Default: from the output extension, else jsonl")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    args = parser.parse_args()
+
+    from lexical_cascade import load_lexical_head
+    from model_bundle import load_model_bundle
+
+    category_model, category_path = load_model_bundle("category", args.model_dir)
+    priority_model, priority_path = load_model_bundle("priority", args.model_dir)
+    lexical_model, lexical_path = load_lexical_head("category", args.model_dir)
+    if category_model is None:
+        print(f"⚠ Warning: Category model not found in {args.model_dir}; rows will be Uncertain", file=sys.stderr)
+    else:
+        print(f"[OK] Category model: {category_path} ({getattr(category_model, 'model_version', 'unversioned')})",
+              file=sys.stderr)
+    if priority_model is not None:
+        print(f"[OK] Priority model: {priority_path}", file=sys.stderr)
+    if lexical_model is not None:
+        print(f"[OK] Lexical cascade: {lexical_path} (threshold {lexical_model.threshold})", file=sys.stderr)
+
+    input_format = args.input_format or detect_format(args.input)
+    output_format = args.output_format or detect_format(args.output)
+    source = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8", errors="replace")
+    target = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+
+    stats = BulkStats()
+    try:
+        records = read_records(source, input_format, invalid="record")
+        for text in iter_output(records, category_model, priority_model, output_format, args.chunk_size, stats,
+                                lexical_model):
+            target.write(text)
+            target.flush()
+            if stats.chunks and stats.chunks % 20 == 0:
+                progress = stats.as_dict()
+                print(f"  {progress['rows']} rows ({progress['rowsPerSec']} rows/sec)", file=sys.stderr)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    summary = stats.as_dict()
+    print(f"[OK] Classified {summary['rows']} rows in {summary['seconds']}s "
+          f"({summary['rowsPerSec']} rows/sec, {summary['errors']} with errors)", file=sys.stderr)
+    if lexical_model is not None:
+        cascade = lexical_model.stats()
+        print(f"[OK] Lexical cascade answered {cascade['answered']} rows, escalated {cascade['escalated']} "
+              f"(escalation rate {cascade['escalationRate']})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
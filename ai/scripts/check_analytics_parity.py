@@ -0,0 +1,224 @@
+"""
+Count Cube Parity Check
+Compares the count cube's spikes and hotspots (analytics_cube.py) with a
+row-by-row evaluation of the Node server's aggregation pipelines on
+generated complaints, across time zones with and without DST.
+
+The reference filters and groups every complaint exactly as the $match /
+$group / $match stages do. Its window boundaries come from the JavaScript
+in spikeDetectionService.js / hotspotService.js, run under node with TZ
+set (or from the Python equivalents when node is not installed), so local
+midnight, DST days and the "now - 30 days" cutoff are JavaScript's.
+
+Complaints are placed on and around every boundary (exactly on it, 1 ms
+either side), in the future, and without a priority.
+
+Usage:
+    python scripts/check_analytics_parity.py
+    python scripts/check_analytics_parity.py --zones Asia/Kolkata,America/New_York --rows 5000
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from analytics_cube import (
+    BASELINE_WINDOW_DAYS,
+    HOTSPOT_SCORE_THRESHOLD,
+    MIN_BASELINE_COMPLAINTS,
+    MIN_COMPLAINTS,
+    PRIORITY_WEIGHT,
+    SEVERITY_HIGH_MIN,
+    SEVERITY_SEVERE_MIN,
+    SPIKE_MULTIPLIER_THRESHOLD,
+    ComplaintCountCube,
+    hotspot_cutoff,
+    mongo_round,
+    spike_windows,
+)
+
+
+DEFAULT_ZONES = "Asia/Kolkata,America/New_York,Europe/London,Australia/Lord_Howe,UTC"
+
+# "now" values per zone: ordinary days and days whose windows start on DST changes
+DEFAULT_NOWS = [
+    "2026-10-17T09:30:00",
+    "2026-04-14T00:00:00",   # 37 days after US spring-forward
+    "2026-04-07T23:59:59",   # 30 days after US spring-forward
+    "2026-12-01T00:30:00",   # 30 days after US fall-back
+    "2026-04-28T02:30:00",   # 30 days after EU spring-forward, inside the gap hour a month earlier
+    "2026-11-24T01:30:00",   # 30 days after EU fall-back, ambiguous hour a month earlier
+    "2026-05-05T10:00:00",   # Lord Howe 30-minute DST change 30 days earlier
+]
+
+WARDS = [f"Ward {i}" for i in range(1, 7)]
+CATEGORIES = ["Sanitation", "Roads", "Electricity", "Water", "Uncertain"]
+PRIORITIES = ["High", "Medium", "Low", None]
+
+JS_WINDOWS = r"""
+const [nowMs, CURRENT_WINDOW_DAYS, BASELINE_WINDOW_DAYS, TIME_WINDOW_DAYS] = process.argv.slice(1).map(Number);
+const now = new Date(nowMs);
+const currentWindowStart = new Date(now);
+currentWindowStart.setDate(currentWindowStart.getDate() - CURRENT_WINDOW_DAYS);
+currentWindowStart.setHours(0, 0, 0, 0);
+const baselineWindowEnd = new Date(currentWindowStart);
+const baselineWindowStart = new Date(baselineWindowEnd);
+baselineWindowStart.setDate(baselineWindowStart.getDate() - BASELINE_WINDOW_DAYS);
+baselineWindowStart.setHours(0, 0, 0, 0);
+const cutoffDate = new Date(now);
+cutoffDate.setDate(cutoffDate.getDate() - TIME_WINDOW_DAYS);
+console.log(JSON.stringify([baselineWindowStart.getTime(), currentWindowStart.getTime(), cutoffDate.getTime()]));
+"""
+
+
+def js_windows(now_ms, zone):
+    """(baseline start, current start, hotspot cutoff) from the Node code, or None without node."""
+    node = shutil.which("node")
+    if node is None:
+        return None
+    out = subprocess.run(
+        [node, "-e", JS_WINDOWS, str(now_ms), "7", str(BASELINE_WINDOW_DAYS), "30"],
+        env={**os.environ, "TZ": zone}, capture_output=True, text=True, check=True,
+    )
+    return tuple(json.loads(out.stdout))
+
+
+def reference_spikes(records, now_ms, baseline_start, current_start):
+    """detectSpikes' pipeline, one complaint at a time."""
+    groups = {}
+    for r in records:
+        if not (baseline_start <= r["createdAt"] < now_ms) or r["ward"] is None or r["category"] is None:
+            continue
+        group = groups.setdefault((r["ward"], r["category"]), [0, 0])
+        group[0] += r["createdAt"] >= current_start
+        group[1] += baseline_start <= r["createdAt"] < current_start
+    spikes = []
+    for (ward, category), (current, baseline) in groups.items():
+        average = baseline * 7 / BASELINE_WINDOW_DAYS
+        ratio = current / average if average > 0 else 0
+        if average >= MIN_BASELINE_COMPLAINTS and ratio >= SPIKE_MULTIPLIER_THRESHOLD:
+            spikes.append({
+                "ward": ward, "category": category,
+                "baselineWeeklyAvg": mongo_round(average, 1), "currentWeekCount": current,
+                "spikeRatio": mongo_round(ratio, 1),
+                "severity": "Severe" if ratio >= SEVERITY_SEVERE_MIN else "Moderate",
+            })
+    return sorted(spikes, key=lambda s: (-s["spikeRatio"], s["ward"], s["category"]))
+
+
+def reference_hotspots(records, cutoff):
+    """identifyHotspots' pipeline, one complaint at a time."""
+    groups = {}
+    for r in records:
+        if r["createdAt"] < cutoff or r["ward"] is None or r["category"] is None or r["priority"] is None:
+            continue
+        group = groups.setdefault((r["ward"], r["category"]), [0, 0])
+        group[0] += 1
+        group[1] += PRIORITY_WEIGHT.get(r["priority"], 0)
+    hotspots = [
+        {"ward": ward, "category": category, "complaintCount": total, "hotspotScore": score,
+         "severity": "High" if score >= SEVERITY_HIGH_MIN else "Medium"}
+        for (ward, category), (total, score) in groups.items()
+        if total >= MIN_COMPLAINTS and score >= HOTSPOT_SCORE_THRESHOLD
+    ]
+    return sorted(hotspots, key=lambda h: (-h["hotspotScore"], h["ward"], h["category"]))
+
+
+def generate_records(rng, now_ms, boundaries, rows):
+    """Random complaints over the last ~45 days, a burst in the current week, and boundary cases."""
+    day = 86_400_000
+    records = []
+
+    def add(ms, ward=None, category=None, priority="unset"):
+        records.append({
+            "id": f"c{len(records)}",
+            "ward": ward or rng.choice(WARDS),
+            "category": category or rng.choice(CATEGORIES),
+            "priority": rng.choice(PRIORITIES) if priority == "unset" else priority,
+            "createdAt": int(ms),
+        })
+
+    for _ in range(rows):
+        add(rng.randint(now_ms - 45 * day, now_ms + 2 * day))
+    # A burst in one ward/category so spikes fire
+    for _ in range(rows // 20):
+        add(rng.randint(now_ms - 6 * day, now_ms), "Ward 1", "Water")
+    for boundary in boundaries:
+        for offset in (-1, 0, 1):
+            for _ in range(3):
+                add(boundary + offset, "Ward 2", "Roads")
+    # Complaints without a ward or category are never counted
+    records.append({"id": "no-ward", "ward": None, "category": "Water", "priority": "High", "createdAt": now_ms - day})
+    records.append({"id": "no-category", "ward": "Ward 1", "category": None, "priority": "High", "createdAt": now_ms - day})
+    return records
+
+
+def check(zone, now_text, rows, seed):
+    tz = ZoneInfo(zone)
+    now_ms = int(datetime.fromisoformat(now_text).replace(tzinfo=tz).timestamp() * 1000)
+    python_windows = (*spike_windows(now_ms, tz), hotspot_cutoff(now_ms, tz))
+    windows = js_windows(now_ms, zone) or python_windows
+    failures = []
+    if windows != python_windows:
+        failures.append(f"window boundaries differ: node {windows} vs python {python_windows}")
+    baseline_start, current_start, cutoff = windows
+
+    rng = random.Random(f"{seed}:{zone}:{now_text}")
+    records = generate_records(rng, now_ms, [baseline_start, current_start, cutoff, now_ms], rows)
+
+    cube = ComplaintCountCube(tz)
+    cube.ingest_records(records)
+    # Incremental updates: move some complaints, delete others, re-add them
+    for r in rng.sample(records, min(200, len(records))):
+        r["priority"] = rng.choice(PRIORITIES)
+        cube.upsert(r["id"], r["ward"], r["category"], r["priority"], r["createdAt"])
+    removed = rng.sample(records, min(100, len(records)))
+    cube.delete([r["id"] for r in removed])
+    removed_ids = {r["id"] for r in removed}
+    records = [r for r in records if r["id"] not in removed_ids]
+
+    spikes, expected_spikes = cube.detect_spikes(now_ms), reference_spikes(records, now_ms, baseline_start, current_start)
+    hotspots, expected_hotspots = cube.identify_hotspots(now_ms), reference_hotspots(records, cutoff)
+    if spikes != expected_spikes:
+        failures.append(f"spikes differ:\n  cube      {spikes}\n  reference {expected_spikes}")
+    if hotspots != expected_hotspots:
+        failures.append(f"hotspots differ:\n  cube      {hotspots}\n  reference {expected_hotspots}")
+    return failures, len(expected_spikes), len(expected_hotspots), windows is not python_windows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check count-cube spikes/hotspots against the Node pipelines")
+    parser.add_argument("--zones", default=DEFAULT_ZONES, help="Comma-separated IANA time zones")
+    parser.add_argument("--rows", type=int, default=3000, help="Random complaints per scenario")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if shutil.which("node") is None:
+        print("⚠ Warning: node not found; window boundaries come from the Python port only")
+
+    failed = 0
+    for zone in args.zones.split(","):
+        for now_text in DEFAULT_NOWS:
+            failures, n_spikes, n_hotspots, from_node = check(zone.strip(), now_text, args.rows, args.seed)
+            status = "[OK]" if not failures else "FAIL"
+            print(f"{status} {zone:22} now={now_text}  spikes={n_spikes:2} hotspots={n_hotspots:2}"
+                  f"{'' if from_node else '  (python windows)'}")
+            for failure in failures:
+                print(f"    {failure}")
+            failed += bool(failures)
+
+    if failed:
+        print(f"\n⚠ {failed} scenario(s) differ")
+        sys.exit(1)
+    print("\n[OK] Count cube matches the aggregation pipelines in every scenario")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Encoder Backend Parity Check
+Compares an optimized encoder backend (torch-int8 or onnx) against the fp32
+PyTorch encoder on data/complaints.csv:
+- cosine similarity between fp32 and backend embeddings of the same text
+- category head agreement (same predicted class, same "Uncertain" decision)
+- encode latency (batch of 1 and batched) and resident memory
+
+Usage:
+    python scripts/check_encoder_parity.py --backend torch-int8
+    python scripts/check_encoder_parity.py --backend onnx --rows 2000
+Exits with status 1 if mean cosine < --min-cosine or agreement < --min-agreement.
+"""
+
+import argparse
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from encoder import load_encoder
+from model_bundle import load_model_bundle, MODEL_DIR
+from predictor import CATEGORY_CONFIDENCE_THRESHOLD
+from text_normalizer import normalize_batch
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_DIR, "data", "complaints.csv")
+
+
+def load_texts(rows, seed):
+    import pandas as pd
+    df = pd.read_csv(DATA_PATH)
+    if 'text' not in df.columns:
+        df['text'] = df['title'] + '. ' + df['description']
+    if rows and len(df) > rows:
+        df = df.sample(rows, random_state=seed)
+    return normalize_batch(df['text'].tolist())
+
+
+def rss_mb():
+    """Peak resident set size of this process in MB (Linux reports KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def time_encode(model, texts, batch_size):
+    start = time.perf_counter()
+    if batch_size == 1:
+        for text in texts:
+            model.encode([text], convert_to_numpy=True)
+    else:
+        model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    return (time.perf_counter() - start) * 1000 / len(texts)
+
+
+def category_decisions(head, embeddings):
+    """Predicted label per row, "Uncertain" below the confidence threshold."""
+    probs = head.predict_proba_from_embeddings(embeddings)
+    labels = np.asarray(head.classes_)[probs.argmax(axis=1)].astype(object)
+    labels[probs.max(axis=1) < CATEGORY_CONFIDENCE_THRESHOLD] = "Uncertain"
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="torch-int8", choices=["torch-int8", "onnx"])
+    parser.add_argument("--rows", type=int, default=1000, help="Rows sampled from the dataset (0 = all)")
+    parser.add_argument("--latency-rows", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    texts = load_texts(args.rows, args.seed)
+    latency_texts = texts[:args.latency_rows]
+    print(f"Comparing fp32 vs {args.backend} on {len(texts)} complaints")
+
+    report = {}
+    embeddings = {}
+    models = {}
+    for backend in ("torch", args.backend):
+        before = rss_mb()
+        models[backend], _ = load_encoder(backend)
+        loaded = rss_mb()
+        embeddings[backend] = models[backend].encode(texts, batch_size=args.batch_size, convert_to_numpy=True)
+        report[backend] = {
+            "load_rss_mb": loaded - before,
+            "ms_per_text_batch1": time_encode(models[backend], latency_texts, 1),
+            "ms_per_text_batched": time_encode(models[backend], latency_texts, args.batch_size),
+        }
+
+    a, b = embeddings["torch"], embeddings[args.backend]
+    cosines = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    print(f"\nCosine(fp32, {args.backend}): mean {cosines.mean():.5f}  "
+          f"min {cosines.min():.5f}  p1 {np.percentile(cosines, 1):.5f}")
+
+    agreement = None
+    head, head_path = load_model_bundle("category", MODEL_DIR, encoder=models["torch"])
+    if head is not None and hasattr(head, 'predict_proba_from_embeddings'):
+        fp32_labels = category_decisions(head, a)
+        backend_labels = category_decisions(head, b)
+        agreement = float((fp32_labels == backend_labels).mean())
+        print(f"Category decision agreement ({os.path.basename(head_path)}): {agreement:.4f}")
+    else:
+        print("Category head not found or not semantic; skipping agreement check")
+
+    print(f"\n{'backend':12s} {'ms/text b=1':>12s} {f'ms/text b={args.batch_size}':>14s} {'peak RSS +MB':>13s}")
+    for backend, row in report.items():
+        print(f"{backend:12s} {row['ms_per_text_batch1']:12.2f} {row['ms_per_text_batched']:14.2f} "
+              f"{row['load_rss_mb']:13.0f}")
+    speedup = report["torch"]["ms_per_text_batch1"] / report[args.backend]["ms_per_text_batch1"]
+    print(f"Speedup (batch of 1): {speedup:.2f}x")
+
+    ok = cosines.mean() >= args.min_cosine and (agreement is None or agreement >= args.min_agreement)
+    print("[OK] Parity within thresholds" if ok else "⚠ Parity below thresholds")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
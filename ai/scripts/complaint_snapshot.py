@@ -0,0 +1,345 @@
+"""
+Complaint Snapshots - partitioned, typed Parquet datasets
+Exports complaints (from a Mongo JSONL/CSV export or the training CSV)
+into a Hive-partitioned Parquet dataset, so training and analytics jobs
+read only the columns and partitions they need instead of re-parsing and
+re-normalizing a full CSV dump.
+
+Layout:
+    <snapshot>/_manifest.json
+    <snapshot>/month=2026-10/category=Water/part-0.parquet
+    ...
+month is the UTC month of createdAt. Rows without createdAt or category
+land in the __HIVE_DEFAULT_PARTITION__ directory for that key.
+
+Columns:
+    id, title, description, text (raw), normalized_text, priority, ward,
+    status, created_at (timestamp, UTC), category, month,
+    embedding (optional; fixed-size float32 list from the shared encoder)
+Low-cardinality columns (priority, ward, status) are dictionary-encoded,
+so they load as pandas categoricals.
+
+Usage:
+    python scripts/complaint_snapshot.py export complaints.jsonl data/snapshots/2026-10-17
+    python scripts/complaint_snapshot.py export data/complaints.csv data/snapshots/training --embeddings
+    python scripts/complaint_snapshot.py info data/snapshots/2026-10-17
+    python scripts/complaint_snapshot.py info data/snapshots/2026-10-17 --months 2026-09,2026-10 --categories Water
+
+Settings (environment variables):
+    AI_SNAPSHOT_DIR  - where snapshots are kept (default: ai/data/snapshots)
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from text_normalizer import NORMALIZER_VERSION, normalize_batch
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_DIR = os.environ.get("AI_SNAPSHOT_DIR") or os.path.join(BASE_DIR, "data", "snapshots")
+
+SNAPSHOT_FORMAT = "complaint-snapshot/v1"
+MANIFEST_NAME = "_manifest.json"
+PARTITION_KEYS = ("month", "category")
+
+# Records per Arrow batch while exporting (bounds exporter memory)
+EXPORT_CHUNK_ROWS = 50000
+# Rows per Parquet row group
+ROW_GROUP_ROWS = 128 * 1024
+
+
+def _arrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError as e:
+        raise RuntimeError("Complaint snapshots require pyarrow (pip install pyarrow)") from e
+    return pa, ds
+
+
+def snapshot_schema(embedding_dim=None):
+    """Arrow schema of a snapshot (partition columns included)."""
+    pa, _ = _arrow()
+    labels = pa.dictionary(pa.int32(), pa.string())
+    fields = [
+        ("id", pa.string()),
+        ("title", pa.string()),
+        ("description", pa.string()),
+        ("text", pa.string()),
+        ("normalized_text", pa.string()),
+        ("priority", labels),
+        ("ward", labels),
+        ("status", labels),
+        ("created_at", pa.timestamp("ms", tz="UTC")),
+        ("category", pa.string()),
+        ("month", pa.string()),
+    ]
+    if embedding_dim:
+        fields.append(("embedding", pa.list_(pa.float32(), embedding_dim)))
+    return pa.schema(fields)
+
+
+def _partitioning():
+    pa, ds = _arrow()
+    return ds.partitioning(pa.schema([(key, pa.string()) for key in PARTITION_KEYS]), flavor="hive")
+
+
+def _month(ms):
+    """UTC "YYYY-MM" partition of an epoch-ms timestamp."""
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).strftime("%Y-%m")
+
+
+def _label(value):
+    return None if value is None or value == "" else str(value)
+
+
+def records_to_batch(records, first_row, schema, encode=None):
+    """
+    Convert export records to one Arrow record batch.
+
+    Args:
+        records: List of record dicts (Mongo export or training CSV rows)
+        first_row: Row number of records[0], used as id when a record has none
+        schema: snapshot_schema()
+        encode: Optional callable(list of normalized texts) -> (n, dim) embeddings
+    """
+    from bulk_classify import record_id, record_text
+    from duplicate_clusters import parse_created_at
+
+    pa, _ = _arrow()
+    texts = [record_text(record) or "" for record in records]
+    normalized = normalize_batch(texts)
+    created = [parse_created_at(record.get("createdAt")) for record in records]
+    months = [None if ms is None else _month(ms) for ms in created]
+    columns = {
+        "id": [record_id(record) or str(first_row + i) for i, record in enumerate(records)],
+        "title": [_label(record.get("title")) for record in records],
+        "description": [_label(record.get("description")) for record in records],
+        "text": texts,
+        "normalized_text": normalized,
+        "priority": [_label(record.get("priority")) for record in records],
+        "ward": [_label(record.get("ward")) for record in records],
+        "status": [_label(record.get("status")) for record in records],
+        "created_at": created,
+        "category": [_label(record.get("category")) for record in records],
+        "month": months,
+    }
+    arrays = [pa.array(columns[field.name], type=field.type) for field in schema if field.name != "embedding"]
+    if "embedding" in schema.names:
+        vectors = np.ascontiguousarray(encode(normalized), dtype=np.float32)
+        dim = schema.field("embedding").type.list_size
+        arrays.append(pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1)), dim))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_snapshot(records, path, embeddings=False, chunk_rows=EXPORT_CHUNK_ROWS, overwrite=False):
+    """
+    Write records to a partitioned Parquet snapshot, chunk by chunk.
+
+    Args:
+        records: Iterable of record dicts (consumed lazily)
+        path: Snapshot directory (must not exist unless overwrite)
+        embeddings: Also store normalized-text embeddings from the shared encoder
+        chunk_rows: Records converted per Arrow batch
+        overwrite: Replace an existing snapshot
+
+    Returns:
+        The manifest dict (also written to <path>/_manifest.json)
+    """
+    from bulk_classify import chunked
+
+    _, ds = _arrow()
+    if os.path.exists(path):
+        if not overwrite:
+            raise FileExistsError(f"Snapshot already exists: {path}")
+        shutil.rmtree(path)
+
+    encode = None
+    encoder_info = {}
+    dim = None
+    if embeddings:
+        from encoder import ENCODER_NAME, encode_texts, get_encoder, get_encoder_id
+        dim = get_encoder().get_sentence_embedding_dimension()
+        encoder_info = {"encoder_id": get_encoder_id(), "encoder_name": ENCODER_NAME}
+        encode = lambda texts: encode_texts(texts, use_cache=False, batch_size=64)
+    schema = snapshot_schema(dim)
+
+    stats = {"rows": 0}
+
+    def batches():
+        for chunk in chunked(records, max(1, chunk_rows)):
+            batch = records_to_batch(chunk, stats["rows"], schema, encode)
+            stats["rows"] += batch.num_rows
+            print(f"  Exported {stats['rows']} rows", file=sys.stderr)
+            yield batch
+
+    started = time.perf_counter()
+    parquet = ds.ParquetFileFormat()
+    ds.write_dataset(
+        batches(), path, schema=schema, format=parquet,
+        partitioning=_partitioning(),
+        file_options=parquet.make_write_options(compression="zstd"),
+        basename_template="part-{i}.parquet",
+        max_rows_per_group=ROW_GROUP_ROWS,
+        existing_data_behavior="error",
+    )
+    os.makedirs(path, exist_ok=True)
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "rows": stats["rows"],
+        "partitioning": list(PARTITION_KEYS),
+        "normalizer_version": NORMALIZER_VERSION,
+        "embedding_dim": dim,
+        **encoder_info,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    with open(os.path.join(path, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def is_snapshot(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST_NAME), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format')}")
+    return manifest
+
+
+def snapshot_filter(months=None, categories=None, since_ms=None, until_ms=None):
+    """
+    Row filter; month and category conditions prune whole partitions.
+
+    Args:
+        months: List of "YYYY-MM" months
+        categories: List of categories
+        since_ms / until_ms: createdAt window [since, until) in epoch ms
+    """
+    pa, ds = _arrow()
+    conditions = []
+    if months:
+        conditions.append(ds.field("month").isin(list(months)))
+    if categories:
+        conditions.append(ds.field("category").isin(list(categories)))
+    # Time bounds also bound the month partitions, so other months are never opened
+    if since_ms is not None:
+        conditions.append(ds.field("month") >= _month(since_ms))
+        conditions.append(ds.field("created_at") >= pa.scalar(since_ms, pa.timestamp("ms", tz="UTC")))
+    if until_ms is not None:
+        conditions.append(ds.field("month") <= _month(until_ms))
+        conditions.append(ds.field("created_at") < pa.scalar(until_ms, pa.timestamp("ms", tz="UTC")))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def open_snapshot(path):
+    """The snapshot as a pyarrow Dataset (schema from the manifest's layout)."""
+    _, ds = _arrow()
+    read_manifest(path)
+    return ds.dataset(path, format="parquet", partitioning=_partitioning())
+
+
+def load_snapshot(path, columns=None, months=None, categories=None, since_ms=None, until_ms=None):
+    """
+    Read selected columns of the matching partitions/rows.
+
+    Returns:
+        pyarrow Table (use .to_pandas() for a DataFrame)
+    """
+    dataset = open_snapshot(path)
+    return dataset.to_table(columns=columns, filter=snapshot_filter(months, categories, since_ms, until_ms))
+
+
+def iter_snapshot_records(path, columns, **filters):
+    """
+    Stream matching rows as record dicts in export-record form (createdAt
+    in epoch ms), e.g. for ComplaintCountCube.ingest_records.
+    """
+    dataset = open_snapshot(path)
+    names = ["created_at" if name == "createdAt" else name for name in columns]
+    scanner = dataset.scanner(columns=names, filter=snapshot_filter(**filters))
+    for batch in scanner.to_batches():
+        keys = ["createdAt" if name == "created_at" else name for name in batch.schema.names]
+        for values in zip(*(_pylist(column) for column in batch.columns)):
+            yield dict(zip(keys, values))
+
+
+def _pylist(array):
+    """Python values of an Arrow array; timestamps as epoch ms."""
+    pa, _ = _arrow()
+    if pa.types.is_dictionary(array.type):
+        # Decode through the (small) dictionary: much faster than to_pylist()
+        values = array.dictionary.to_pylist()
+        valid = array.is_valid().to_numpy(zero_copy_only=False).tolist()
+        indices = array.indices.fill_null(0).to_numpy().tolist()
+        return [values[i] if ok else None for i, ok in zip(indices, valid)]
+    if pa.types.is_timestamp(array.type):
+        return array.cast(pa.int64()).to_pylist()
+    return array.to_pylist()
+
+
+def embedding_matrix(table, column="embedding"):
+    """(rows, dim) float32 view of a fixed-size-list embedding column."""
+    chunked_column = table.column(column)
+    dim = chunked_column.type.list_size
+    if table.num_rows == 0:
+        return np.zeros((0, dim), dtype=np.float32)
+    values = [chunk.flatten().to_numpy(zero_copy_only=False) for chunk in chunked_column.chunks]
+    return np.concatenate(values).reshape(-1, dim)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or inspect complaint Parquet snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Write a snapshot from a JSONL/CSV export")
+    export.add_argument("input", help="Mongo JSONL/CSV export or the training CSV")
+    export.add_argument("output", help="Snapshot directory")
+    export.add_argument("--format", choices=["jsonl", "csv"], default=None, help="Input format (default: from extension)")
+    export.add_argument("--embeddings", action="store_true", help="Store encoder embeddings of the normalized text")
+    export.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS)
+    export.add_argument("--overwrite", action="store_true")
+
+    info = commands.add_parser("info", help="Show a snapshot's manifest and per-partition row counts")
+    info.add_argument("snapshot")
+    info.add_argument("--months", default=None, help="Comma-separated YYYY-MM months")
+    info.add_argument("--categories", default=None, help="Comma-separated categories")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        from bulk_classify import detect_format, read_records
+        with open(args.input, encoding="utf-8", newline="") as f:
+            records = read_records(f, args.format or detect_format(args.input))
+            manifest = export_snapshot(records, args.output, args.embeddings, args.chunk_rows, args.overwrite)
+        print(f"[OK] Wrote {manifest['rows']} rows to {args.output} in {manifest['seconds']}s")
+        return
+
+    split = lambda value: [item.strip() for item in value.split(",") if item.strip()] if value else None
+    print(json.dumps(read_manifest(args.snapshot), indent=2))
+    started = time.perf_counter()
+    table = load_snapshot(args.snapshot, columns=list(PARTITION_KEYS),
+                          months=split(args.months), categories=split(args.categories))
+    counts = table.group_by(list(PARTITION_KEYS)).aggregate([([], "count_all")]).to_pylist()
+    for row in sorted(counts, key=lambda r: (r["month"] or "", r["category"] or "")):
+        print(f"  month={row['month']}  category={row['category']}  rows={row['count_all']}")
+    print(f"[OK] {table.num_rows} rows in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Near-Duplicate Complaint Clustering
+Groups the many near-identical open complaints that follow one incident
+(a burst water main, an area-wide outage) so they can be reviewed once.
+
+1. Texts are normalized as for /predict; identical normalized texts are
+   encoded once (shared MiniLM encoder, in chunks, cache bypassed)
+2. Complaints are linked when their cosine similarity is >= threshold.
+   The similarity matrix is never built whole: it is computed one
+   block x block tile at a time (upper triangle only), so memory stays
+   at O(block^2) however many complaints there are
+3. Each tile's links are reduced to connected components before they are
+   merged into a union-find over all complaints, so dense bursts cost one
+   union per complaint, not one per pair
+4. Each cluster's representative is the member closest to its centroid
+
+Usage:
+    python scripts/duplicate_clusters.py complaints.jsonl
+    python scripts/duplicate_clusters.py export.csv --since 2026-10-16 --until 2026-10-17
+    python scripts/duplicate_clusters.py complaints.jsonl --threshold 0.9 --output clusters.json
+    python scripts/duplicate_clusters.py data/snapshots/2026-10-17 --since 2026-10-16   # Parquet snapshot
+
+The AI service exposes the same job as POST /clusters/duplicates.
+
+Settings (environment variables):
+    AI_DUPLICATE_THRESHOLD   - default link threshold (default 0.85, HIGHLY_SIMILAR)
+    AI_DUPLICATE_BLOCK_SIZE  - rows per similarity tile (default 2048, ~16 MB per tile)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from similarity_matrix import HIGHLY_SIMILAR_THRESHOLD, normalize_rows
+
+
+DUPLICATE_THRESHOLD = float(os.environ.get("AI_DUPLICATE_THRESHOLD", str(HIGHLY_SIMILAR_THRESHOLD)))
+DUPLICATE_BLOCK_SIZE = int(os.environ.get("AI_DUPLICATE_BLOCK_SIZE", "2048"))
+
+# Texts per encoder call
+ENCODE_CHUNK_SIZE = 256
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path halving and union by size."""
+
+    def __init__(self, n):
+        self.parent = np.arange(n)
+        self.size = np.ones(n, dtype=np.int64)
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+    def union_edges(self, rows, cols):
+        """
+        Merge the sets joined by a batch of edges. The batch is first reduced
+        to its connected components, so the Python loop runs once per node.
+        """
+        if len(rows) == 0:
+            return
+        nodes, inverse = np.unique(np.concatenate([rows, cols]), return_inverse=True)
+        count = len(rows)
+        graph = coo_matrix(
+            (np.ones(count, dtype=np.int8), (inverse[:count], inverse[count:])),
+            shape=(len(nodes), len(nodes)),
+        )
+        _, labels = connected_components(graph, directed=False)
+        first = {}
+        for node, label in zip(nodes.tolist(), labels.tolist()):
+            if label in first:
+                self.union(first[label], node)
+            else:
+                first[label] = node
+
+    def labels(self):
+        """Root of every element."""
+        return np.array([self.find(i) for i in range(len(self.parent))], dtype=np.int64)
+
+
+class DuplicateClusterer:
+    """
+    Thresholded cosine graph over embeddings, built tile by tile.
+
+    Args:
+        vectors: (n, dim) embeddings
+        threshold: Link complaints with cosine similarity >= threshold
+        block_size: Rows (and columns) per similarity tile
+    """
+
+    def __init__(self, vectors, threshold=DUPLICATE_THRESHOLD, block_size=DUPLICATE_BLOCK_SIZE):
+        self.vectors = normalize_rows(vectors) if len(vectors) else np.zeros((0, 1), dtype=np.float32)
+        self.threshold = threshold
+        self.block_size = max(1, block_size)
+        self.union_find = UnionFind(len(self.vectors))
+        self.links = 0
+
+    def row_blocks(self):
+        """Start rows of the row blocks; process_row_block must run for each."""
+        return range(0, len(self.vectors), self.block_size)
+
+    def process_row_block(self, start):
+        """Link rows [start, start + block) to every row at or after start."""
+        block = self.vectors[start:start + self.block_size]
+        for col_start in range(start, len(self.vectors), self.block_size):
+            linked = block @ self.vectors[col_start:col_start + self.block_size].T >= self.threshold
+            if col_start == start:
+                # Diagonal tile: each pair once, no self links
+                linked = np.triu(linked, k=1)
+            rows, cols = np.nonzero(linked)
+            self.links += len(rows)
+            self.union_find.union_edges(rows + start, cols + col_start)
+
+    def run(self):
+        for start in self.row_blocks():
+            self.process_row_block(start)
+        return self
+
+    def clusters(self, min_size=2):
+        """
+        Clusters of at least min_size complaints, largest first.
+
+        Returns:
+            List of dicts: members (row indices), representative (row
+            index closest to the centroid) and cohesion (mean cosine of
+            members to the centroid)
+        """
+        labels = self.union_find.labels()
+        roots, inverse, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+        order = np.argsort(inverse, kind="stable")
+        boundaries = np.cumsum(sizes)[:-1]
+        result = []
+        for members in np.split(order, boundaries):
+            if len(members) < min_size:
+                continue
+            member_vectors = self.vectors[members]
+            centroid = member_vectors.mean(axis=0)
+            centroid /= max(float(np.linalg.norm(centroid)), 1e-12)
+            closeness = member_vectors @ centroid
+            result.append({
+                "members": members,
+                "representative": int(members[int(np.argmax(closeness))]),
+                "cohesion": float(closeness.mean()),
+            })
+        result.sort(key=lambda c: (-len(c["members"]), int(c["members"][0])))
+        return result
+
+
+def parse_created_at(value):
+    """createdAt as epoch ms from an ISO string, epoch number or {"$date": ...}; None if missing."""
+    if isinstance(value, dict):
+        value = value.get("$date")
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        return int((parsed - datetime(1970, 1, 1)).total_seconds() * 1000)
+    return int(parsed.timestamp() * 1000)
+
+
+def in_window(created_at_ms, since_ms=None, until_ms=None):
+    """True if createdAt is inside [since, until); records without createdAt only pass an open window."""
+    if since_ms is None and until_ms is None:
+        return True
+    if created_at_ms is None:
+        return False
+    return (since_ms is None or created_at_ms >= since_ms) and (until_ms is None or created_at_ms < until_ms)
+
+
+def distinct_texts(texts):
+    """
+    Distinct texts, so each is encoded once.
+
+    Returns:
+        (unique texts in first-seen order, row of each input text in that list)
+    """
+    unique = list(dict.fromkeys(texts))
+    position = {text: i for i, text in enumerate(unique)}
+    return unique, np.array([position[text] for text in texts], dtype=np.int64)
+
+
+def build_report(clusterer, ids, texts, created_at, wards, min_size, seconds):
+    """JSON-ready summary: clusters with ids, representative, size, wards and time span."""
+    clusters = []
+    clustered = 0
+    for cluster_id, cluster in enumerate(clusterer.clusters(min_size)):
+        members = cluster["members"]
+        clustered += len(members)
+        times = [created_at[i] for i in members if created_at[i] is not None]
+        ward_counts = {}
+        for i in members:
+            if wards[i] is not None:
+                ward_counts[wards[i]] = ward_counts.get(wards[i], 0) + 1
+        representative = cluster["representative"]
+        clusters.append({
+            "clusterId": cluster_id,
+            "size": len(members),
+            "representativeId": ids[representative],
+            "representativeText": texts[representative],
+            "cohesion": round(cluster["cohesion"], 4),
+            "memberIds": [ids[i] for i in members],
+            "wards": ward_counts,
+            "firstCreatedAt": min(times) if times else None,
+            "lastCreatedAt": max(times) if times else None,
+        })
+    return {
+        "complaints": len(ids),
+        "threshold": clusterer.threshold,
+        "minSize": min_size,
+        "links": clusterer.links,
+        "clusters": clusters,
+        "clusterCount": len(clusters),
+        "clusteredComplaints": clustered,
+        "seconds": round(seconds, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Group near-duplicate complaints in a time window")
+    parser.add_argument("input", help="JSONL or CSV export (id/_id, text or title/description, createdAt, ward), "
+                                      "or a snapshot directory")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="Input format (default: from extension)")
+    parser.add_argument("--since", default=None, help="Keep complaints created at or after this ISO time")
+    parser.add_argument("--until", default=None, help="Keep complaints created before this ISO time")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD)
+    parser.add_argument("--min-size", type=int, default=2, help="Smallest cluster reported")
+    parser.add_argument("--block-size", type=int, default=DUPLICATE_BLOCK_SIZE)
+    parser.add_argument("--output", default=None, help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    from bulk_classify import detect_format, read_records, record_id, record_text
+    from complaint_snapshot import is_snapshot, iter_snapshot_records
+    from encoder import encode_texts
+    from text_normalizer import normalize_batch
+
+    since_ms = parse_created_at(args.since)
+    until_ms = parse_created_at(args.until)
+
+    ids, texts, created_at, wards = [], [], [], []
+
+    def collect(records):
+        for row, record in enumerate(records):
+            text = record_text(record)
+            timestamp = parse_created_at(record.get("createdAt"))
+            if not text or not in_window(timestamp, since_ms, until_ms):
+                continue
+            ids.append(record_id(record) or str(row))
+            texts.append(text)
+            created_at.append(timestamp)
+            wards.append(record.get("ward"))
+
+    if is_snapshot(args.input):
+        # Only the partitions and row groups inside the window are read
+        collect(iter_snapshot_records(args.input, ["id", "text", "ward", "createdAt"],
+                                      since_ms=since_ms, until_ms=until_ms))
+    else:
+        with open(args.input, encoding="utf-8", newline="") as f:
+            collect(read_records(f, args.format or detect_format(args.input)))
+    print(f"Clustering {len(ids)} complaints (threshold {args.threshold})...", file=sys.stderr)
+
+    started = time.perf_counter()
+    unique, rows = distinct_texts(normalize_batch(texts))
+    parts = [encode_texts(unique[i:i + ENCODE_CHUNK_SIZE], use_cache=False)
+             for i in range(0, len(unique), ENCODE_CHUNK_SIZE)]
+    vectors = np.vstack(parts)[rows] if parts else np.zeros((0, 1), dtype=np.float32)
+    clusterer = DuplicateClusterer(vectors, args.threshold, args.block_size).run()
+    report = build_report(clusterer, ids, texts, created_at, wards, args.min_size, time.perf_counter() - started)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+    print(f"[OK] {report['clusterCount']} clusters covering {report['clusteredComplaints']} complaints "
+          f"in {report['seconds']}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Content-Addressed Embedding Cache
+Embeddings are keyed by sha256(encoder name, encoder version, text), where
+text is exactly what is fed to the encoder (normalized text for /predict).
+Two tiers:
+- a bounded in-memory LRU
+- an optional on-disk SQLite store that survives restarts
+
+Settings (environment variables):
+    AI_EMBED_CACHE_SIZE  - max in-memory entries (default 10000, 0 disables)
+    AI_EMBED_CACHE_PATH  - SQLite file for the disk tier (default: disabled)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+EMBED_CACHE_SIZE = int(os.environ.get("AI_EMBED_CACHE_SIZE", "10000"))
+EMBED_CACHE_PATH = os.environ.get("AI_EMBED_CACHE_PATH") or None
+
+
+class EmbeddingCache:
+    """Two-tier (memory LRU + optional SQLite) cache of float32 embeddings."""
+
+    def __init__(self, encoder_id, max_entries=EMBED_CACHE_SIZE, disk_path=EMBED_CACHE_PATH):
+        """
+        Args:
+            encoder_id: Encoder name and version, part of every key
+            max_entries: Maximum entries held in memory
+            disk_path: SQLite file for the persistent tier, or None
+        """
+        self.encoder_id = encoder_id
+        self.max_entries = max(0, max_entries)
+        self.disk_path = disk_path
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_writes = 0
+        if disk_path:
+            directory = os.path.dirname(os.path.abspath(disk_path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    def make_key(self, text):
+        """Content address of one encoder input."""
+        return hashlib.sha256(f"{self.encoder_id}\x00{text}".encode("utf-8")).digest()
+
+    def _remember(self, key, vector):
+        """Insert into the memory tier, evicting least recently used entries."""
+        if self.max_entries == 0:
+            return
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    def lookup(self, texts):
+        """
+        Look up embeddings for texts.
+
+        Returns:
+            List with a float32 vector for each hit and None for each miss
+        """
+        keys = [self.make_key(text) for text in texts]
+        results = [None] * len(texts)
+        with self._lock:
+            pending = {}
+            for i, key in enumerate(keys):
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    results[i] = vector
+                    self.hits += 1
+                else:
+                    pending.setdefault(key, []).append(i)
+
+            if pending and self._db is not None:
+                placeholders = ",".join("?" * len(pending))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    list(pending),
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype="<f4")
+                    self._remember(key, vector)
+                    for i in pending.pop(key):
+                        results[i] = vector
+                        self.disk_hits += 1
+
+            self.misses += sum(len(rows) for rows in pending.values())
+        return results
+
+    def store(self, texts, vectors):
+        """Store freshly computed embeddings in both tiers."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            entries = []
+            for text, vector in zip(texts, vectors):
+                key = self.make_key(text)
+                vector = vector.copy()
+                self._remember(key, vector)
+                entries.append((key, vector.astype("<f4").tobytes()))
+            if self._db is not None and entries:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", entries
+                )
+                self._db.commit()
+                self.disk_writes += len(entries)
+
+    def stats(self):
+        """Hit/miss/eviction counters and tier sizes."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "encoder": self.encoder_id,
+                "memoryEntries": len(self._lru),
+                "maxMemoryEntries": self.max_entries,
+                "diskPath": self.disk_path,
+                "hits": self.hits,
+                "diskHits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "diskWrites": self.disk_writes,
+                "hitRate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,214 @@
+"""
+Shared Sentence Encoder
+Holds one process-wide SentenceTransformer that every classifier head and
+the /embed endpoint bind to, so the encoder weights are loaded only once.
+
+Settings (environment variables):
+    AI_ENCODER_NAME     - sentence-transformers model name or path
+    AI_ENCODER_BACKEND  - inference backend for CPU nodes:
+                          "torch"      fp32 PyTorch (default, used for training)
+                          "torch-int8" PyTorch with dynamic int8 quantization of Linear layers
+                          "onnx"       ONNX graph on onnxruntime CPU
+    AI_ONNX_FILE        - ONNX file inside the model repo for the "onnx" backend,
+                          e.g. "onnx/model_qint8_avx512_vnni.onnx" (default: fp32 export)
+
+The "onnx" backend needs onnxruntime, and optimum to export a model that
+ships no ONNX file: pip install "sentence-transformers[onnx]" (the
+commented entry in requirements.txt).
+
+Check a backend against fp32 with scripts/check_encoder_parity.py.
+Training always encodes with fp32 torch (see use_training_backend).
+"""
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache, EMBED_CACHE_PATH, EMBED_CACHE_SIZE
+from service_metrics import ENCODED_TEXTS, stage_timer
+
+
+# Sentence encoder used for training and inference
+ENCODER_NAME = os.environ.get("AI_ENCODER_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+ENCODER_BACKEND = os.environ.get("AI_ENCODER_BACKEND", "torch")
+ONNX_FILE = os.environ.get("AI_ONNX_FILE") or None
+
+ENCODER_BACKENDS = ("torch", "torch-int8", "onnx")
+
+# File sentence-transformers loads for backend="onnx" when AI_ONNX_FILE is unset
+DEFAULT_ONNX_FILE = "onnx/model.onnx"
+
+# Heads are fit on (and backends checked against) fp32 torch embeddings
+TRAINING_BACKEND = "torch"
+
+_encoder = None
+_encoder_hash = None
+_cache = None
+_lock = threading.Lock()
+
+
+def canonical_encoder_name(name):
+    """Strip the hub organisation prefix so 'all-MiniLM-L6-v2' names compare equal."""
+    if not name:
+        return name
+    prefix = "sentence-transformers/"
+    return name[len(prefix):] if name.startswith(prefix) else name
+
+
+def load_encoder(backend=None, name=ENCODER_NAME):
+    """
+    Load a SentenceTransformer with the given inference backend
+    (default: the configured one).
+
+    Returns:
+        (model, weight_hash) tuple; weight_hash fingerprints the fp32 weights
+        (None for the onnx backend, whose weights are not torch tensors)
+    """
+    from sentence_transformers import SentenceTransformer
+
+    backend = backend or ENCODER_BACKEND
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}', expected one of {ENCODER_BACKENDS}")
+
+    if backend == "onnx":
+        model_kwargs = {"file_name": ONNX_FILE} if ONNX_FILE else None
+        return SentenceTransformer(name, backend="onnx", model_kwargs=model_kwargs), None
+
+    model = SentenceTransformer(name)
+    weight_hash = compute_encoder_hash(model)
+    if backend == "torch-int8":
+        import torch
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model, weight_hash
+
+
+def use_training_backend():
+    """
+    Switch this process to the fp32 torch encoder before it is loaded.
+    AI_ENCODER_BACKEND selects a serving backend; training and head
+    evaluation ignore it, so heads are never fit on int8 or ONNX vectors.
+    """
+    global ENCODER_BACKEND
+    if ENCODER_BACKEND == TRAINING_BACKEND:
+        return
+    if _encoder is not None:
+        raise RuntimeError(f"Encoder already loaded with backend '{ENCODER_BACKEND}'")
+    print(f"⚠ Warning: Ignoring AI_ENCODER_BACKEND={ENCODER_BACKEND} for training; "
+          f"encoding with fp32 {TRAINING_BACKEND}")
+    ENCODER_BACKEND = TRAINING_BACKEND
+
+
+def get_encoder_backend():
+    """Backend of the shared encoder ("torch", "torch-int8" or "onnx")."""
+    return ENCODER_BACKEND
+
+
+def get_encoder():
+    """Return the shared SentenceTransformer, loading it on first use."""
+    global _encoder, _encoder_hash
+    if _encoder is None:
+        with _lock:
+            if _encoder is None:
+                print(f"Loading embedding model: {ENCODER_NAME} (backend: {ENCODER_BACKEND})")
+                _encoder, _encoder_hash = load_encoder()
+                print("  [OK] Embedding model loaded")
+    return _encoder
+
+
+def compute_encoder_hash(model):
+    """
+    Fingerprint encoder weights so a classifier head can be checked
+    against the encoder it was trained on.
+
+    Args:
+        model: SentenceTransformer (or any torch module)
+
+    Returns:
+        Hex sha256 digest (first 16 chars) of the model parameters
+    """
+    digest = hashlib.sha256()
+    state = model.state_dict()
+    for name in sorted(state):
+        digest.update(name.encode("utf-8"))
+        digest.update(state[name].detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def get_encoder_hash():
+    """Return the fp32 weight fingerprint of the shared encoder (None for onnx)."""
+    get_encoder()
+    return _encoder_hash
+
+
+def get_encoder_id():
+    """
+    Encoder name, weight version and backend, used to key cached embeddings.
+    ONNX exports have no torch weight hash, so the onnx id names the export
+    file instead (fp32 and quantized exports never share cached vectors).
+    """
+    backend = ENCODER_BACKEND
+    if backend == "onnx":
+        backend = f"onnx:{ONNX_FILE or DEFAULT_ONNX_FILE}"
+    return f"{canonical_encoder_name(ENCODER_NAME)}@{get_encoder_hash()}/{backend}"
+
+
+def get_embedding_cache():
+    """Return the shared embedding cache, or None if caching is disabled."""
+    global _cache
+    if _cache is None and (EMBED_CACHE_SIZE > 0 or EMBED_CACHE_PATH):
+        encoder_id = get_encoder_id()
+        with _lock:
+            if _cache is None:
+                _cache = EmbeddingCache(encoder_id)
+    return _cache
+
+
+def _encode(texts, normalize, batch_size):
+    model = get_encoder()
+    with stage_timer("encode"):
+        vectors = model.encode(
+            texts,
+            batch_size=batch_size or max(len(texts), 1),
+            convert_to_numpy=True,
+            normalize_embeddings=normalize,
+        )
+    ENCODED_TEXTS.inc(amount=len(texts))
+    return vectors.astype(np.float32, copy=False)
+
+
+def encode_texts(texts, normalize=False, batch_size=None, use_cache=True):
+    """
+    Encode a list of texts with the shared encoder in one call.
+    Cached embeddings are reused; only cache misses are encoded.
+
+    Args:
+        texts: List of text strings
+        normalize: If True, L2-normalize each embedding
+        batch_size: Encoder batch size (defaults to number of texts encoded)
+        use_cache: If False, bypass the embedding cache
+
+    Returns:
+        float32 numpy array of shape (len(texts), dim)
+    """
+    cache = get_embedding_cache() if use_cache else None
+    if cache is None or not texts:
+        return _encode(texts, normalize, batch_size)
+
+    vectors = cache.lookup(texts)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        # Encode each distinct missing text once
+        unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+        encoded = _encode(unique_texts, False, batch_size)
+        cache.store(unique_texts, encoded)
+        by_text = dict(zip(unique_texts, encoded))
+        for i in missing:
+            vectors[i] = by_text[texts[i]]
+
+    matrix = np.vstack(vectors).astype(np.float32)
+    if normalize:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.maximum(norms, 1e-12)
+    return matrix
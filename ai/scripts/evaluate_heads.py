@@ -0,0 +1,287 @@
+"""
+Classifier Head Evaluation - stratified k-fold grid search
+Scores LogisticRegression heads over a grid of C, class weights and
+solvers on the cached training embeddings (see training_embeddings.py),
+so nothing is re-encoded. Each (config, fold) fit runs in a process pool;
+workers memory-map the embedding matrix instead of receiving a copy.
+
+Per config it reports mean / std over folds of:
+    accuracy, macro-F1, expected calibration error (ECE),
+    "Uncertain" rate (category only: top probability < 0.65, as served),
+    fit time, and predict latency (one complaint per call, as in /predict)
+
+Configs are ranked by a combined objective:
+    objective = macroF1 - ece_weight * ECE - latency_weight * latency_ms
+
+Usage:
+    python scripts/evaluate_heads.py
+    python scripts/evaluate_heads.py --C 0.1,1,10 --solvers lbfgs,saga --folds 5 --workers 4
+    python scripts/evaluate_heads.py --task category --save   # refit the winner on all rows and save it
+    python scripts/evaluate_heads.py --task priority --save --model-dir model/candidate   # shadow it first
+    python scripts/evaluate_heads.py --snapshot data/snapshots/training --months 2026-09,2026-10
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from predictor import CATEGORY_CONFIDENCE_THRESHOLD
+from model_bundle import MODEL_DIR, head_bundle_path, legacy_bundle_path
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, "cache", "eval", "head_search.csv")
+
+DEFAULT_C = "0.1,1,10,100"
+DEFAULT_CLASS_WEIGHTS = "none,balanced"
+DEFAULT_SOLVERS = "lbfgs,newton-cg,saga"
+
+# Single-row predict_proba calls timed per fold
+LATENCY_SAMPLES = 200
+
+METRICS = ["accuracy", "macroF1", "ece", "uncertainRate", "fitSeconds", "latencyMs"]
+
+# Set in each worker by _init_worker
+_embeddings = None
+_labels = None
+_task = None
+
+
+def expected_calibration_error(probs, y_true, n_bins=15):
+    """Top-label ECE: weighted gap between confidence and accuracy per bin."""
+    confidence = probs.max(axis=1)
+    correct = probs.argmax(axis=1) == y_true
+    bins = np.minimum((confidence * n_bins).astype(int), n_bins - 1)
+    ece = 0.0
+    for b in np.unique(bins):
+        mask = bins == b
+        ece += mask.mean() * abs(correct[mask].mean() - confidence[mask].mean())
+    return float(ece)
+
+
+def build_grid(c_values, class_weights, solvers):
+    """All head configurations as LogisticRegression keyword dicts."""
+    grid = []
+    for solver in solvers:
+        for class_weight in class_weights:
+            for c in c_values:
+                grid.append({
+                    "C": c,
+                    "class_weight": class_weight,
+                    "solver": solver,
+                    "max_iter": 1000,
+                    "random_state": 42,
+                })
+    return grid
+
+
+def config_name(params):
+    return f"C={params['C']:g} weight={params['class_weight'] or 'none'} solver={params['solver']}"
+
+
+def _init_worker(matrix_path, labels, task):
+    """Memory-map the embedding matrix once per worker; one BLAS thread each."""
+    global _embeddings, _labels, _task
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+    _embeddings = np.load(matrix_path, mmap_mode="r")
+    _labels = labels
+    _task = task
+
+
+def _evaluate_fold(task):
+    """Fit one config on one fold and score it on the held-out rows."""
+    import warnings
+    from sklearn.exceptions import ConvergenceWarning
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import accuracy_score, f1_score
+
+    config_index, params, train_rows, test_rows = task
+    X_train = np.asarray(_embeddings[train_rows])
+    X_test = np.asarray(_embeddings[test_rows])
+    y_train, y_test = _labels[train_rows], _labels[test_rows]
+
+    classifier = LogisticRegression(**params)
+    started = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        classifier.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+
+    probs = classifier.predict_proba(X_test)
+    y_pred = classifier.classes_[probs.argmax(axis=1)]
+
+    samples = X_test[:LATENCY_SAMPLES]
+    timings = []
+    for row in samples:
+        started = time.perf_counter()
+        classifier.predict_proba(row[None, :])
+        timings.append(time.perf_counter() - started)
+
+    metrics = {
+        "accuracy": float(accuracy_score(y_test, y_pred)),
+        "macroF1": float(f1_score(y_test, y_pred, average="macro")),
+        "ece": expected_calibration_error(probs, np.searchsorted(classifier.classes_, y_test)),
+        "fitSeconds": fit_seconds,
+        "latencyMs": float(np.median(timings) * 1000),
+    }
+    # Only category answers are served as "Uncertain" below the threshold
+    if _task == "category":
+        metrics["uncertainRate"] = float((probs.max(axis=1) < CATEGORY_CONFIDENCE_THRESHOLD).mean())
+    return config_index, metrics
+
+
+def summarize(grid, fold_results, ece_weight, latency_weight):
+    """Mean/std per config plus the combined objective, best first."""
+    rows = []
+    for config_index, params in enumerate(grid):
+        results = fold_results.get(config_index, [])
+        row = {"config": config_name(params), "C": params["C"],
+               "class_weight": params["class_weight"] or "none", "solver": params["solver"]}
+        if isinstance(results, Exception) or not results:
+            row["error"] = str(results) if isinstance(results, Exception) else "no folds"
+            row["objective"] = float("-inf")
+            rows.append(row)
+            continue
+        for metric in METRICS:
+            if metric not in results[0]:
+                continue
+            values = np.array([r[metric] for r in results])
+            row[metric] = round(float(values.mean()), 4)
+            row[f"{metric}Std"] = round(float(values.std()), 4)
+        row["objective"] = round(
+            row["macroF1"] - ece_weight * row["ece"] - latency_weight * row["latencyMs"], 4
+        )
+        rows.append(row)
+    rows.sort(key=lambda r: r["objective"], reverse=True)
+    return rows
+
+
+def print_table(rows):
+    header = f"{'config':42} {'acc':>7} {'macroF1':>8} {'ECE':>7} {'uncert':>7} {'fit s':>7} {'ms/row':>7} {'objective':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        if "error" in row:
+            print(f"{row['config']:42} ERROR: {row['error']}")
+            continue
+        uncertain = f"{row['uncertainRate']:7.3f}" if "uncertainRate" in row else f"{'-':>7}"
+        print(f"{row['config']:42} {row['accuracy']:7.4f} {row['macroF1']:8.4f} {row['ece']:7.4f} "
+              f"{uncertain} {row['fitSeconds']:7.2f} {row['latencyMs']:7.3f} {row['objective']:10.4f}")
+
+
+def write_results(rows, output_path):
+    """Write the results table as CSV, with the same rows as JSON alongside."""
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    fields = ["config", "C", "class_weight", "solver", "objective"]
+    fields += [name for metric in METRICS for name in (metric, f"{metric}Std")] + ["error"]
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    json_path = os.path.splitext(output_path)[0] + ".json"
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2, default=str)
+    return json_path
+
+
+def parse_list(value, cast=str):
+    return [cast(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="k-fold grid search over classifier heads")
+    parser.add_argument("--task", choices=["category", "priority"], default="category")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--C", default=DEFAULT_C, help="Comma-separated inverse regularization strengths")
+    parser.add_argument("--class-weights", default=DEFAULT_CLASS_WEIGHTS, help="Comma-separated: none, balanced")
+    parser.add_argument("--solvers", default=DEFAULT_SOLVERS, help="Comma-separated LogisticRegression solvers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--ece-weight", type=float, default=0.5)
+    parser.add_argument("--latency-weight", type=float, default=0.01, help="Objective penalty per ms of predict latency")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--save", action="store_true", help="Refit the best config on all rows and save the head bundle")
+    parser.add_argument("--model-dir", default=MODEL_DIR, help="Where --save writes the bundle (default: the served models)")
+    parser.add_argument("--replace-priority", action="store_true",
+                        help="Allow --save to put a semantic priority head in front of the served legacy priority model")
+    parser.add_argument("--snapshot", default=None, help="Read a Parquet snapshot directory instead of data/complaints.csv")
+    parser.add_argument("--months", default=None, help="Comma-separated snapshot months (YYYY-MM)")
+    args = parser.parse_args()
+
+    # A new priority_head.pkl takes precedence over priority_model.pkl (the TF-IDF pipeline) at load time
+    if (args.save and args.task == "priority" and not args.replace_priority
+            and os.path.exists(legacy_bundle_path("priority", args.model_dir))
+            and not os.path.exists(head_bundle_path("priority", args.model_dir))):
+        parser.error(f"--save would replace the served priority model {legacy_bundle_path('priority', args.model_dir)}; "
+                     f"pass --replace-priority, or --model-dir model/candidate to shadow-evaluate the head first")
+
+    from sklearn.model_selection import StratifiedKFold
+    from sklearn.preprocessing import LabelEncoder
+    from train_model import load_data
+    from training_embeddings import load_training_embeddings
+    from encoder import use_training_backend
+
+    use_training_backend()
+
+    class_weights = [None if w.lower() == "none" else w for w in parse_list(args.class_weights)]
+    grid = build_grid(parse_list(args.C, float), class_weights, parse_list(args.solvers))
+
+    df = load_data(args.snapshot, parse_list(args.months) if args.months else None)
+    texts = df["text"].tolist()
+    label_encoder = LabelEncoder()
+    labels = label_encoder.fit_transform(df[args.task].tolist())
+
+    print("\nLoading training embeddings...")
+    embeddings, cache_info = load_training_embeddings(texts)
+    matrix_path = cache_info["path"]
+
+    folds = list(StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=42).split(texts, labels))
+    tasks = [(i, params, train_rows, test_rows) for i, params in enumerate(grid) for train_rows, test_rows in folds]
+    print(f"\nEvaluating {len(grid)} configs x {args.folds} folds on {len(texts)} rows ({args.workers} workers)...")
+
+    fold_results = {}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(matrix_path, labels, args.task)) as pool:
+        futures = [(task[0], pool.submit(_evaluate_fold, task)) for task in tasks]
+        for config_index, future in futures:
+            if isinstance(fold_results.get(config_index), Exception):
+                continue
+            try:
+                _, metrics = future.result()
+                fold_results.setdefault(config_index, []).append(metrics)
+            except Exception as e:
+                fold_results[config_index] = e
+    print(f"  [OK] Finished in {time.perf_counter() - started:.1f}s\n")
+
+    rows = summarize(grid, fold_results, args.ece_weight, args.latency_weight)
+    print_table(rows)
+    json_path = write_results(rows, args.output)
+    print(f"\n[OK] Results written to {args.output} and {json_path}")
+
+    best = rows[0]
+    if "error" in best:
+        print("⚠ Warning: No configuration completed successfully")
+        sys.exit(1)
+    print(f"[OK] Best config: {best['config']} (objective {best['objective']})")
+
+    if args.save:
+        from sklearn.linear_model import LogisticRegression
+        from train_model import save_model_bundle
+
+        params = next(p for p in grid if config_name(p) == best["config"])
+        print(f"\nRefitting best config on all {len(texts)} rows...")
+        classifier = LogisticRegression(**params).fit(np.asarray(embeddings), labels)
+        os.makedirs(args.model_dir, exist_ok=True)
+        save_model_bundle(classifier, label_encoder.classes_, label_encoder, args.task, model_dir=args.model_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,29 @@
-import random
+"""
+Synthetic Complaint Dataset Generator
+Builds labelled complaints from the templates below: clean samples, noisy
+variants (25% of clean) and negative contrast samples (20% of clean).
+
+Rows are produced in chunks. Each chunk has its own seed derived from
+--seed and the chunk number, so the output is the same for any --workers.
+Chunks are shuffled internally and written as they complete; memory use
+is bounded by the chunk size, not by --rows.
+
+Usage:
+    python scripts/generate_dataset.py                                  # data/complaints.csv, ~5.8k rows
+    python scripts/generate_dataset.py --rows 2000000 --workers 8 --seed 7 -o data/complaints_2m.parquet
+
+Parquet output (--format parquet or a .parquet path) needs pyarrow, which
+is in requirements.txt.
+"""
+
+import argparse
 import csv
+import random
 import sys
 import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 # Add scripts directory to path to import text_normalizer
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -138,68 +160,210 @@ places = [
     "Sector 5", "Sector 7", "Residential Colony"
 ]
 
-rows = []
-
-TARGET_PER_CATEGORY = 1000  # 4 categories → ~4000 rows
-
-# Generate regular samples with title + description
-clean_samples = []
-for category, priority_groups in categories.items():
-    for priority, templates in priority_groups.items():
-        for _ in range(TARGET_PER_CATEGORY // 3):
-            title_template, desc_template = random.choice(templates)
-            place = random.choice(places)
-            title = title_template.format(place=place)
-            description = desc_template.format(place=place)
-            # Combine title and description for training
-            combined_text = f"{title}. {description}"
-            # Normalize the text
-            normalized_text = normalize_text(combined_text)
-            clean_samples.append([title, description, normalized_text, category, priority.capitalize()])
-
-# Add clean samples
-rows.extend(clean_samples)
-
-# Add noisy variants (25% of clean samples)
-num_noisy = len(clean_samples) // 4
-noisy_indices = random.sample(range(len(clean_samples)), num_noisy)
-for idx in noisy_indices:
-    original_row = clean_samples[idx]
-    original_text = original_row[2]  # normalized text
-    
-    # Create noisy variant
-    noisy_text = add_noise_variant(original_text, noise_type='random')
-    # Normalize the noisy text too (to handle any edge cases)
-    noisy_text = normalize_text(noisy_text)
-    
-    # Create new row with noisy text but same labels
-    noisy_row = [original_row[0], original_row[1], noisy_text, original_row[3], original_row[4]]
-    rows.append(noisy_row)
-
-# Add negative contrast samples (20% of clean samples, before noisy variants)
-num_negative = len(clean_samples) // 5
-for _ in range(num_negative):
-    title_template, desc_template, correct_category = random.choice(negative_samples)
-    place = random.choice(places)
-    title = title_template.format(place=place)
-    description = desc_template.format(place=place)
-    combined_text = f"{title}. {description}"
-    # Normalize the text
-    normalized_text = normalize_text(combined_text)
-    # Assign priority randomly for negative samples
-    priority = random.choice(["High", "Medium", "Low"])
-    rows.append([title, description, normalized_text, correct_category, priority])
-
-random.shuffle(rows)
-
-with open("data/complaints.csv", "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(["title", "description", "text", "category", "priority"])
-    writer.writerows(rows)
-
-print(f"Dataset generated with {len(rows)} rows")
-print(f"  - Clean samples: {len(clean_samples)}")
-print(f"  - Noisy variants: {num_noisy} (25% of clean samples)")
-print(f"  - Negative contrast samples: {num_negative}")
-print(f"  - Total: {len(rows)}")
-print(f"  - All text normalized for robustness")
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, "data", "complaints.csv")
+
+COLUMNS = ["title", "description", "text", "category", "priority"]
+
+# Share of each sample kind relative to clean samples
+NOISY_RATIO = 0.25
+NEGATIVE_RATIO = 0.20
+
+TARGET_PER_CATEGORY = 1000  # 4 categories → ~5.8k rows including noisy and negative samples
+# Default size: the original fixed dataset (clean + noisy + negative rows)
+_DEFAULT_CLEAN = len(categories) * 3 * (TARGET_PER_CATEGORY // 3)
+DEFAULT_ROWS = _DEFAULT_CLEAN + _DEFAULT_CLEAN // 4 + _DEFAULT_CLEAN // 5
+
+DEFAULT_CHUNK_ROWS = 50000
+
+# (category, priority, templates) in a fixed order for balanced clean samples
+_CLEAN_GROUPS = [
+    (category, priority, templates)
+    for category, priority_groups in categories.items()
+    for priority, templates in priority_groups.items()
+]
+
+
+def plan_chunks(total_rows, chunk_rows):
+    """
+    Split total_rows into chunks of (chunk_index, n_clean, n_noisy, n_negative).
+    Counts keep the clean/noisy/negative proportions and sum exactly to total_rows.
+    """
+    plan = []
+    denominator = 1 + NOISY_RATIO + NEGATIVE_RATIO
+    for chunk_index, start in enumerate(range(0, total_rows, chunk_rows)):
+        size = min(chunk_rows, total_rows - start)
+        n_noisy = int(size * NOISY_RATIO / denominator)
+        n_negative = int(size * NEGATIVE_RATIO / denominator)
+        plan.append((chunk_index, size - n_noisy - n_negative, n_noisy, n_negative))
+    return plan
+
+
+def chunk_rng(seed, chunk_index):
+    """Deterministic random generator for one chunk."""
+    return random.Random(f"complaints:{seed}:{chunk_index}")
+
+
+def generate_chunk(seed, chunk_index, n_clean, n_noisy, n_negative):
+    """
+    Generate one shuffled chunk of dataset rows.
+
+    Returns:
+        List of [title, description, text, category, priority] rows
+    """
+    rng = chunk_rng(seed, chunk_index)
+    rows = []
+
+    # Clean samples, balanced across category x priority
+    clean_samples = []
+    for i in range(n_clean):
+        category, priority, templates = _CLEAN_GROUPS[(chunk_index * n_clean + i) % len(_CLEAN_GROUPS)]
+        title_template, desc_template = rng.choice(templates)
+        place = rng.choice(places)
+        title = title_template.format(place=place)
+        description = desc_template.format(place=place)
+        # Combine title and description for training, then normalize
+        normalized_text = normalize_text(f"{title}. {description}")
+        clean_samples.append([title, description, normalized_text, category, priority.capitalize()])
+    rows.extend(clean_samples)
+
+    # Noisy variants of clean samples, same labels
+    if clean_samples:
+        for idx in rng.sample(range(len(clean_samples)), min(n_noisy, len(clean_samples))):
+            original_row = clean_samples[idx]
+            noisy_text = add_noise_variant(original_row[2], noise_type='random', rng=rng)
+            # Normalize the noisy text too (to handle any edge cases)
+            noisy_text = normalize_text(noisy_text)
+            rows.append([original_row[0], original_row[1], noisy_text, original_row[3], original_row[4]])
+
+    # Negative contrast samples
+    for _ in range(n_negative):
+        title_template, desc_template, correct_category = rng.choice(negative_samples)
+        place = rng.choice(places)
+        title = title_template.format(place=place)
+        description = desc_template.format(place=place)
+        normalized_text = normalize_text(f"{title}. {description}")
+        # Assign priority randomly for negative samples
+        priority = rng.choice(["High", "Medium", "Low"])
+        rows.append([title, description, normalized_text, correct_category, priority])
+
+    rng.shuffle(rows)
+    return rows
+
+
+def _generate_chunk_task(args):
+    return generate_chunk(*args)
+
+
+def iter_chunks(plan, seed, workers=1):
+    """
+    Yield generated chunks in plan order. With several workers, at most
+    2 * workers chunks are in flight, which bounds memory.
+    """
+    tasks = [(seed,) + tuple(chunk) for chunk in plan]
+    if workers <= 1:
+        for task in tasks:
+            yield _generate_chunk_task(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        task_iter = iter(tasks)
+        for task in task_iter:
+            pending.append(pool.submit(_generate_chunk_task, task))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            yield pending.popleft().result()
+            for task in task_iter:
+                pending.append(pool.submit(_generate_chunk_task, task))
+                break
+
+
+class CsvChunkWriter:
+    def __init__(self, path):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetChunkWriter:
+    """Writes each chunk as one Parquet row group (needs pyarrow)."""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)") from e
+        self._pa = pa
+        self._schema = pa.schema([(name, pa.string()) for name in COLUMNS])
+        self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+
+    def write(self, rows):
+        columns = list(zip(*rows)) if rows else [[] for _ in COLUMNS]
+        table = self._pa.Table.from_arrays(
+            [self._pa.array(column, type=self._pa.string()) for column in columns], schema=self._schema
+        )
+        self._writer.write_table(table)
+
+    def close(self):
+        self._writer.close()
+
+
+def open_writer(path, fmt):
+    return ParquetChunkWriter(path) if fmt == "parquet" else CsvChunkWriter(path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic complaint dataset")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help=f"Total rows (default {DEFAULT_ROWS})")
+    parser.add_argument("--seed", type=int, default=None, help="Base seed (default: random, printed)")
+    parser.add_argument("--workers", type=int, default=1, help="Generator processes")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per generated/written chunk")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--format", choices=["csv", "parquet"],
+                        help="Output format (default: from the output extension, else csv)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fmt = args.format or ("parquet" if args.output.lower().endswith(".parquet") else "csv")
+    seed = args.seed if args.seed is not None else random.SystemRandom().randrange(2 ** 31)
+    plan = plan_chunks(max(0, args.rows), max(1, args.chunk_rows))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    started = time.perf_counter()
+    total = 0
+    writer = open_writer(args.output, fmt)
+    try:
+        for rows in iter_chunks(plan, seed, args.workers):
+            writer.write(rows)
+            total += len(rows)
+            if len(plan) > 1:
+                print(f"  {total}/{args.rows} rows")
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - started
+
+    num_clean = sum(chunk[1] for chunk in plan)
+    num_noisy = sum(chunk[2] for chunk in plan)
+    num_negative = sum(chunk[3] for chunk in plan)
+    print(f"Dataset generated with {total} rows: {args.output}")
+    print(f"  - Clean samples: {num_clean}")
+    print(f"  - Noisy variants: {num_noisy} (25% of clean samples)")
+    print(f"  - Negative contrast samples: {num_negative}")
+    print(f"  - Total: {total}")
+    print(f"  - All text normalized for robustness")
+    print(f"  - Seed: {seed} ({len(plan)} chunks, {args.workers} workers, {elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Inference Executor for the AI service
+CPU-heavy work (encoding, classifier heads, index search) runs on a small
+dedicated thread pool instead of Starlette's default threadpool, so torch
+intra-op threads only compete with each other and I/O-bound routes keep
+their own threads.
+
+- bounded: at most AI_INFERENCE_MAX_QUEUE jobs may wait for a thread;
+  beyond that submissions fail fast with QueueFull (HTTP 429 + Retry-After)
+- deadlines: a job whose deadline passed while it waited is skipped, and
+  the caller stops waiting at the deadline (HTTP 504). The Node server
+  gives up after 10 s, so nothing is computed for answers nobody reads
+
+Settings (environment variables):
+    AI_INFERENCE_WORKERS     - inference threads (default 1; each uses all torch threads)
+    AI_INFERENCE_MAX_QUEUE   - jobs allowed to wait for a thread (default 64)
+    AI_REQUEST_DEADLINE_MS   - default per-request deadline (default 10000, the Node axios timeout)
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from service_metrics import INFERENCE_DROPPED
+
+
+INFERENCE_WORKERS = int(os.environ.get("AI_INFERENCE_WORKERS", "1"))
+INFERENCE_MAX_QUEUE = int(os.environ.get("AI_INFERENCE_MAX_QUEUE", "64"))
+REQUEST_DEADLINE_MS = float(os.environ.get("AI_REQUEST_DEADLINE_MS", "10000"))
+
+
+class QueueFull(Exception):
+    """Raised when no more work can be queued; retry_after is a hint in seconds."""
+
+    def __init__(self, retry_after=1):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline passed before its result was ready."""
+
+    def __init__(self):
+        super().__init__("Request deadline exceeded")
+
+
+def deadline_after(timeout_ms=REQUEST_DEADLINE_MS):
+    """Monotonic deadline timeout_ms from now."""
+    return time.monotonic() + timeout_ms / 1000.0
+
+
+class InferenceExecutor:
+    """
+    Bounded thread pool for blocking inference calls, awaited from async handlers.
+
+    Args:
+        workers: Number of inference threads
+        max_queue: Jobs allowed to wait for a thread before QueueFull
+    """
+
+    def __init__(self, workers=INFERENCE_WORKERS, max_queue=INFERENCE_MAX_QUEUE):
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._skipped = 0
+        self._abandoned = 0
+        # Moving average of job duration, used for the Retry-After hint
+        self._mean_seconds = 0.05
+
+    def is_full(self):
+        return self._queued >= self.max_queue
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained (at least 1)."""
+        with self._lock:
+            backlog = self._queued + self._running
+            mean = self._mean_seconds
+        return max(1, math.ceil(backlog * mean / self.workers))
+
+    def reject(self):
+        """Count a rejected submission and build the QueueFull error."""
+        with self._lock:
+            self._rejected += 1
+        INFERENCE_DROPPED.inc("queue_full")
+        return QueueFull(self.retry_after())
+
+    def admit(self):
+        """Raise QueueFull if the queue is full (for streams admitted once, then run unbounded)."""
+        if self.is_full():
+            raise self.reject()
+
+    def _job(self, fn, args, deadline):
+        expired = deadline is not None and time.monotonic() >= deadline
+        with self._lock:
+            self._queued -= 1
+            if expired:
+                self._skipped += 1
+            else:
+                self._running += 1
+        if expired:
+            raise DeadlineExceeded()
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._mean_seconds = 0.9 * self._mean_seconds + 0.1 * elapsed
+
+    def _on_done(self, future):
+        # A job cancelled before it started never ran _job
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+                self._skipped += 1
+
+    async def run(self, fn, *args, deadline=None, bounded=True):
+        """
+        Run fn(*args) on an inference thread and await the result.
+
+        Args:
+            fn: Blocking callable
+            deadline: Optional time.monotonic() deadline; queued work past it
+                is skipped and the caller gets DeadlineExceeded
+            bounded: False skips the queue limit (used for follow-up work of
+                an already admitted request, e.g. the next bulk chunk)
+
+        Returns:
+            fn's return value
+        """
+        if deadline is not None and time.monotonic() >= deadline:
+            INFERENCE_DROPPED.inc("deadline")
+            raise DeadlineExceeded()
+        with self._lock:
+            full = bounded and self._queued >= self.max_queue
+            if not full:
+                self._queued += 1
+        if full:
+            raise self.reject()
+
+        future = self._pool.submit(self._job, fn, args, deadline)
+        future.add_done_callback(self._on_done)
+        waiter = asyncio.wrap_future(future)
+        if deadline is None:
+            return await waiter
+        try:
+            # On timeout the wrapped future is cancelled, which also cancels
+            # the job if it has not started yet
+            return await asyncio.wait_for(waiter, max(0.0, deadline - time.monotonic()))
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            if future.running():
+                # Nothing can stop it now; it finishes, but nobody reads the result
+                with self._lock:
+                    self._abandoned += 1
+            INFERENCE_DROPPED.inc("deadline")
+            raise DeadlineExceeded() from None
+
+    def stats(self):
+        """Queue settings and job counters."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "maxQueue": self.max_queue,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "skippedPastDeadline": self._skipped,
+                "abandonedPastDeadline": self._abandoned,
+                "meanJobMs": round(self._mean_seconds * 1000, 2),
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,273 @@
+"""
+Lexical Cascade - cheap first-stage category head
+A hashing-vectorizer + LogisticRegression head scores the normalized text
+of every /predict (and /predict/bulk) complaint first. When its top
+probability reaches a calibrated threshold (never below the 0.65
+"Uncertain" cut-off), it answers the category and no sentence embedding
+is computed for the category head; otherwise the complaint escalates to
+the semantic (MiniLM) head. Category confidences keep their meaning: the
+answering head's top probability, "Uncertain" below 0.65.
+
+The priority head is not part of the cascade: the served one scores every
+complaint as before (when it is a semantic head, escalation-free rows are
+still embedded for it).
+
+The threshold is calibrated by train_model.py on a held-out split: the
+lowest threshold at which the lexical head's answers on the rows it would
+take are at least as accurate as the semantic head's answers on the same
+rows (and at least LEXICAL_MIN_PRECISION accurate). The escalation rate and
+accuracy parity are measured on a further held-out test split and stored
+in the bundle. The served head is the one fit on the train split, so the
+threshold and the stored report describe exactly the model that answers.
+
+Settings (environment variables):
+    AI_LEXICAL_CASCADE  - "0" serves the semantic heads only, even if a lexical bundle exists (default "1")
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from text_normalizer import NORMALIZER_VERSION
+
+
+LEXICAL_CASCADE_ENABLED = os.environ.get("AI_LEXICAL_CASCADE", "1") != "0"
+
+LEXICAL_BUNDLE_FORMAT = "lexical-head/v1"
+
+# Hashed word unigrams + bigrams of the normalized text
+LEXICAL_N_FEATURES = 2 ** 18
+LEXICAL_NGRAM_RANGE = (1, 2)
+LEXICAL_C = 10.0
+
+# Lexical answers must be at least this accurate on the calibration split
+LEXICAL_MIN_PRECISION = 0.98
+# Thresholds tried during calibration; NEVER_ACCEPT escalates every complaint
+THRESHOLD_GRID = [round(t, 2) for t in np.arange(0.65, 0.995, 0.01)] + [0.995, 0.999]
+NEVER_ACCEPT = 1.01
+
+# Same rule as the /predict response (predictor.CATEGORY_CONFIDENCE_THRESHOLD)
+UNCERTAIN_BELOW = 0.65
+
+
+def lexical_head_path(task_name, model_dir):
+    return os.path.join(model_dir, f"{task_name}_lexical.pkl")
+
+
+def make_vectorizer(n_features=LEXICAL_N_FEATURES, ngram_range=LEXICAL_NGRAM_RANGE):
+    """Stateless text featurizer (nothing to fit or store besides its parameters)."""
+    from sklearn.feature_extraction.text import HashingVectorizer
+    return HashingVectorizer(n_features=n_features, ngram_range=tuple(ngram_range), alternate_sign=False)
+
+
+class LexicalClassifier:
+    """
+    Hashing-vectorizer head with its calibrated escalation threshold.
+    Scores normalized texts directly (like a legacy text pipeline), so the
+    predictor applies the same result rules to it as to the semantic head.
+    """
+
+    def __init__(self, classifier, classes_, threshold, model_version=None,
+                 n_features=LEXICAL_N_FEATURES, ngram_range=LEXICAL_NGRAM_RANGE, calibration=None):
+        self.classifier = classifier
+        self.classes_ = classes_
+        self.threshold = threshold
+        self.model_version = model_version
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.calibration = calibration or {}
+        self.vectorizer = make_vectorizer(n_features, ngram_range)
+        self._lock = threading.Lock()
+        self.answered = 0
+        self.escalated = 0
+
+    def predict_proba(self, texts):
+        return self.classifier.predict_proba(self.vectorizer.transform(texts))
+
+    def accepts(self, probs):
+        """Boolean mask of rows answered here (top probability >= threshold)."""
+        return probs.max(axis=1) >= self.threshold
+
+    def record(self, answered, escalated):
+        with self._lock:
+            self.answered += answered
+            self.escalated += escalated
+
+    def stats(self):
+        with self._lock:
+            total = self.answered + self.escalated
+            return {
+                "model_version": self.model_version,
+                "threshold": self.threshold,
+                "answered": self.answered,
+                "escalated": self.escalated,
+                "escalationRate": round(self.escalated / total, 4) if total else None,
+                "calibration": self.calibration,
+            }
+
+
+def served_labels(probs, classes_):
+    """Labels as /predict reports them: argmax class, "Uncertain" below 0.65."""
+    labels = np.asarray(classes_, dtype=object)[np.argmax(probs, axis=1)]
+    labels[probs.max(axis=1) < UNCERTAIN_BELOW] = "Uncertain"
+    return labels
+
+
+def calibrate_threshold(lexical_probs, lexical_classes, semantic_labels, y_true,
+                        min_precision=LEXICAL_MIN_PRECISION, tolerance=0.0):
+    """
+    Lowest threshold (from THRESHOLD_GRID) at which, for it and every
+    higher threshold, the lexical answers on the rows it accepts are at
+    least min_precision accurate and no less accurate than the semantic
+    head's answers on those rows (minus tolerance).
+
+    Returns:
+        (threshold, table): NEVER_ACCEPT if no threshold qualifies; table has
+        one row per grid threshold (accepted share, both accuracies)
+    """
+    lexical_labels = served_labels(lexical_probs, lexical_classes)
+    top = lexical_probs.max(axis=1)
+    table = []
+    for threshold in THRESHOLD_GRID:
+        accepted = top >= threshold
+        if not accepted.any():
+            table.append({"threshold": threshold, "accepted": 0.0, "lexicalAccuracy": None,
+                          "semanticAccuracy": None, "ok": True})
+            continue
+        lexical_accuracy = float(np.mean(lexical_labels[accepted] == y_true[accepted]))
+        semantic_accuracy = float(np.mean(semantic_labels[accepted] == y_true[accepted]))
+        table.append({
+            "threshold": threshold,
+            "accepted": round(float(accepted.mean()), 4),
+            "lexicalAccuracy": round(lexical_accuracy, 4),
+            "semanticAccuracy": round(semantic_accuracy, 4),
+            "ok": lexical_accuracy >= min_precision and lexical_accuracy >= semantic_accuracy - tolerance,
+        })
+    threshold = NEVER_ACCEPT
+    for row in reversed(table):
+        if not row["ok"]:
+            break
+        threshold = row["threshold"]
+    return threshold, table
+
+
+def train_lexical_head(texts, labels, embeddings, fit_semantic, model_version,
+                       min_precision=LEXICAL_MIN_PRECISION, tolerance=0.0, seed=42):
+    """
+    Fit the lexical category head and calibrate its escalation threshold.
+
+    Rows are split 60/20/20 (stratified) into train / calibration / test.
+    A lexical and a semantic head are fit on the train rows; the threshold
+    is calibrated on the calibration rows; escalation rate and accuracy
+    parity of the cascade vs the semantic head alone are measured on the
+    test rows. The lexical head fit on the train rows is the one returned
+    (refitting it on all rows would serve a model the threshold was not
+    calibrated for).
+
+    Args:
+        texts: Normalized texts
+        labels: Category labels
+        embeddings: Sentence embeddings of texts (for the semantic reference head)
+        fit_semantic: Callable(embeddings, labels) -> fitted classifier, as train_model fits the served head
+        model_version: Version string stored in the bundle
+
+    Returns:
+        (LexicalClassifier, report dict)
+    """
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+
+    texts = np.asarray(texts, dtype=object)
+    labels = np.asarray(labels, dtype=object)
+    rows = np.arange(len(labels))
+    train_rows, rest = train_test_split(rows, test_size=0.4, stratify=labels, random_state=seed)
+    calib_rows, test_rows = train_test_split(rest, test_size=0.5, stratify=labels[rest], random_state=seed)
+
+    vectorizer = make_vectorizer()
+
+    def fit_lexical(subset):
+        classifier = LogisticRegression(C=LEXICAL_C, max_iter=2000, class_weight="balanced")
+        return classifier.fit(vectorizer.transform(texts[subset]), labels[subset])
+
+    lexical = fit_lexical(train_rows)
+    semantic = fit_semantic(embeddings[train_rows], labels[train_rows])
+
+    def scores(subset):
+        lexical_probs = lexical.predict_proba(vectorizer.transform(texts[subset]))
+        semantic_labels = served_labels(semantic.predict_proba(embeddings[subset]), semantic.classes_)
+        return lexical_probs, semantic_labels
+
+    lexical_probs, semantic_labels = scores(calib_rows)
+    threshold, table = calibrate_threshold(lexical_probs, lexical.classes_, semantic_labels,
+                                           labels[calib_rows], min_precision, tolerance)
+
+    # Held-out test split: the cascade as served vs the semantic head alone
+    lexical_probs, semantic_labels = scores(test_rows)
+    y_test = labels[test_rows]
+    accepted = lexical_probs.max(axis=1) >= threshold
+    cascade_labels = np.where(accepted, served_labels(lexical_probs, lexical.classes_), semantic_labels)
+    report = {
+        "splits": {"train": len(train_rows), "calibration": len(calib_rows), "test": len(test_rows)},
+        "threshold": threshold,
+        "minPrecision": min_precision,
+        "test": {
+            "escalationRate": round(float(1 - accepted.mean()), 4),
+            "cascadeAccuracy": round(float(np.mean(cascade_labels == y_test)), 4),
+            "semanticAccuracy": round(float(np.mean(semantic_labels == y_test)), 4),
+            "cascadeUncertainRate": round(float(np.mean(cascade_labels == "Uncertain")), 4),
+            "semanticUncertainRate": round(float(np.mean(semantic_labels == "Uncertain")), 4),
+            "agreement": round(float(np.mean(cascade_labels == semantic_labels)), 4),
+            "lexicalAccuracyOnAnswered": round(float(np.mean(cascade_labels[accepted] == y_test[accepted])), 4)
+            if accepted.any() else None,
+        },
+        "calibrationTable": table,
+    }
+
+    head = LexicalClassifier(lexical, lexical.classes_, threshold, model_version, calibration=report)
+    return head, report
+
+
+def save_lexical_head(head, task_name, model_dir):
+    """Save a lexical head bundle (classifier, classes, threshold, featurizer parameters)."""
+    import joblib
+    bundle = {
+        "format": LEXICAL_BUNDLE_FORMAT,
+        "classifier": head.classifier,
+        "classes_": head.classes_,
+        "threshold": head.threshold,
+        "model_version": head.model_version,
+        "n_features": head.n_features,
+        "ngram_range": list(head.ngram_range),
+        "normalizer_version": NORMALIZER_VERSION,
+        "calibration": head.calibration,
+    }
+    path = lexical_head_path(task_name, model_dir)
+    joblib.dump(bundle, path)
+    return path
+
+
+def load_lexical_head(task_name, model_dir):
+    """
+    Load a lexical head bundle.
+
+    Returns:
+        (LexicalClassifier, path), or (None, None) if there is none, the
+        cascade is disabled, or the bundle was fit on another normalizer version
+    """
+    import joblib
+    path = lexical_head_path(task_name, model_dir)
+    if not LEXICAL_CASCADE_ENABLED or not os.path.exists(path):
+        return None, None
+    bundle = joblib.load(path)
+    if not isinstance(bundle, dict) or bundle.get("format") != LEXICAL_BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported lexical head bundle format in {path}")
+    if bundle.get("normalizer_version") != NORMALIZER_VERSION:
+        print(f"⚠ Warning: {path} was fit on normalizer version {bundle.get('normalizer_version')}, "
+              f"serving {NORMALIZER_VERSION}; lexical cascade disabled")
+        return None, None
+    head = LexicalClassifier(
+        bundle["classifier"], bundle["classes_"], bundle["threshold"], bundle.get("model_version"),
+        bundle["n_features"], bundle["ngram_range"], bundle.get("calibration"),
+    )
+    return head, path
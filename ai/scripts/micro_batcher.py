@@ -0,0 +1,188 @@
+"""
+Micro-Batching Scheduler for the AI service
+Collects concurrent requests for a short window (or until the batch is
+full), runs them through one batched call in a worker thread, and fans
+the results back out to the waiting requests.
+
+Requests carry an optional deadline: a request whose deadline passes
+while it is queued is dropped from its batch and its caller gets
+DeadlineExceeded. Once AI_INFERENCE_MAX_QUEUE requests are waiting, new
+ones are rejected with QueueFull.
+
+Settings (environment variables):
+    AI_BATCH_WINDOW_MS  - how long to wait for more requests (default 5 ms)
+    AI_BATCH_MAX_SIZE   - maximum requests per batch (default 32)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import Counter
+
+from inference_executor import INFERENCE_MAX_QUEUE, DeadlineExceeded, QueueFull
+from service_metrics import BATCH_SIZE, INFERENCE_DROPPED, STAGE_SECONDS
+
+
+BATCH_WINDOW_MS = float(os.environ.get("AI_BATCH_WINDOW_MS", "5"))
+BATCH_MAX_SIZE = int(os.environ.get("AI_BATCH_MAX_SIZE", "32"))
+
+
+class MicroBatcher:
+    """
+    Async request queue that groups pending items into batches.
+
+    process_batch(items) is a blocking function that receives a list of
+    items and returns a list of results in the same order. A result that
+    is an Exception instance is raised to that item's caller only.
+
+    Batches run on executor (an InferenceExecutor) when given, else on the
+    event loop's default executor.
+    """
+
+    def __init__(self, process_batch, window_ms=BATCH_WINDOW_MS, max_batch_size=BATCH_MAX_SIZE,
+                 executor=None, max_queue=INFERENCE_MAX_QUEUE):
+        self.process_batch = process_batch
+        self.window_ms = window_ms
+        self.max_batch_size = max(1, max_batch_size)
+        self.executor = executor
+        self.max_queue = max(1, max_queue)
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._last_batch_size = 0
+        self._max_seen = 0
+        self._size_histogram = Counter()
+        self._rejected = 0
+        self._expired = 0
+
+    def _ensure_worker(self):
+        """Start the batching loop on the running event loop (lazily)."""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item, deadline=None):
+        """
+        Queue one item and wait for its result.
+
+        Args:
+            item: Item passed to process_batch
+            deadline: Optional time.monotonic() deadline; raises
+                DeadlineExceeded once it passes (the item is dropped if it
+                has not been dispatched yet)
+
+        Returns:
+            (result, batch_size) tuple; batch_size is the realized size of
+            the batch this item was processed in
+        """
+        self._ensure_worker()
+        if self._queue.qsize() >= self.max_queue:
+            with self._stats_lock:
+                self._rejected += 1
+            if self.executor is not None:
+                raise self.executor.reject()
+            INFERENCE_DROPPED.inc("queue_full")
+            raise QueueFull()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future, time.perf_counter(), deadline))
+        if deadline is None:
+            return await future
+        try:
+            # A timed-out future is cancelled, so _run skips it if still queued
+            return await asyncio.wait_for(future, max(0.0, deadline - time.monotonic()))
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            with self._stats_lock:
+                self._expired += 1
+            INFERENCE_DROPPED.inc("deadline")
+            raise DeadlineExceeded() from None
+
+    def queue_depth(self):
+        """Number of requests waiting for a batch."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _process_timed(self, items, dispatched):
+        """Run process_batch in the executor, recording how long it waited for a thread."""
+        STAGE_SECONDS.observe(time.perf_counter() - dispatched, "executor_wait")
+        return self.process_batch(items)
+
+    async def _collect(self):
+        """Wait for the first item, then gather more until the window closes or the batch is full."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                # Window closed: still take anything already queued
+                while len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Drop items whose caller has gone away or whose deadline passed
+            now = time.monotonic()
+            for _, future, _, deadline in batch:
+                if deadline is not None and now >= deadline and not future.done():
+                    future.set_exception(DeadlineExceeded())
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+            dispatched = time.perf_counter()
+            for _, _, enqueued, _ in batch:
+                STAGE_SECONDS.observe(dispatched - enqueued, "queue_wait")
+            items = [item for item, _, _, _ in batch]
+            try:
+                if self.executor is not None:
+                    results = await self.executor.run(self._process_timed, items, dispatched, bounded=False)
+                else:
+                    results = await loop.run_in_executor(None, self._process_timed, items, dispatched)
+            except Exception as e:
+                results = [e] * len(items)
+            self._record(len(items))
+            for (_, future, _, _), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result((result, len(items)))
+
+    def _record(self, size):
+        BATCH_SIZE.observe(size)
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._last_batch_size = size
+            self._max_seen = max(self._max_seen, size)
+            self._size_histogram[size] += 1
+
+    def stats(self):
+        """Return batching settings and realized batch-size statistics."""
+        with self._stats_lock:
+            return {
+                "windowMs": self.window_ms,
+                "maxBatchSize": self.max_batch_size,
+                "batches": self._batches,
+                "requests": self._items,
+                "meanBatchSize": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "lastBatchSize": self._last_batch_size,
+                "maxRealizedBatchSize": self._max_seen,
+                "batchSizeHistogram": {str(k): v for k, v in sorted(self._size_histogram.items())},
+                "maxQueue": self.max_queue,
+                "rejected": self._rejected,
+                "expired": self._expired,
+            }
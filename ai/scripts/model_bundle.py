@@ -0,0 +1,185 @@
+"""
+Model Bundle Storage - slim classifier-head bundles
+A head bundle stores only the trained classifier, its classes, label list
+and model version, plus the name and weight hash of the sentence encoder
+it was trained on. The encoder itself is never pickled: at load time every
+head is bound to the shared process-wide encoder (see encoder.py).
+
+Legacy bundles ({task}_model.pkl, a pickled SemanticClassifier including
+its own SentenceTransformer) are still loadable.
+
+Usage (one-time migration of legacy bundles):
+    python scripts/model_bundle.py --migrate
+"""
+
+import os
+import sys
+import types
+
+import joblib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import semantic_classifier
+from semantic_classifier import SemanticClassifier
+from encoder import (
+    ENCODER_NAME,
+    canonical_encoder_name,
+    compute_encoder_hash,
+    get_encoder,
+    get_encoder_hash,
+)
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.path.join(BASE_DIR, "model")
+
+BUNDLE_FORMAT = "semantic-head/v2"
+
+
+def head_bundle_path(task_name, model_dir=MODEL_DIR):
+    """Path of the slim head bundle for a task ('category' or 'priority')."""
+    return os.path.join(model_dir, f"{task_name}_head.pkl")
+
+
+def legacy_bundle_path(task_name, model_dir=MODEL_DIR):
+    """Path of the legacy full bundle for a task."""
+    return os.path.join(model_dir, f"{task_name}_model.pkl")
+
+
+def save_head_bundle(classifier, classes_, task_name, model_version,
+                     encoder_name=ENCODER_NAME, encoder_hash=None, model_dir=MODEL_DIR):
+    """
+    Save a slim head bundle (no encoder weights).
+
+    Args:
+        classifier: Trained sklearn classifier operating on embeddings
+        classes_: Class labels (numpy array)
+        task_name: 'category' or 'priority'
+        model_version: Version string reported in responses
+        encoder_name: Name of the sentence encoder the head was trained on
+        encoder_hash: Weight fingerprint of that encoder
+        model_dir: Output directory
+
+    Returns:
+        Path of the saved bundle
+    """
+    label_list = classes_.tolist() if hasattr(classes_, 'tolist') else list(classes_)
+    bundle = {
+        "format": BUNDLE_FORMAT,
+        "classifier": classifier,
+        "classes_": classes_,
+        "label_list": label_list,
+        "model_version": model_version,
+        "encoder_name": encoder_name,
+        "encoder_hash": encoder_hash,
+    }
+    path = head_bundle_path(task_name, model_dir)
+    joblib.dump(bundle, path)
+    return path
+
+
+def _register_legacy_aliases():
+    """
+    Make SemanticClassifier importable under the module names that legacy
+    bundles were pickled with ('semantic_classifier' and 'train_model').
+    """
+    sys.modules.setdefault('semantic_classifier', semantic_classifier)
+    if 'train_model' not in sys.modules:
+        sys.modules['train_model'] = types.ModuleType('train_model')
+    if not hasattr(sys.modules['train_model'], 'SemanticClassifier'):
+        sys.modules['train_model'].SemanticClassifier = SemanticClassifier
+
+
+def _check_encoder(bundle, path, check_hash=True):
+    """Warn if a head was trained on a different encoder than the shared one."""
+    name = bundle.get("encoder_name")
+    if name and canonical_encoder_name(name) != canonical_encoder_name(ENCODER_NAME):
+        print(f"⚠ Warning: {path} was trained on encoder '{name}', serving '{ENCODER_NAME}'")
+        return
+    if not check_hash:
+        return
+    expected_hash = bundle.get("encoder_hash")
+    loaded_hash = get_encoder_hash()
+    if expected_hash and loaded_hash and expected_hash != loaded_hash:
+        print(f"⚠ Warning: {path} encoder hash {expected_hash} does not match "
+              f"loaded encoder {loaded_hash}")
+
+
+def load_head_bundle(path, encoder=None):
+    """
+    Load a slim head bundle and bind it to the shared encoder (or to the
+    given encoder; the weight-hash check only applies to the shared one).
+    """
+    bundle = joblib.load(path)
+    if not isinstance(bundle, dict) or bundle.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported head bundle format in {path}")
+    _check_encoder(bundle, path, check_hash=encoder is None)
+    return SemanticClassifier(
+        embedding_model=encoder if encoder is not None else get_encoder(),
+        classifier=bundle["classifier"],
+        classes_=bundle["classes_"],
+        model_version=bundle.get("model_version"),
+        label_list=bundle.get("label_list"),
+    )
+
+
+def load_legacy_bundle(path, encoder=None):
+    """
+    Load a legacy full bundle. A pickled SemanticClassifier is re-bound to
+    the shared encoder so its private encoder copy can be freed; any other
+    model (e.g. a TF-IDF Pipeline) is returned as-is.
+    """
+    _register_legacy_aliases()
+    model = joblib.load(path)
+    if isinstance(model, SemanticClassifier):
+        model.bind_encoder(encoder if encoder is not None else get_encoder())
+    return model
+
+
+def load_model_bundle(task_name, model_dir=MODEL_DIR, encoder=None):
+    """
+    Load the model for a task, preferring the slim head bundle.
+
+    Returns:
+        (model, path) tuple, or (None, None) if no bundle exists
+    """
+    for path, loader in ((head_bundle_path(task_name, model_dir), load_head_bundle),
+                         (legacy_bundle_path(task_name, model_dir), load_legacy_bundle)):
+        if os.path.exists(path):
+            return loader(path, encoder), path
+    return None, None
+
+
+def migrate_legacy_bundle(task_name, model_dir=MODEL_DIR):
+    """
+    Convert a legacy SemanticClassifier bundle into a slim head bundle.
+
+    Returns:
+        Path of the new head bundle, or None if there was nothing to migrate
+    """
+    path = legacy_bundle_path(task_name, model_dir)
+    if not os.path.exists(path):
+        return None
+    _register_legacy_aliases()
+    model = joblib.load(path)
+    if not isinstance(model, SemanticClassifier):
+        print(f"  Skipped {path}: not a semantic classifier ({type(model).__name__})")
+        return None
+    return save_head_bundle(
+        model.classifier,
+        model.classes_,
+        task_name,
+        model.model_version,
+        encoder_hash=compute_encoder_hash(model.embedding_model),
+        model_dir=model_dir,
+    )
+
+
+if __name__ == "__main__":
+    if "--migrate" not in sys.argv:
+        print(__doc__)
+        sys.exit(1)
+    for task in ("category", "priority"):
+        new_path = migrate_legacy_bundle(task)
+        if new_path:
+            print(f"[OK] Migrated {task} model to {new_path}")
@@ -0,0 +1,169 @@
+"""
+Model Slots - double-buffered classifier heads for zero-downtime reload
+The serving heads live in an active slot. A reload loads the new bundles
+into the standby slot on its own thread, warms them, and then swaps the
+slots with one reference assignment, so:
+- requests never wait on a reload; each micro-batch (or bulk stream) reads
+  the active slot once and finishes on those heads, even if a swap happens
+  meanwhile
+- a reload that fails to load or warm leaves the active slot untouched
+- the previous heads stay in the standby slot until the next reload, so
+  rollback is another swap
+
+The shared encoder is not part of a slot: heads are bound to the one
+process-wide encoder (see encoder.py), so a slot costs only its heads.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+from predictor import get_model_version
+from service_metrics import MODEL_RELOADS
+
+
+class ReloadInProgress(RuntimeError):
+    """Another reload (or rollback) is still running."""
+
+    def __init__(self):
+        super().__init__("A model reload is already in progress")
+
+
+class ModelSlot:
+    """
+    One loaded set of classifier heads; never modified once it serves.
+
+    Args:
+        name: Slot name ("A" or "B")
+        generation: Load counter (distinguishes successive loads of one slot)
+        category_model: Category head (or None)
+        priority_model: Priority head (or None)
+        paths: Bundle path per model
+        lexical_model: Lexical cascade head for category (or None)
+    """
+
+    def __init__(self, name, generation, category_model=None, priority_model=None, paths=None, lexical_model=None):
+        self.name = name
+        self.generation = generation
+        self.category_model = category_model
+        self.priority_model = priority_model
+        self.lexical_model = lexical_model
+        self.paths = paths or {}
+        self.model_version = get_model_version(category_model, priority_model)
+        self.loaded_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    def describe(self):
+        return {
+            "slot": self.name,
+            "generation": self.generation,
+            "model_version": self.model_version,
+            "lexicalThreshold": getattr(self.lexical_model, "threshold", None),
+            "loadedAt": self.loaded_at,
+            "paths": self.paths,
+        }
+
+
+class ModelSlots:
+    """Active and standby model slots with background reload and atomic swap."""
+
+    def __init__(self):
+        self.active = ModelSlot("A", 0)
+        self.standby = None
+        self.state = "idle"
+        self.last_reload = None
+        self._generation = 0
+        self._reload_lock = threading.Lock()
+
+    def install(self, category_model, priority_model, paths=None, lexical_model=None):
+        """Serve the given heads from slot A (startup load; no swap needed)."""
+        self._generation += 1
+        self.active = ModelSlot("A", self._generation, category_model, priority_model, paths, lexical_model)
+        return self.active
+
+    def reload(self, loader, warm=None, background=False):
+        """
+        Load heads into the standby slot, warm them, and swap them in.
+
+        Args:
+            loader: Callable returning a dict of ModelSlot arguments
+                (category_model, priority_model, paths, lexical_model)
+            warm: Optional callable(slot); raising aborts the reload
+            background: Return immediately and reload on a new thread
+
+        Returns:
+            The new active slot, or None when background=True
+
+        Raises:
+            ReloadInProgress: another reload or rollback is running
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgress()
+        if background:
+            thread = threading.Thread(target=self._reload, args=(loader, warm, True), name="model-reload", daemon=True)
+            thread.start()
+            return None
+        return self._reload(loader, warm, False)
+
+    def _reload(self, loader, warm, background):
+        started = time.perf_counter()
+        name = "B" if self.active.name == "A" else "A"
+        try:
+            self.state = "loading"
+            loaded = loader()
+            self._generation += 1
+            slot = ModelSlot(name, self._generation, **loaded)
+            self.state = "warming"
+            if warm is not None:
+                warm(slot)
+            # The swap: requests that already read the old slot finish on it
+            self.standby, self.active = self.active, slot
+            self._record("ok", started, slot=slot.describe())
+            print(f"[OK] Model reload: slot {slot.name} now serving {slot.model_version} "
+                  f"({self.last_reload['seconds']}s)")
+            return slot
+        except Exception as e:
+            self._record("failed", started, error=str(e))
+            print(f"⚠ ERROR: Model reload failed, still serving slot {self.active.name} "
+                  f"({self.active.model_version}): {e}")
+            if not background:
+                raise
+            return None
+        finally:
+            self.state = "idle"
+            self._reload_lock.release()
+
+    def rollback(self):
+        """
+        Swap the standby (previous) heads back in.
+
+        Returns:
+            The new active slot, or None if there is no standby slot
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgress()
+        try:
+            if self.standby is None:
+                return None
+            self.standby, self.active = self.active, self.standby
+            MODEL_RELOADS.inc("rollback")
+            print(f"[OK] Model rollback: slot {self.active.name} now serving {self.active.model_version}")
+            return self.active
+        finally:
+            self._reload_lock.release()
+
+    def _record(self, result, started, **details):
+        MODEL_RELOADS.inc(result)
+        self.last_reload = {
+            "result": result,
+            "finishedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - started, 3),
+            **details,
+        }
+
+    def status(self):
+        return {
+            "state": self.state,
+            "active": self.active.describe(),
+            "standby": self.standby.describe() if self.standby is not None else None,
+            "lastReload": self.last_reload,
+        }
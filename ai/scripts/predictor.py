@@ -0,0 +1,292 @@
+"""
+Prediction Core - Shared category/priority prediction logic
+Normalizes each complaint once and embeds it once, then feeds the same
+embedding vector to every semantic classifier head.
+
+With a lexical head loaded (see lexical_cascade.py), category prediction
+is a cascade: complaints the lexical head is confident about are answered
+by it, and only the rest are embedded for the semantic category head.
+Cascade results keep the slot's model_version and name the answering head
+in categorySource ("lexical", or "semantic" / "legacy" for the category head).
+"""
+
+import numpy as np
+
+from encoder import encode_texts
+from service_metrics import stage_timer
+
+
+# Category predictions below this confidence are reported as "Uncertain"
+CATEGORY_CONFIDENCE_THRESHOLD = 0.65
+
+# Priority returned when the priority model is unavailable or fails
+DEFAULT_PRIORITY = "Medium"
+
+
+def is_semantic_head(model):
+    """True if the model can score precomputed sentence embeddings."""
+    return model is not None and hasattr(model, 'predict_proba_from_embeddings')
+
+
+def get_model_version(category_model, priority_model):
+    """Return the model version used for governance tracking (category first)."""
+    if category_model and hasattr(category_model, 'model_version'):
+        return category_model.model_version
+    if priority_model and hasattr(priority_model, 'model_version'):
+        return priority_model.model_version
+    return None
+
+
+def embed_normalized(texts, category_model, priority_model):
+    """
+    Embed already-normalized texts once for all semantic heads.
+    Both heads are trained on the same sentence encoder, so the
+    category model's encoder is used when available.
+
+    Returns:
+        numpy array of embeddings, or None if no semantic head is loaded
+    """
+    for model in (category_model, priority_model):
+        if is_semantic_head(model):
+            return model.encode(texts, normalize=False)
+    return None
+
+
+def _head_proba(model, texts, embeddings):
+    """Score a head from shared embeddings, or from text for legacy pipelines."""
+    if is_semantic_head(model):
+        if embeddings is None:
+            raise ValueError("Embeddings unavailable")
+        return model.predict_proba_from_embeddings(embeddings)
+    return model.predict_proba(texts)
+
+
+def build_category_result(result, category_model, probs):
+    """Apply the "Uncertain below 0.65" rule to one row of category probabilities."""
+    cat_index = int(np.argmax(probs))
+    category_confidence = float(probs[cat_index])
+
+    # If confidence < 0.65, return "Uncertain"
+    if category_confidence < CATEGORY_CONFIDENCE_THRESHOLD:
+        result["category"] = "Uncertain"
+    else:
+        result["category"] = category_model.classes_[cat_index]
+    result["categoryConfidence"] = round(category_confidence, 3)
+
+
+def build_priority_result(result, priority_model, probs):
+    """Pick the most likely priority from one row of priority probabilities."""
+    pri_index = int(np.argmax(probs))
+    result["priority"] = priority_model.classes_[pri_index]
+    result["priorityConfidence"] = round(float(probs[pri_index]), 3)
+
+
+def predict_normalized(texts, category_model, priority_model, embeddings=None, category_probs=None):
+    """
+    Predict category and priority for a batch of normalized complaint texts.
+
+    Args:
+        texts: List of normalized text strings
+        category_model: Category classifier (or None if not loaded)
+        priority_model: Priority classifier (or None if not loaded)
+        embeddings: Optional precomputed embeddings for texts
+        category_probs: Optional precomputed category_model probabilities
+            (the lexical cascade stage already scored these texts)
+
+    Returns:
+        List of result dicts, one per text, in the /predict response format
+    """
+    results = [{"decision": "AI_PREDICTED"} for _ in texts]
+    model_version = get_model_version(category_model, priority_model)
+
+    embedding_error = None
+    if embeddings is None:
+        try:
+            embeddings = embed_normalized(texts, category_model, priority_model)
+        except Exception as e:
+            embedding_error = e
+
+    # ---------------- CATEGORY PREDICTION ----------------
+    if category_model is None:
+        for result in results:
+            result["category"] = "Uncertain"
+            result["categoryConfidence"] = 0.0
+            result["error"] = "Category model not loaded"
+    else:
+        try:
+            if category_probs is None:
+                if embedding_error is not None:
+                    raise embedding_error
+                with stage_timer("category_head"):
+                    category_probs = _head_proba(category_model, texts, embeddings)
+            for result, probs in zip(results, category_probs):
+                build_category_result(result, category_model, probs)
+        except Exception as e:
+            for result in results:
+                result["category"] = "Uncertain"
+                result["categoryConfidence"] = 0.0
+                result["error"] = f"Prediction error: {str(e)}"
+
+    # ---------------- PRIORITY PREDICTION ----------------
+    try:
+        if priority_model is None:
+            raise ValueError("Priority model not loaded")
+        if embedding_error is not None and is_semantic_head(priority_model):
+            raise embedding_error
+        with stage_timer("priority_head"):
+            priority_probs = _head_proba(priority_model, texts, embeddings)
+        for result, probs in zip(results, priority_probs):
+            build_priority_result(result, priority_model, probs)
+    except Exception:
+        for result in results:
+            result["priority"] = DEFAULT_PRIORITY  # Default fallback
+            result["priorityConfidence"] = 0.0
+
+    # Add model version to response for governance tracking
+    if model_version:
+        for result in results:
+            result["model_version"] = model_version
+
+    return results
+
+
+def split_cascade(texts, lexical_model):
+    """
+    Lexical cascade stage: score every text with the lexical head.
+
+    Returns:
+        (answered rows, their category probabilities, escalated rows)
+    """
+    if lexical_model is None or not texts:
+        return [], None, list(range(len(texts)))
+    with stage_timer("lexical_head"):
+        probs = lexical_model.predict_proba(texts)
+    accepted = lexical_model.accepts(probs)
+    answered = np.flatnonzero(accepted).tolist()
+    escalated = np.flatnonzero(~accepted).tolist()
+    lexical_model.record(len(answered), len(escalated))
+    return answered, probs[accepted], escalated
+
+
+def plan_cascade(texts, category_model, priority_model, lexical_model=None):
+    """
+    Decide which rows the lexical head answers and which rows need an
+    embedding: escalated rows for the semantic heads, and every row when
+    the priority head is semantic.
+
+    Returns:
+        dict with lexical_rows, lexical_probs, semantic_rows, vector_rows
+    """
+    lexical_rows, lexical_probs, semantic_rows = split_cascade(texts, lexical_model)
+    vector_rows = []
+    if semantic_rows and any(is_semantic_head(model) for model in (category_model, priority_model)):
+        vector_rows += semantic_rows
+    if lexical_rows and is_semantic_head(priority_model):
+        vector_rows += lexical_rows
+    return {
+        "lexical_rows": lexical_rows,
+        "lexical_probs": lexical_probs,
+        "semantic_rows": semantic_rows,
+        "vector_rows": sorted(vector_rows),
+    }
+
+
+def predict_planned(texts, plan, category_model, priority_model, lexical_model=None, vectors=None):
+    """
+    Predict every text following a plan_cascade plan.
+
+    Args:
+        vectors: Embeddings of plan["vector_rows"], in that order (None if
+            there are none or encoding failed; heads then retry or report it)
+
+    Returns:
+        (results in text order, groups): groups lists (rows, embeddings,
+        results) for each scored part; embeddings is None for a part that
+        was not embedded (lexical answers next to a non-semantic priority head)
+    """
+    position = {row: k for k, row in enumerate(plan["vector_rows"])}
+    results = [None] * len(texts)
+    groups = []
+    model_version = get_model_version(category_model, priority_model)
+    parts = (
+        (plan["semantic_rows"], category_model, None, "semantic" if is_semantic_head(category_model) else "legacy"),
+        (plan["lexical_rows"], lexical_model, plan["lexical_probs"], "lexical"),
+    )
+    for rows, model, probs, source in parts:
+        if not rows:
+            continue
+        embeddings = None
+        if vectors is not None and all(row in position for row in rows):
+            embeddings = vectors[[position[row] for row in rows]]
+        predictions = predict_normalized([texts[row] for row in rows], model, priority_model,
+                                         embeddings=embeddings, category_probs=probs)
+        for row, prediction in zip(rows, predictions):
+            # The slot's version whichever head answered; the head is categorySource
+            prediction.pop("model_version", None)
+            if model_version:
+                prediction["model_version"] = model_version
+            prediction["categorySource"] = source
+            results[row] = prediction
+        groups.append((rows, embeddings, predictions))
+    return results, groups
+
+
+def run_inference_batch(items, category_model, priority_model, on_predicted=None, lexical_model=None):
+    """
+    Process a mixed micro-batch of embed and predict requests with one
+    encoder pass and one pass per classifier head.
+
+    Args:
+        items: List of (kind, text) tuples; kind is "embed" (raw text) or
+            "predict" (normalized text)
+        category_model: Category classifier (or None if not loaded)
+        priority_model: Priority classifier (or None if not loaded)
+        on_predicted: Optional callable(texts, embeddings, results) run after
+            the predict items are scored, with the embeddings the heads used
+            (None for rows that were not embedded) for shadow evaluation;
+            its errors never affect the results
+        lexical_model: Optional lexical cascade head; predict items it is
+            confident about are not embedded for the category head
+
+    Returns:
+        List of results in item order: an embedding list for "embed" items,
+        a /predict result dict for "predict" items, or an Exception
+    """
+    texts = [text for _, text in items]
+    embed_rows = [i for i, (kind, _) in enumerate(items) if kind == "embed"]
+    predict_rows = [i for i, (kind, _) in enumerate(items) if kind == "predict"]
+    predict_texts = [texts[i] for i in predict_rows]
+    plan = plan_cascade(predict_texts, category_model, priority_model, lexical_model)
+
+    # One encoder pass for the embed items and the predict items that need vectors
+    encode_rows = sorted(embed_rows + [predict_rows[j] for j in plan["vector_rows"]])
+    embeddings = None
+    embedding_error = None
+    if encode_rows:
+        try:
+            embeddings = encode_texts([texts[i] for i in encode_rows])
+        except Exception as e:
+            embedding_error = e
+    position = {row: k for k, row in enumerate(encode_rows)}
+
+    results = [None] * len(items)
+    for i in embed_rows:
+        results[i] = embedding_error if embeddings is None else embeddings[position[i]].tolist()
+
+    if predict_rows:
+        vectors = None
+        if embeddings is not None and plan["vector_rows"]:
+            vectors = embeddings[[position[predict_rows[j]] for j in plan["vector_rows"]]]
+        predictions, groups = predict_planned(
+            predict_texts, plan, category_model, priority_model, lexical_model, vectors
+        )
+        for i, prediction in zip(predict_rows, predictions):
+            results[i] = prediction
+        if on_predicted is not None:
+            for rows, group_embeddings, group_results in groups:
+                try:
+                    on_predicted([predict_texts[j] for j in rows], group_embeddings, group_results)
+                except Exception as e:
+                    print(f"⚠ Warning: on_predicted hook failed: {e}")
+
+    return results
@@ -0,0 +1,171 @@
+"""
+Sampling Profiler - runtime-toggled, flamegraph-ready stacks
+While active, a background thread samples the Python stack of every other
+thread at a fixed interval and counts identical stacks. After the
+requested number of requests (or on stop) the counts are written in
+"collapsed" format, one "frame;frame;frame count" line per stack, which
+flamegraph.pl, speedscope and inferno read directly.
+
+When inactive there is no sampling thread; the per-request cost is one
+attribute check. Finishing a profile (joining the sampler and writing the
+file) never runs on the event loop.
+
+Settings (environment variables):
+    AI_PROFILE_DIR          - where profiles are written (default: ai/cache/profiles)
+    AI_PROFILE_INTERVAL_MS  - default sampling interval (default 5 ms)
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILE_DIR = os.environ.get("AI_PROFILE_DIR") or os.path.join(BASE_DIR, "cache", "profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("AI_PROFILE_INTERVAL_MS", "5"))
+
+# Leaf frames of threads that are parked, not working; skipped when sampling
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("base_events.py", "_run_once"),
+}
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame):
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_LEAVES
+
+
+class SamplingProfiler:
+    """Samples all threads until stopped or until enough requests completed."""
+
+    def __init__(self, output_dir=PROFILE_DIR):
+        self.output_dir = output_dir
+        self.active = False
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stacks = Counter()
+        self._samples = 0
+        self._target_requests = 0
+        self._requests = 0
+        self._interval = PROFILE_INTERVAL_MS / 1000.0
+        self._started = None
+        self.last_profile = None
+
+    def start(self, requests=100, interval_ms=PROFILE_INTERVAL_MS):
+        """
+        Begin sampling.
+
+        Args:
+            requests: Stop automatically after this many completed requests
+            interval_ms: Sampling interval
+
+        Returns:
+            False if a profile is already running
+        """
+        with self._lock:
+            if self.active:
+                return False
+            # Fresh event and counter per run: a previous sampler may still be finishing
+            self._stacks = Counter()
+            self._samples = 0
+            self._requests = 0
+            self._target_requests = max(1, requests)
+            self._interval = max(0.5, interval_ms) / 1000.0
+            self._started = time.time()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop, self._stacks),
+                                            name="sampling-profiler", daemon=True)
+            self.active = True
+            self._thread.start()
+            return True
+
+    def request_finished(self):
+        """
+        Count one completed request (run by the metrics middleware on every
+        request, on the event loop). Inactive, this is one attribute read;
+        the profile reaching its target is finished and written on its own
+        thread, never on the event loop.
+        """
+        if not self.active:
+            return
+        with self._lock:
+            if not self.active:
+                return
+            self._requests += 1
+            if self._requests < self._target_requests:
+                return
+            run = self._deactivate()
+        threading.Thread(target=self._finish, args=run, name="profile-writer", daemon=True).start()
+
+    def stop(self):
+        """
+        Stop sampling and write the collapsed-stack file.
+
+        Returns:
+            Path of the written profile, or None if none was running
+        """
+        with self._lock:
+            if not self.active:
+                return None
+            run = self._deactivate()
+        return self._finish(*run)
+
+    def _deactivate(self):
+        """Mark the run stopped (caller holds the lock); returns what _finish needs."""
+        self.active = False
+        self._stop.set()
+        return self._thread, self._stacks, self._started
+
+    def _finish(self, thread, stacks, started):
+        """Wait for the sampler thread to exit, then write its stacks."""
+        if thread is not threading.current_thread():
+            thread.join()
+        path = self._write(stacks, started)
+        self.last_profile = path
+        return path
+
+    def _run(self, stop, stacks):
+        own_id = threading.get_ident()
+        while not stop.wait(self._interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stacks[";".join(reversed(stack))] += 1
+            self._samples += 1
+
+    def _write(self, stacks, started):
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = f"profile-{datetime.fromtimestamp(started).strftime('%Y%m%d-%H%M%S')}.collapsed"
+        path = os.path.join(self.output_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def status(self):
+        with self._lock:
+            return {
+                "active": self.active,
+                "requests": self._requests,
+                "targetRequests": self._target_requests,
+                "samples": self._samples,
+                "distinctStacks": len(self._stacks),
+                "intervalMs": round(self._interval * 1000, 3),
+                "lastProfile": self.last_profile,
+            }
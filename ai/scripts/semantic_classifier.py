@@ -1,10 +1,10 @@
 """
 SemanticClassifier - Shared class for training and inference
 This module ensures the class can be properly unpickled in both contexts.
+The sentence encoder is bound at load time (see model_bundle.py) and is
+not part of the saved head bundle.
 """
 
-from sentence_transformers import SentenceTransformer
-
 
 class SemanticClassifier:
     """
@@ -23,30 +23,38 @@ class SemanticClassifier:
         from text_normalizer import normalize_for_inference
         self.normalize = normalize_for_inference
     
-    def predict_proba(self, texts):
-        """Predict class probabilities for input texts."""
+    def bind_encoder(self, embedding_model):
+        """Bind this head to a (shared) sentence encoder, replacing its own."""
+        self.embedding_model = embedding_model
+    
+    def encode(self, texts, normalize=True):
+        """
+        Generate embeddings for input texts.
+
+        Args:
+            texts: Text string or list of text strings
+            normalize: If False, texts are assumed to be normalized already
+
+        Returns:
+            numpy array of embeddings, one row per text
+        """
         if isinstance(texts, str):
             texts = [texts]
         
         # Normalize texts for robustness
-        normalized_texts = [self.normalize(text) for text in texts]
+        if normalize:
+            texts = [self.normalize(text) for text in texts]
         
-        # Generate embeddings
-        embeddings = self.embedding_model.encode(normalized_texts, convert_to_numpy=True)
-        
-        # Get probabilities from classifier
+        return self.embedding_model.encode(texts, convert_to_numpy=True)
+    
+    def predict_proba_from_embeddings(self, embeddings):
+        """Predict class probabilities from precomputed embeddings."""
         return self.classifier.predict_proba(embeddings)
     
+    def predict_proba(self, texts):
+        """Predict class probabilities for input texts."""
+        return self.predict_proba_from_embeddings(self.encode(texts))
+    
     def predict(self, texts):
         """Predict class labels for input texts."""
-        if isinstance(texts, str):
-            texts = [texts]
-        
-        # Normalize texts for robustness
-        normalized_texts = [self.normalize(text) for text in texts]
-        
-        # Generate embeddings
-        embeddings = self.embedding_model.encode(normalized_texts, convert_to_numpy=True)
-        
-        # Get predictions from classifier
-        return self.classifier.predict(embeddings)
+        return self.classifier.predict(self.encode(texts))
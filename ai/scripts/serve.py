@@ -0,0 +1,295 @@
+"""
+Pre-forking AI Service Server (Linux / macOS)
+Loads the encoder, classifier heads and vector index once in a parent
+process, then forks worker processes that serve the FastAPI app on one
+shared listening socket. Model weights stay in pages the workers share
+copy-on-write, so adding a worker costs its private memory (interpreter
+state, activations, caches) instead of another full model copy.
+
+- gc.freeze() runs before forking, so the collector never writes to the
+  parent's objects and un-shares their pages
+- the parent runs no torch kernels before forking (OpenMP thread pools
+  are not fork-safe); each worker sets its own torch thread count and
+  warms up in its lifespan
+- workers that exit unexpectedly are re-forked from the parent
+- SIGHUP reloads the classifier heads: the parent loads the new bundles
+  and has a short-lived child score the warm-up texts with them; only if
+  that succeeds does the parent swap them in (so re-forked workers start
+  on them) and forward the signal, and each worker then reloads in the
+  background as POST /admin/reload does. HTTP reload and rollback are
+  rejected with more than one worker
+
+Per-worker state: each worker holds its own copy of the mutable service
+state, so only read paths are served with more than one worker. Endpoints
+that would change one worker's copy return 409:
+- /index/upsert, /index/delete, /index/save, /index/backfilled and
+  /index/ann/train: the index is loaded read-only from AI_INDEX_PATH in the
+  parent and shared; build and save it with a single-worker instance
+  (uvicorn api.app:app), then restart serve.py. /search reports
+  readOnly=true, and the Node server then skips index backfills and syncs
+  and adds its recent-resolved-complaints comparison to the index hits, so
+  repeat detection still sees complaints resolved after the index was
+  saved (the 20 most recent, as before the index existed)
+- /analytics/complaints, /analytics/complaints/delete, /analytics/rebuild:
+  analytics needs a single-worker instance
+- /admin/reload, /admin/rollback: send SIGHUP to the parent instead
+- /shadow/load, /shadow/stop, /shadow/reset: candidates are loaded from
+  AI_SHADOW_MODEL_DIR at startup
+Reads of per-worker counters (/shadow/stats, /cascade/stats, /cache/stats,
+/batching/stats, /metrics, /profile/*) describe the worker that answered.
+
+Usage (from ai/):
+    python scripts/serve.py --workers 4 --port 8000
+    python scripts/serve.py --workers 4 --threads-per-worker 2
+
+Deploying retrained heads without a restart:
+    kill -HUP <parent pid>
+
+Measuring memory per worker (Linux):
+    kill -USR1 <parent pid>
+prints RSS, PSS and shared/private memory of the parent and every worker,
+from /proc/<pid>/smaps_rollup. PSS divides each shared page between the
+processes that map it, so the PSS column sums to the real footprint;
+RSS counts shared weights once per worker and overstates it.
+
+Measured with 3 workers (1 torch thread each) on the MiniLM model after
+600 /predict requests:
+
+    process                        PSS MB   private MB   shared MB
+    each worker                      ~189          ~45        ~569
+    total, parent + 3 workers        1066
+    one standalone process (RSS)     ~945
+
+so each worker after the first costs about 190 MB instead of a ~945 MB
+model copy, and starts in 0.2-0.3 s (warm-up only) instead of a ~5.5 s load.
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SCRIPTS_DIR)
+
+
+def smaps_rollup(pid):
+    """Memory summary (MB) for one process from /proc/<pid>/smaps_rollup, or None."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[0].endswith(":"):
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "shared": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def print_memory_report(parent_pid, worker_pids):
+    print(f"{'process':>16} {'RSS MB':>9} {'PSS MB':>9} {'shared MB':>10} {'private MB':>11}")
+    total_pss = 0.0
+    for label, pid in [("parent", parent_pid)] + [(f"worker {pid}", pid) for pid in worker_pids]:
+        memory = smaps_rollup(pid)
+        if memory is None:
+            print(f"{label:>16} (unavailable)")
+            continue
+        total_pss += memory["pss"]
+        print(f"{label:>16} {memory['rss']:9.1f} {memory['pss']:9.1f} {memory['shared']:10.1f} {memory['private']:11.1f}")
+    print(f"{'total PSS':>16} {total_pss:9.1f}", flush=True)
+
+
+def release_free_heap():
+    """Return free malloc arenas to the OS (glibc only; no-op elsewhere)."""
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def reload_worker():
+    """SIGHUP in a worker: reload the heads on a background thread (requests keep flowing)."""
+    from api import app as service
+    try:
+        service.reload_models(background=True)
+    except service.ReloadInProgress:
+        print(f"⚠ Warning: Worker {os.getpid()} is already reloading", flush=True)
+
+
+def warm_in_child(slot):
+    """
+    Warm-up check for a reload in the parent: a forked child scores the
+    warm-up texts with the standby slot's heads and reports by exit status,
+    so the parent never runs torch kernels itself.
+
+    Raises:
+        RuntimeError: the heads failed to score the warm-up texts
+    """
+    from api import app as service
+
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR1):
+                signal.signal(signum, signal.SIG_DFL)
+            service.warm_slot(slot)
+            status = 0
+        except Exception as e:
+            print(f"⚠ ERROR: Reload warm-up failed: {e}", flush=True)
+        finally:
+            os._exit(status)
+    while True:
+        try:
+            _, status = os.waitpid(pid, 0)
+            break
+        except InterruptedError:
+            continue
+    code = os.waitstatus_to_exitcode(status)
+    if code != 0:
+        raise RuntimeError(f"Warm-up child exited with status {code}")
+
+
+def run_worker(sock, args, threads):
+    """Worker process body: set torch threads, then serve on the inherited socket."""
+    import torch
+    import uvicorn
+    from api.app import app
+
+    # Memory reports are the parent's job; uvicorn installs its own SIGTERM/SIGINT handlers
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, lambda signum, frame: reload_worker())
+    gc.unfreeze()
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    print(f"[OK] Worker {os.getpid()} started ({threads} torch threads)", flush=True)
+
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the AI service with pre-forked workers sharing model memory")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="torch intra-op threads per worker (default: cores // workers, at least 1)")
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        print("⚠ ERROR: Pre-forking needs os.fork (Linux/macOS); use uvicorn --workers instead")
+        sys.exit(1)
+
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+
+    # Keep torch single-threaded in the parent so no OpenMP pool exists before fork
+    import torch
+    torch.set_num_threads(1)
+
+    # Read by api.app at import: disables the endpoints that change per-worker state
+    os.environ["AI_SERVE_WORKERS"] = str(args.workers)
+    sys.path.insert(0, BASE_DIR)
+    from api import app as service
+
+    print(f"Preloading models in parent {os.getpid()}...")
+    service.preload_models()
+    sock = bind_socket(args.host, args.port)
+    print(f"[OK] Listening on http://{args.host}:{args.port} with {args.workers} workers", flush=True)
+
+    # Move everything allocated so far out of the collector's reach, and
+    # hand heap freed during loading back to the OS before it is shared
+    gc.collect()
+    gc.freeze()
+    release_free_heap()
+
+    workers = {}
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(sock, args, threads)
+            finally:
+                os._exit(0)
+        workers[pid] = time.time()
+
+    for _ in range(args.workers):
+        spawn()
+
+    stopping = False
+
+    def handle_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+    signal.signal(signal.SIGUSR1, lambda signum, frame: print_memory_report(os.getpid(), list(workers)))
+
+    def handle_reload(signum, frame):
+        # Workers are only told to reload once the heads scored the warm-up texts
+        try:
+            service.model_slots.reload(service.load_standby_heads, warm_in_child)
+        except Exception:
+            return
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGHUP, handle_reload)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except InterruptedError:
+            continue
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f"⚠ Warning: Worker {pid} exited with status {status}; re-forking", flush=True)
+        if time.time() - started < 5:
+            # Crashing on startup: back off instead of fork-looping
+            time.sleep(5)
+        spawn()
+
+    sock.close()
+    print("[OK] All workers stopped")
+
+
+if __name__ == "__main__":
+    main()
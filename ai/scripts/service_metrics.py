@@ -0,0 +1,233 @@
+"""
+Service Metrics - Prometheus text-format metrics without extra dependencies
+Histograms, counters and gauges live in one process-wide registry and are
+rendered by the /metrics endpoint. Values owned by other components (cache
+counters, queue depth, index size) are read at scrape time by collectors.
+
+Hot-path cost is one perf_counter pair and a locked bucket increment per
+observation.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Latency buckets in seconds (0.5 ms .. 10 s)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count)
+                        for labels, (counts, total, count) in sorted(self._values.items())]
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = ("le", _format_value(bound) if bound == float("inf") else f"{bound:g}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    """Owns metrics and scrape-time collectors; renders the exposition text."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """
+        Register a scrape-time collector.
+
+        Args:
+            collect: Callable returning (name, kind, help, [(labels dict, value), ...])
+                tuples; exceptions are ignored so a broken collector never
+                fails the scrape
+        """
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception:
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    names = tuple(labels)
+                    values = tuple(labels[k] for k in names)
+                    lines.append(f"{name}{_format_labels(names, values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "ai_stage_seconds",
+    "Time per hot-path stage call (normalize, queue_wait, executor_wait, encode, category_head, "
+    "priority_head); batched stages record one observation per batch",
+    ["stage"],
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "ai_request_seconds", "End-to-end request latency by route", ["method", "route", "status"],
+))
+BATCH_SIZE = REGISTRY.register(Histogram(
+    "ai_batch_size", "Realized micro-batch sizes", buckets=BATCH_SIZE_BUCKETS,
+))
+ENCODED_TEXTS = REGISTRY.register(Counter(
+    "ai_encoded_texts_total", "Texts run through the sentence encoder (cache misses only)",
+))
+MODEL_LOAD_SECONDS = REGISTRY.register(Gauge(
+    "ai_model_load_seconds", "Wall time spent loading each model at startup", ["model"],
+))
+INFERENCE_DROPPED = REGISTRY.register(Counter(
+    "ai_inference_dropped_total",
+    "Requests not served by inference: queue_full (429) or deadline (504, queued work skipped)",
+    ["reason"],
+))
+MODEL_RELOADS = REGISTRY.register(Counter(
+    "ai_model_reloads_total", "Model slot swaps by result (ok, failed, rollback)", ["result"],
+))
+STARTUP_PHASE_SECONDS = REGISTRY.register(Gauge(
+    "ai_startup_phase_seconds", "Wall time of each startup phase (encoder, heads, index, warmup, total)", ["phase"],
+))
+
+
+def stage_timer(stage):
+    """Context manager that records one ai_stage_seconds observation."""
+    return STAGE_SECONDS.time(stage)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording ai_request_seconds per route template.
+
+    Args:
+        app: ASGI application
+        on_request_finished: Optional callable run after every HTTP request
+            (used to count requests for the sampling profiler)
+    """
+
+    def __init__(self, app, on_request_finished=None):
+        self.app = app
+        self.on_request_finished = on_request_finished
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status["code"]),
+            )
+            if self.on_request_finished is not None:
+                self.on_request_finished()
@@ -0,0 +1,242 @@
+"""
+Shadow Evaluation - score candidate heads on live traffic
+Candidate classifier heads (e.g. from `train_model.py --candidate`) score
+the same embedding vectors the live heads already used, on a background
+thread after the response has been built, so live responses are never
+changed or delayed by the candidate and the encoder runs once.
+
+Per task (category, priority) the shadow keeps bounded aggregates only:
+    agreement with the live label, live vs candidate "Uncertain" rate
+    (category, same 0.65 rule), confidence delta mean / std and histogram,
+    a label confusion table, and the last few disagreements
+plus its own cost: time on the live path (hand-off) and on the shadow
+thread (candidate head), per batch.
+
+Only embedded complaints can be shadowed. With a lexical cascade head and a
+non-semantic priority head, lexical-answered complaints are never embedded,
+so the aggregates describe the escalated ones; "coverage" reports the share
+of sampled complaints that were scored.
+
+Batches are dropped, not queued without bound, when the shadow thread
+falls behind.
+
+Settings (environment variables):
+    AI_SHADOW_MODEL_DIR    - candidate head bundles (default: ai/model/candidate)
+    AI_SHADOW_SAMPLE_RATE  - fraction of /predict batches shadowed (default 1.0)
+    AI_SHADOW_MAX_QUEUE    - batches waiting for the shadow thread before dropping (default 64)
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from predictor import build_category_result, build_priority_result
+from service_metrics import stage_timer
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHADOW_MODEL_DIR = os.environ.get("AI_SHADOW_MODEL_DIR") or os.path.join(BASE_DIR, "model", "candidate")
+SHADOW_SAMPLE_RATE = float(os.environ.get("AI_SHADOW_SAMPLE_RATE", "1.0"))
+SHADOW_MAX_QUEUE = int(os.environ.get("AI_SHADOW_MAX_QUEUE", "64"))
+
+# The live /predict result builders, so candidates get the same rounding and Uncertain rule
+RESULT_BUILDERS = {"category": build_category_result, "priority": build_priority_result}
+
+SHADOW_TASKS = ("category", "priority")
+
+# Confidence delta (candidate - live) histogram edges
+DELTA_EDGES = (-0.5, -0.2, -0.1, -0.05, 0.05, 0.1, 0.2, 0.5)
+# Disagreements kept for inspection
+RECENT_DISAGREEMENTS = 20
+
+
+class ShadowTaskStats:
+    """Bounded aggregates for one task's candidate vs live predictions."""
+
+    def __init__(self):
+        self.rows = 0
+        self.agree = 0
+        self.live_uncertain = 0
+        self.candidate_uncertain = 0
+        self.delta_sum = 0.0
+        self.delta_sq_sum = 0.0
+        self.delta_histogram = np.zeros(len(DELTA_EDGES) + 1, dtype=np.int64)
+        self.confusion = {}
+        self.recent = deque(maxlen=RECENT_DISAGREEMENTS)
+
+    def add(self, live, candidate, texts):
+        """
+        Args:
+            live: List of (label, confidence) from the live response
+            candidate: List of (label, confidence) from the candidate head
+            texts: Normalized texts (kept only for recent disagreements)
+        """
+        deltas = np.array([c[1] - l[1] for l, c in zip(live, candidate)], dtype=np.float64)
+        self.rows += len(live)
+        self.delta_sum += float(deltas.sum())
+        self.delta_sq_sum += float((deltas ** 2).sum())
+        self.delta_histogram += np.bincount(np.searchsorted(DELTA_EDGES, deltas, side="right"),
+                                            minlength=len(self.delta_histogram))
+        for (live_label, live_conf), (cand_label, cand_conf), text in zip(live, candidate, texts):
+            self.live_uncertain += live_label == "Uncertain"
+            self.candidate_uncertain += cand_label == "Uncertain"
+            key = (live_label, cand_label)
+            self.confusion[key] = self.confusion.get(key, 0) + 1
+            if live_label == cand_label:
+                self.agree += 1
+            else:
+                self.recent.append({"text": text, "live": live_label, "liveConfidence": live_conf,
+                                    "candidate": cand_label, "candidateConfidence": cand_conf})
+
+    def as_dict(self):
+        rows = max(self.rows, 1)
+        mean = self.delta_sum / rows
+        labels = ["< -0.5"] + [f"[{a}, {b})" for a, b in zip(DELTA_EDGES, DELTA_EDGES[1:])] + [">= 0.5"]
+        return {
+            "rows": self.rows,
+            "agreement": round(self.agree / rows, 4),
+            "liveUncertainRate": round(self.live_uncertain / rows, 4),
+            "candidateUncertainRate": round(self.candidate_uncertain / rows, 4),
+            "confidenceDeltaMean": round(mean, 4),
+            "confidenceDeltaStd": round(max(self.delta_sq_sum / rows - mean ** 2, 0.0) ** 0.5, 4),
+            "confidenceDeltaHistogram": dict(zip(labels, self.delta_histogram.tolist())),
+            "confusion": [{"live": l, "candidate": c, "count": n} for (l, c), n in sorted(self.confusion.items())],
+            "recentDisagreements": list(self.recent),
+        }
+
+
+class ShadowEvaluator:
+    """
+    Runs candidate heads on live embeddings on a background thread.
+
+    Args:
+        heads: Dict of task name -> candidate head (SemanticClassifier)
+        sample_rate: Fraction of batches shadowed
+        max_queue: Batches waiting before new ones are dropped
+    """
+
+    def __init__(self, heads, sample_rate=SHADOW_SAMPLE_RATE, max_queue=SHADOW_MAX_QUEUE):
+        self.heads = {task: head for task, head in heads.items() if head is not None}
+        self.sample_rate = sample_rate
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._lock = threading.Lock()
+        self._reset_stats()
+        self._thread = None
+
+    def _reset_stats(self):
+        self.tasks = {task: ShadowTaskStats() for task in self.heads}
+        self.batches = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.errors = 0
+        self.unembedded_rows = 0
+        self.submit_seconds = 0.0
+        self.shadow_seconds = 0.0
+        self.started = time.time()
+
+    def submit(self, texts, embeddings, results):
+        """
+        Hand one scored batch to the shadow thread (live path; never blocks).
+
+        Args:
+            texts: Normalized texts of the batch
+            embeddings: Their embeddings, as fed to the live heads (None if
+                the batch was not embedded; only counted for coverage)
+            results: The live /predict result dicts (read here, never modified)
+        """
+        started = time.perf_counter()
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            with self._lock:
+                self.skipped += 1
+            return
+        if embeddings is None:
+            with self._lock:
+                self.unembedded_rows += len(texts)
+            return
+        live = {
+            task: [(str(result.get(task)), result.get(f"{task}Confidence", 0.0)) for result in results]
+            for task in self.heads
+        }
+        with self._lock:
+            # Started on first use: a thread started before a fork (serve.py) is not in the worker
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="shadow-eval", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait((texts, embeddings, live))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+        with self._lock:
+            self.submit_seconds += time.perf_counter() - started
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            texts, embeddings, live = item
+            started = time.perf_counter()
+            try:
+                with stage_timer("shadow_head"):
+                    scored = {task: self._predict(task, head, embeddings) for task, head in self.heads.items()}
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"⚠ Warning: Shadow evaluation failed: {e}")
+                continue
+            with self._lock:
+                for task, candidate in scored.items():
+                    self.tasks[task].add(live[task], candidate, texts)
+                self.batches += 1
+                self.shadow_seconds += time.perf_counter() - started
+
+    @staticmethod
+    def _predict(task, head, embeddings):
+        """(label, confidence) per row, built as the live /predict response builds them."""
+        build = RESULT_BUILDERS[task]
+        rows = []
+        for probs in head.predict_proba_from_embeddings(embeddings):
+            result = {}
+            build(result, head, probs)
+            rows.append((str(result[task]), result[f"{task}Confidence"]))
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._reset_stats()
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+
+    def stats(self):
+        with self._lock:
+            batches = max(self.batches, 1)
+            scored = max((stats.rows for stats in self.tasks.values()), default=0)
+            return {
+                "enabled": True,
+                "candidates": {task: getattr(head, "model_version", None) for task, head in self.heads.items()},
+                "sampleRate": self.sample_rate,
+                "since": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started)),
+                "batches": self.batches,
+                "queued": self._queue.qsize(),
+                "dropped": self.dropped,
+                "skipped": self.skipped,
+                "errors": self.errors,
+                "coverage": {
+                    "rowsScored": scored,
+                    "rowsWithoutEmbeddings": self.unembedded_rows,
+                    "rate": round(scored / (scored + self.unembedded_rows), 4) if scored + self.unembedded_rows else None,
+                },
+                "overhead": {
+                    "livePathMsPerBatch": round(self.submit_seconds * 1000 / max(self.batches + self.dropped, 1), 4),
+                    "shadowMsPerBatch": round(self.shadow_seconds * 1000 / batches, 4),
+                },
+                "tasks": {task: stats.as_dict() for task, stats in self.tasks.items()},
+            }
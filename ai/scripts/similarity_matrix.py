@@ -0,0 +1,99 @@
+"""
+Many-vs-many Complaint Similarity
+Scores N query complaints against M candidates with one matrix multiply
+of L2-normalized embeddings, instead of one cosine call per pair.
+
+Levels use the same thresholds as the single-pair /similarity endpoint:
+    HIGHLY_SIMILAR  score >= 0.85
+    RELATED         score >= 0.5
+    UNRELATED       otherwise
+"""
+
+import numpy as np
+
+
+HIGHLY_SIMILAR_THRESHOLD = 0.85
+RELATED_THRESHOLD = 0.5
+
+LEVELS = ("UNRELATED", "RELATED", "HIGHLY_SIMILAR")
+
+
+def similarity_level(score):
+    """Level name for one cosine similarity score."""
+    if score >= HIGHLY_SIMILAR_THRESHOLD:
+        return "HIGHLY_SIMILAR"
+    if score >= RELATED_THRESHOLD:
+        return "RELATED"
+    return "UNRELATED"
+
+
+def level_codes(scores):
+    """Vectorized levels: 0 = UNRELATED, 1 = RELATED, 2 = HIGHLY_SIMILAR (indexes LEVELS)."""
+    return np.searchsorted([RELATED_THRESHOLD, HIGHLY_SIMILAR_THRESHOLD], scores, side="right").astype(np.int8)
+
+
+def normalize_rows(vectors):
+    """L2-normalize each row (zero rows stay zero)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def cosine_matrix(queries, candidates=None):
+    """
+    Cosine similarity of every query against every candidate.
+
+    Args:
+        queries: (N, dim) embeddings
+        candidates: (M, dim) embeddings; None scores the queries against themselves
+
+    Returns:
+        float32 array of shape (N, M)
+    """
+    q = normalize_rows(queries)
+    c = q if candidates is None else normalize_rows(candidates)
+    return q @ c.T
+
+
+def top_k_rows(scores, k, min_score=None, exclude_diagonal=False):
+    """
+    Best k candidates per row of a score matrix.
+
+    Args:
+        scores: (N, M) score matrix
+        k: Matches per row
+        min_score: Drop matches below this score
+        exclude_diagonal: Skip column i for row i (self-similarity matrices)
+
+    Returns:
+        (indices, scores) lists with one array per row, best first
+    """
+    n, m = scores.shape
+    if exclude_diagonal:
+        scores = scores.copy()
+        diagonal = np.arange(min(n, m))
+        scores[diagonal, diagonal] = -np.inf
+        m -= 1 if n > 0 else 0
+    k = min(k, m)
+    if k <= 0:
+        return [np.zeros(0, dtype=np.int64)] * n, [np.zeros(0, dtype=np.float32)] * n
+
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    if min_score is None:
+        return list(top), list(top_scores)
+    keep = top_scores >= min_score
+    return [row[mask] for row, mask in zip(top, keep)], [row[mask] for row, mask in zip(top_scores, keep)]
+
+
+def level_counts(scores, exclude_diagonal=False):
+    """Number of pairs at each level (the diagonal of a self-matrix is not counted)."""
+    counts = np.bincount(level_codes(scores).ravel(), minlength=len(LEVELS))
+    if exclude_diagonal:
+        diagonal = np.diagonal(scores)
+        counts -= np.bincount(level_codes(diagonal), minlength=len(LEVELS))
+    return {level: int(count) for level, count in zip(LEVELS, counts)}
@@ -42,10 +42,71 @@ ABBREVIATIONS = {
 }
 
 
+# Bump whenever normalize_text output changes; cached training embeddings
+# (see training_embeddings.py) are keyed by it
+NORMALIZER_VERSION = "1"
+
+
+# Runs of the same punctuation mark ("!!!", "??", "...") collapse to one
+_REPEATED_PUNCT_PATTERN = re.compile(r'([!?.])\1+')
+
+# Every whitespace-delimited word that expands: each abbreviation, bare or
+# followed by one trailing punctuation mark (the reference strips at most one)
+_EXPANSIONS = {
+    abbr + punct: full + punct
+    for abbr, full in ABBREVIATIONS.items()
+    for punct in ('', '.', ',', '!', '?', ';', ':')
+}
+
+
 def normalize_text(text):
     """
     Normalize text for robust category prediction.
     
+    Steps:
+    1. Lowercase
+    2. Normalize punctuation
+    3. Expand common abbreviations
+    4. Collapse whitespace and strip
+    
+    Runs the punctuation regex only when a repeated mark is present and
+    expands abbreviations with one dict lookup per word; output is
+    byte-identical to normalize_text_reference.
+    
+    Args:
+        text: Input text string
+        
+    Returns:
+        Normalized text string
+    """
+    if not text or not isinstance(text, str):
+        return ""
+    
+    normalized = text.lower()
+    if '!!' in normalized or '??' in normalized or '..' in normalized:
+        normalized = _REPEATED_PUNCT_PATTERN.sub(r'\1', normalized)
+    expand = _EXPANSIONS.get
+    return ' '.join([expand(word, word) for word in normalized.split()])
+
+
+def normalize_batch(texts):
+    """
+    Normalize a sequence of texts.
+    
+    Args:
+        texts: Iterable of text strings (non-strings normalize to "")
+        
+    Returns:
+        List of normalized text strings
+    """
+    return [normalize_text(text) for text in texts]
+
+
+def normalize_text_reference(text):
+    """
+    Original step-by-step normalizer, kept as the reference implementation
+    that normalize_text must match byte for byte (see benchmark_normalizer.py).
+    
     Steps:
     1. Lowercase
     2. Remove extra spaces
@@ -98,20 +159,51 @@ def normalize_text(text):
     return normalized
 
 
-def add_noise_variant(text, noise_type='random'):
+# Word replacements used by add_noise_variant, compiled once and applied in order
+_SHORT_FORM_REPLACEMENTS = [
+    (re.compile(r'\b' + full + r'\b', re.IGNORECASE), short)
+    for full, short in {
+        'street': 'st',
+        'road': 'rd',
+        'light': 'lite',
+        'working': 'wrking',
+        'electric': 'elec',
+        'electricity': 'elec',
+        'water': 'wtr',
+        'power': 'pwr',
+        'please': 'pls',
+        'through': 'thru',
+    }.items()
+]
+
+_INFORMAL_REPLACEMENTS = [
+    (re.compile(r'\b' + formal + r'\b', re.IGNORECASE), informal)
+    for formal, informal in {
+        'not working': 'gone',
+        'not functioning': 'dead',
+        'broken': 'broke',
+        'damaged': 'broke',
+        'not available': 'no',
+        'no supply': 'no',
+    }.items()
+]
+
+
+def add_noise_variant(text, noise_type='random', rng=None):
     """
     Create a noisy variant of text for robustness training.
     
     Args:
         text: Clean text string
         noise_type: Type of noise to add ('missing_vowels', 'short_forms', 'informal', 'random')
+        rng: Optional random.Random for reproducible noise (default: module random)
         
     Returns:
         Noisy variant of text
     """
-    import random
+    rng = rng or random
     if noise_type == 'random':
-        noise_type = random.choice(['missing_vowels', 'short_forms', 'informal'])
+        noise_type = rng.choice(['missing_vowels', 'short_forms', 'informal'])
     
     if noise_type == 'missing_vowels':
         # Remove some vowels (but keep first letter and common patterns)
@@ -122,7 +214,7 @@ def add_noise_variant(text, noise_type='random'):
                 # Remove some vowels from middle
                 noisy = word[0]  # Keep first char
                 for char in word[1:-1]:
-                    if char.lower() not in 'aeiou' or random.random() > 0.3:
+                    if char.lower() not in 'aeiou' or rng.random() > 0.3:
                         noisy += char
                 noisy += word[-1]  # Keep last char
                 noisy_words.append(noisy)
@@ -131,38 +223,17 @@ def add_noise_variant(text, noise_type='random'):
         return ' '.join(noisy_words)
     
     elif noise_type == 'short_forms':
-        # Use short forms
-        replacements = {
-            'street': 'st',
-            'road': 'rd',
-            'light': 'lite',
-            'working': 'wrking',
-            'electric': 'elec',
-            'electricity': 'elec',
-            'water': 'wtr',
-            'power': 'pwr',
-            'please': 'pls',
-            'through': 'thru',
-        }
+        # Use short forms (whole words only)
         noisy = text
-        for full, short in replacements.items():
-            # Replace whole words only
-            noisy = re.sub(r'\b' + full + r'\b', short, noisy, flags=re.IGNORECASE)
+        for pattern, short in _SHORT_FORM_REPLACEMENTS:
+            noisy = pattern.sub(short, noisy)
         return noisy
     
     elif noise_type == 'informal':
         # Add informal phrases
-        replacements = {
-            'not working': 'gone',
-            'not functioning': 'dead',
-            'broken': 'broke',
-            'damaged': 'broke',
-            'not available': 'no',
-            'no supply': 'no',
-        }
         noisy = text
-        for formal, informal in replacements.items():
-            noisy = re.sub(r'\b' + formal + r'\b', informal, noisy, flags=re.IGNORECASE)
+        for pattern, informal in _INFORMAL_REPLACEMENTS:
+            noisy = pattern.sub(informal, noisy)
         return noisy
     
     return text
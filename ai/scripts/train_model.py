@@ -2,38 +2,56 @@
 AI Training Script - Semantic Embeddings Version
 Trains category and priority classifiers using sentence-transformers embeddings.
 Replaces TF-IDF with semantic embeddings for better text understanding.
+Also trains the lexical first-stage category head of the serving cascade
+(see lexical_cascade.py) and reports its held-out escalation rate and
+accuracy parity.
+
+Usage:
+    python scripts/train_model.py                       # reuse cached embeddings
+    python scripts/train_model.py --rebuild-embeddings  # re-encode every row
+    python scripts/train_model.py --snapshot data/snapshots/training --months 2026-09,2026-10
+    python scripts/train_model.py --candidate --model-version v1.2   # shadow-evaluate before promoting
 """
 
+import argparse
 import pandas as pd
-import joblib
 import os
 import sys
-from sentence_transformers import SentenceTransformer
 from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import LabelEncoder
 import numpy as np
 
 # Add scripts directory to path to import text_normalizer
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from text_normalizer import normalize_for_training
+from text_normalizer import NORMALIZER_VERSION, normalize_batch
+from encoder import ENCODER_NAME, get_encoder, get_encoder_hash, get_encoder_id, use_training_backend
+from model_bundle import save_head_bundle
+from training_embeddings import TRAIN_CACHE_DIR, load_training_embeddings
+from shadow_eval import SHADOW_MODEL_DIR
+from lexical_cascade import LEXICAL_MIN_PRECISION, save_lexical_head, train_lexical_head
 
 # Configuration
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 MODEL_DIR = os.path.join(BASE_DIR, "model")
-EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_MODEL_NAME = ENCODER_NAME
 MODEL_VERSION = "v1.1"  # Updated for robustness improvements
 
 # Ensure model directory exists
 os.makedirs(MODEL_DIR, exist_ok=True)
 
 
-# Import SemanticClassifier from shared module
-from semantic_classifier import SemanticClassifier
+def load_data(snapshot=None, months=None):
+    """
+    Load complaint dataset from CSV, or from a Parquet snapshot.
 
+    Args:
+        snapshot: Snapshot directory (complaint_snapshot.py); None reads data/complaints.csv
+        months: Snapshot months ("YYYY-MM") to train on; None reads all
+    """
+    if snapshot:
+        return load_snapshot_data(snapshot, months)
 
-def load_data():
-    """Load complaint dataset from CSV."""
     csv_path = os.path.join(DATA_DIR, "complaints.csv")
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"Dataset not found at {csv_path}")
@@ -44,13 +62,13 @@ def load_data():
     # If dataset has separate title/description, combine them
     if 'text' in df.columns:
         # Already combined, but normalize it
-        df['text'] = df['text'].apply(normalize_for_training)
+        df['text'] = normalize_batch(df['text'].tolist())
         print("  Normalized text field for robustness")
     elif 'title' in df.columns and 'description' in df.columns:
         # Combine title and description
         df['text'] = df['title'] + '. ' + df['description']
         # Normalize the combined text
-        df['text'] = df['text'].apply(normalize_for_training)
+        df['text'] = normalize_batch(df['text'].tolist())
         print("  Combined title and description, then normalized for robustness")
     else:
         raise ValueError("Dataset must have either 'text' column or both 'title' and 'description' columns")
@@ -58,6 +76,45 @@ def load_data():
     return df
 
 
+def load_snapshot_data(snapshot, months=None):
+    """
+    Load the training columns of a snapshot. Text is normalized at export;
+    it is only re-normalized if the snapshot used another normalizer version.
+    """
+    from complaint_snapshot import load_snapshot, read_manifest
+
+    manifest = read_manifest(snapshot)
+    renormalize = manifest.get("normalizer_version") != NORMALIZER_VERSION
+    columns = ["text" if renormalize else "normalized_text", "category", "priority"]
+    df = load_snapshot(snapshot, columns=columns, months=months).to_pandas()
+    df = df.dropna(subset=["category"]).reset_index(drop=True)
+    if renormalize:
+        df['text'] = normalize_batch(df['text'].tolist())
+        print(f"Loaded {len(df)} complaints from snapshot {snapshot} (re-normalized text)")
+    else:
+        df = df.rename(columns={"normalized_text": "text"})
+        print(f"Loaded {len(df)} complaints from snapshot {snapshot}")
+    return df
+
+
+def load_snapshot_embeddings(snapshot, months=None):
+    """
+    Embeddings stored in a snapshot, in load_snapshot_data row order, or
+    None if the snapshot has none or they came from another encoder or
+    normalizer version.
+    """
+    from complaint_snapshot import embedding_matrix, load_snapshot, read_manifest
+
+    manifest = read_manifest(snapshot)
+    if (not manifest.get("embedding_dim")
+            or manifest.get("encoder_id") != get_encoder_id()
+            or manifest.get("normalizer_version") != NORMALIZER_VERSION):
+        return None
+    table = load_snapshot(snapshot, columns=["category", "embedding"], months=months)
+    table = table.filter(table.column("category").is_valid())
+    return embedding_matrix(table)
+
+
 def train_classifier(X_embeddings, y, task_name="classifier", use_balanced_weights=False):
     """
     Train a classifier on embeddings.
@@ -136,66 +193,122 @@ def print_misclassified_examples(classifier, X_embeddings, y_true, texts, classe
         print()
 
 
-def save_model_bundle(embedding_model, classifier, classes_, label_encoder, task_name):
+def save_model_bundle(classifier, classes_, label_encoder, task_name,
+                      model_version=MODEL_VERSION, model_dir=MODEL_DIR):
     """
-    Save model bundle as .pkl file.
-    The saved object is a SemanticClassifier with all required attributes:
-    - model (SemanticClassifier wrapper with embedding_model and classifier)
+    Save a slim model bundle as .pkl file.
+    The saved bundle holds only the classifier head and its metadata;
+    the sentence encoder is referenced by name and weight hash, and is
+    bound to the shared encoder at load time:
+    - classifier (trained head operating on embeddings)
     - classes_ (for sklearn compatibility)
     - label_list (list of labels)
     - model_version
+    - encoder_name / encoder_hash
     
     Args:
-        embedding_model: SentenceTransformer model
         classifier: Trained sklearn classifier
         classes_: Class labels (numpy array)
         label_encoder: LabelEncoder used (for reference)
         task_name: 'category' or 'priority'
+        model_version: Version string reported in responses
+        model_dir: Output directory (the candidate directory for shadow evaluation)
     """
     # Create label list
     label_list = classes_.tolist() if hasattr(classes_, 'tolist') else list(classes_)
     
-    # Create wrapper with all metadata
-    model_wrapper = SemanticClassifier(
-        embedding_model=embedding_model,
-        classifier=classifier,
-        classes_=classes_,
-        model_version=MODEL_VERSION,
-        label_list=label_list
+    model_path = save_head_bundle(
+        classifier,
+        classes_,
+        task_name,
+        model_version,
+        encoder_name=EMBEDDING_MODEL_NAME,
+        encoder_hash=get_encoder_hash(),
+        model_dir=model_dir
     )
-    
-    # Save the wrapper directly (maintains sklearn Pipeline-like interface)
-    # The wrapper contains all required information as attributes
-    model_path = os.path.join(MODEL_DIR, f"{task_name}_model.pkl")
-    joblib.dump(model_wrapper, model_path)
     print(f"  [OK] Saved model bundle to {model_path}")
-    print(f"    Model version: {MODEL_VERSION}")
+    print(f"    Model version: {model_version}")
     print(f"    Labels: {label_list}")
+    print(f"    Encoder: {EMBEDDING_MODEL_NAME} ({get_encoder_hash()})")
+
 
+def print_lexical_report(report):
+    """Print the lexical head's calibrated threshold and its held-out escalation rate and parity."""
+    test = report["test"]
+    splits = report["splits"]
+    print(f"\n  Splits: {splits['train']} train / {splits['calibration']} calibration / {splits['test']} test")
+    if report["threshold"] > 1:
+        print(f"  ⚠ No threshold met the precision/parity bar; every complaint escalates to the semantic head")
+    else:
+        print(f"  Calibrated threshold: {report['threshold']}")
+    print(f"  Held-out test split:")
+    print(f"    Escalation rate:      {test['escalationRate']:.1%}")
+    print(f"    Accuracy (cascade):   {test['cascadeAccuracy']:.4f}")
+    print(f"    Accuracy (semantic):  {test['semanticAccuracy']:.4f}")
+    print(f"    Uncertain (cascade / semantic): {test['cascadeUncertainRate']:.1%} / {test['semanticUncertainRate']:.1%}")
+    print(f"    Agreement with semantic head:   {test['agreement']:.1%}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the complaint classifier heads")
+    parser.add_argument("--no-embedding-cache", action="store_true",
+                        help="Encode every row in memory without reading or writing the embedding cache")
+    parser.add_argument("--rebuild-embeddings", action="store_true",
+                        help="Ignore the cached embedding matrix and re-encode every row")
+    parser.add_argument("--cache-dir", default=TRAIN_CACHE_DIR,
+                        help="Directory for cached embedding matrices")
+    parser.add_argument("--snapshot", default=None,
+                        help="Train from a Parquet snapshot directory instead of data/complaints.csv")
+    parser.add_argument("--months", default=None,
+                        help="Comma-separated snapshot months (YYYY-MM) to train on")
+    parser.add_argument("--candidate", action="store_true",
+                        help="Save the heads as shadow-evaluation candidates (AI_SHADOW_MODEL_DIR) "
+                             "instead of replacing the served ones")
+    parser.add_argument("--model-version", default=MODEL_VERSION,
+                        help="Version string stored in the saved bundles")
+    parser.add_argument("--no-lexical", action="store_true",
+                        help="Do not train the lexical cascade head")
+    parser.add_argument("--lexical-min-precision", type=float, default=LEXICAL_MIN_PRECISION,
+                        help="Minimum accuracy of lexical answers when calibrating the escalation threshold")
+    return parser.parse_args(argv)
 
-def main():
+
+def main(argv=None):
     """Main training function."""
+    args = parse_args(argv)
     print("=" * 60)
     print("AI Training Pipeline - Semantic Embeddings Version")
     print("=" * 60)
     
     # Load data
-    df = load_data()
+    months = [m.strip() for m in args.months.split(",") if m.strip()] if args.months else None
+    df = load_data(args.snapshot, months)
     
-    # Initialize sentence transformer
-    print(f"\nLoading embedding model: {EMBEDDING_MODEL_NAME}")
-    embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-    print("  [OK] Embedding model loaded")
+    # Initialize sentence transformer (fp32 torch, whatever backend serving uses)
+    print()
+    use_training_backend()
+    embedding_model = get_encoder()
     
     # Extract features and labels
     texts = df['text'].tolist()
     categories = df['category'].tolist()
     priorities = df['priority'].tolist()
     
-    # Generate embeddings for all texts
+    # Generate embeddings for all texts (reusing the cached matrix when the
+    # dataset is unchanged; appended rows are encoded on their own)
     print(f"\nGenerating embeddings for {len(texts)} texts...")
-    print("  This may take a few minutes...")
-    embeddings = embedding_model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
+    snapshot_embeddings = load_snapshot_embeddings(args.snapshot, months) if args.snapshot else None
+    if snapshot_embeddings is not None:
+        embeddings = snapshot_embeddings
+        print("  Reused the embeddings stored in the snapshot")
+    elif args.no_embedding_cache:
+        print("  This may take a few minutes...")
+        embeddings = embedding_model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
+    else:
+        embeddings, cache_info = load_training_embeddings(
+            texts, cache_dir=args.cache_dir, rebuild=args.rebuild_embeddings
+        )
+        print(f"  Reused {cache_info['reused']} rows, encoded {cache_info['encoded']} rows")
     print(f"  [OK] Generated embeddings: shape {embeddings.shape}")
     
     # ========== TRAIN CATEGORY CLASSIFIER ==========
@@ -225,14 +338,34 @@ def main():
         top_n=10
     )
     
+    output_dir = SHADOW_MODEL_DIR if args.candidate else MODEL_DIR
+    os.makedirs(output_dir, exist_ok=True)
     save_model_bundle(
-        embedding_model, 
         category_classifier, 
         category_classes,
         category_encoder,
-        "category"
+        "category",
+        model_version=args.model_version,
+        model_dir=output_dir
     )
     
+    # ========== LEXICAL CASCADE HEAD ==========
+    if not args.no_lexical:
+        print("\n" + "=" * 60)
+        print("TRAINING LEXICAL CASCADE HEAD")
+        print("=" * 60)
+        lexical_head, lexical_report = train_lexical_head(
+            texts,
+            categories,
+            embeddings,
+            fit_semantic=lambda X, y: train_classifier(X, y, "Held-out semantic reference", use_balanced_weights=True),
+            model_version=f"{args.model_version}-lexical",
+            min_precision=args.lexical_min_precision
+        )
+        print_lexical_report(lexical_report)
+        lexical_path = save_lexical_head(lexical_head, "category", output_dir)
+        print(f"  [OK] Saved lexical cascade head to {lexical_path}")
+    
     # ========== PRIORITY CLASSIFIER SKIPPED ==========
     # Per requirements: Do NOT retrain priority yet
     print("\n" + "=" * 60)
@@ -244,8 +377,14 @@ def main():
     print("\n" + "=" * 60)
     print("TRAINING COMPLETE")
     print("=" * 60)
-    print(f"[OK] Category model saved: {os.path.join(MODEL_DIR, 'category_model.pkl')}")
-    print(f"[OK] Model version: {MODEL_VERSION}")
+    print(f"[OK] Category model saved: {os.path.join(output_dir, 'category_head.pkl')}")
+    if not args.no_lexical:
+        print(f"[OK] Lexical cascade head saved: {lexical_path} "
+              f"(escalation rate {lexical_report['test']['escalationRate']:.1%} on held-out data)")
+    print(f"[OK] Model version: {args.model_version}")
+    if args.candidate:
+        print(f"[OK] Saved as a shadow candidate; the AI service scores it on live /predict traffic "
+              f"(POST /shadow/load, GET /shadow/stats)")
     print(f"[OK] Embedding model: {EMBEDDING_MODEL_NAME}")
     print(f"[OK] Trained on combined title + description")
     print(f"[OK] Used class_weight='balanced' for category classifier")
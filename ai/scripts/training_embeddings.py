@@ -0,0 +1,155 @@
+"""
+Training Embedding-Matrix Cache
+Stores the encoded training set as a memory-mapped float32 .npy file next
+to a JSON manifest, so retraining a classifier head does not re-encode
+the whole dataset.
+
+One matrix is kept per (encoder id, normalizer version). Its manifest
+records the number of rows and a content hash of the normalized texts:
+- same texts                 -> the matrix is reused as is
+- same texts + appended rows -> only the new rows are encoded
+- anything else              -> the matrix is rebuilt
+
+Settings (environment variables):
+    AI_TRAIN_CACHE_DIR  - cache directory (default: ai/cache/embeddings)
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from encoder import ENCODER_NAME, encode_texts, get_encoder, get_encoder_backend, get_encoder_id
+from text_normalizer import NORMALIZER_VERSION
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAIN_CACHE_DIR = os.environ.get("AI_TRAIN_CACHE_DIR") or os.path.join(BASE_DIR, "cache", "embeddings")
+
+MANIFEST_FORMAT = "embedding-matrix/v1"
+
+# Rows encoded (and written to the memory map) per encoder call
+ENCODE_CHUNK_ROWS = 4096
+ENCODE_BATCH_SIZE = 32
+
+
+def cache_key(encoder_id, normalizer_version=NORMALIZER_VERSION):
+    """File stem for the matrix of one encoder / normalizer combination."""
+    return hashlib.sha256(f"{encoder_id}\x00{normalizer_version}".encode("utf-8")).hexdigest()[:16]
+
+
+def dataset_hashes(texts, prefix_rows=None):
+    """
+    Content hash of texts, plus the hash of the first prefix_rows texts.
+
+    Returns:
+        (full_hash, prefix_hash); prefix_hash is None if prefix_rows is None
+        or larger than the dataset
+    """
+    digest = hashlib.sha256()
+    prefix_hash = None
+    for i, text in enumerate(texts):
+        if i == prefix_rows:
+            prefix_hash = digest.copy().hexdigest()
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\x00")
+    if prefix_rows == len(texts):
+        prefix_hash = digest.hexdigest()
+    return digest.hexdigest(), prefix_hash
+
+
+def _read_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("format") == MANIFEST_FORMAT else None
+
+
+def _write_manifest(path, manifest):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _encode_into(matrix, texts, start):
+    """Encode texts[start:] chunk by chunk straight into the memory map."""
+    for offset in range(start, len(texts), ENCODE_CHUNK_ROWS):
+        chunk = texts[offset:offset + ENCODE_CHUNK_ROWS]
+        matrix[offset:offset + len(chunk)] = encode_texts(chunk, batch_size=ENCODE_BATCH_SIZE, use_cache=False)
+        print(f"  Encoded {offset + len(chunk)}/{len(texts)} rows")
+
+
+def load_training_embeddings(texts, cache_dir=TRAIN_CACHE_DIR, rebuild=False):
+    """
+    Return embeddings for normalized training texts, reusing the cached
+    matrix where the dataset allows it.
+
+    Args:
+        texts: List of normalized text strings (row order matters)
+        cache_dir: Directory holding <key>.npy / <key>.json
+        rebuild: If True, ignore any cached matrix
+
+    Returns:
+        (embeddings, info) - embeddings is a read-only float32 memmap of
+        shape (len(texts), dim); info has path, reused and encoded row counts
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    encoder_id = get_encoder_id()
+    key = cache_key(encoder_id)
+    matrix_path = os.path.join(cache_dir, f"{key}.npy")
+    manifest_path = os.path.join(cache_dir, f"{key}.json")
+
+    manifest = None if rebuild else _read_manifest(manifest_path)
+    if manifest is not None and not os.path.exists(matrix_path):
+        manifest = None
+
+    cached_rows = manifest["rows"] if manifest else None
+    full_hash, prefix_hash = dataset_hashes(texts, cached_rows)
+
+    reused = 0
+    if manifest is not None and manifest["dataset_hash"] == full_hash:
+        reused = len(texts)
+    elif manifest is not None and prefix_hash == manifest["dataset_hash"]:
+        reused = cached_rows
+
+    if reused == len(texts):
+        print(f"  [OK] Reusing cached embeddings: {matrix_path}")
+    else:
+        if reused:
+            print(f"  Found cached embeddings for {reused} rows; encoding {len(texts) - reused} appended rows")
+        else:
+            print(f"  Encoding {len(texts)} rows (no reusable cache)")
+        dim = get_encoder().get_sentence_embedding_dimension()
+        tmp_path = os.path.join(cache_dir, f"{key}.tmp.npy")
+        matrix = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(len(texts), dim))
+        if reused:
+            matrix[:reused] = np.load(matrix_path, mmap_mode="r")[:reused]
+        _encode_into(matrix, texts, reused)
+        matrix.flush()
+        del matrix
+        # Drop the old manifest first so a crash never pairs it with the new matrix
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        os.replace(tmp_path, matrix_path)
+        _write_manifest(manifest_path, {
+            "format": MANIFEST_FORMAT,
+            "encoder_id": encoder_id,
+            "encoder_name": ENCODER_NAME,
+            "encoder_backend": get_encoder_backend(),
+            "normalizer_version": NORMALIZER_VERSION,
+            "rows": len(texts),
+            "dim": dim,
+            "dataset_hash": full_hash,
+            "updated": datetime.now(timezone.utc).isoformat(),
+        })
+        print(f"  [OK] Saved embedding matrix: {matrix_path}")
+
+    embeddings = np.load(matrix_path, mmap_mode="r")
+    info = {"path": matrix_path, "reused": reused, "encoded": len(texts) - reused}
+    return embeddings, info
+
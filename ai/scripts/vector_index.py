@@ -0,0 +1,438 @@
+"""
+Vector Index for Resolved Complaints
+Keeps L2-normalized embeddings in one contiguous NumPy matrix with parallel
+metadata arrays (id, category, ward, createdAt), so a top-k cosine search
+over the whole historical window is a single matrix-vector product.
+Category, ward and time-window filters are applied inside the index.
+
+The index also records whether it has been backfilled (every resolved
+complaint in the window was upserted since it was created) and how many
+changes are not saved yet, so the service can persist it automatically and
+callers can tell a complete index from one that only holds recent upserts.
+
+Optional city-scale modes (see ann_index.py):
+- storage="int8": embeddings kept as int8 codes + per-row scale (4x smaller)
+- IVF: rows are assigned to k-means coarse lists; a search scores only the
+  rows in the nprobe lists closest to the query
+
+Settings (environment variables, used by the AI service):
+    AI_INDEX_MODE      - "exact" (default) or "ivf"
+    AI_INDEX_STORAGE   - "float32" (default) or "int8"
+    AI_INDEX_NLISTS    - IVF lists (default: 4 * sqrt(count) at training time)
+    AI_INDEX_NPROBE    - IVF lists probed per search (default 8)
+    AI_INDEX_ANN_MIN_SIZE - auto-train IVF once this many rows are indexed (default 10000)
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from ann_index import (
+    assign_lists,
+    dequantize_int8,
+    probe_lists,
+    quantize_int8,
+    spherical_kmeans,
+)
+
+
+INDEX_MODE = os.environ.get("AI_INDEX_MODE", "exact")
+INDEX_STORAGE = os.environ.get("AI_INDEX_STORAGE", "float32")
+INDEX_NLISTS = int(os.environ.get("AI_INDEX_NLISTS", "0"))
+INDEX_NPROBE = int(os.environ.get("AI_INDEX_NPROBE", "8"))
+INDEX_ANN_MIN_SIZE = int(os.environ.get("AI_INDEX_ANN_MIN_SIZE", "10000"))
+
+# Centroids are trained on a sample of at most this many rows per list
+TRAIN_POINTS_PER_LIST = 64
+
+# int8 rows widened to float32 per scoring block (1024 x 384 floats = 1.5 MB)
+SCORE_BLOCK_ROWS = 1024
+
+
+def _normalize_rows(vectors):
+    """L2-normalize each row (zero rows stay zero)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class _Vocabulary:
+    """Maps string labels (category, ward) to small integer codes."""
+
+    def __init__(self, labels=()):
+        self.labels = list(labels)
+        self.codes = {label: i for i, label in enumerate(self.labels)}
+
+    def encode(self, label):
+        if label not in self.codes:
+            self.codes[label] = len(self.labels)
+            self.labels.append(label)
+        return self.codes[label]
+
+    def lookup(self, label):
+        """Code of an existing label, or -1 if it was never indexed."""
+        return self.codes.get(label, -1)
+
+
+class ComplaintVectorIndex:
+    """Cosine index over resolved complaint embeddings (exact or IVF)."""
+
+    def __init__(self, dim, initial_capacity=1024, storage=INDEX_STORAGE, mode=INDEX_MODE,
+                 nprobe=INDEX_NPROBE, n_lists=INDEX_NLISTS, ann_min_size=INDEX_ANN_MIN_SIZE):
+        if storage not in ("float32", "int8"):
+            raise ValueError(f"Unknown index storage: {storage}")
+        if mode not in ("exact", "ivf"):
+            raise ValueError(f"Unknown index mode: {mode}")
+        self.dim = dim
+        self.storage = storage
+        self.mode = mode
+        self.nprobe = nprobe
+        self.n_lists = n_lists
+        self.ann_min_size = ann_min_size
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._size = 0
+        self._ids = np.empty(initial_capacity, dtype=object)
+        self._categories = np.zeros(initial_capacity, dtype=np.int32)
+        self._wards = np.zeros(initial_capacity, dtype=np.int32)
+        self._created_at = np.zeros(initial_capacity, dtype=np.int64)  # epoch ms
+        self._lists = np.full(initial_capacity, -1, dtype=np.int32)   # IVF list per row
+        if storage == "int8":
+            self._codes = np.zeros((initial_capacity, dim), dtype=np.int8)
+            self._scales = np.zeros(initial_capacity, dtype=np.float32)
+            self._columns = ("_codes", "_scales")
+        else:
+            self._vectors = np.zeros((initial_capacity, dim), dtype=np.float32)
+            self._columns = ("_vectors",)
+        self._columns += ("_ids", "_categories", "_wards", "_created_at", "_lists")
+        self._centroids = None
+        self._row_of = {}
+        self._category_vocab = _Vocabulary()
+        self._ward_vocab = _Vocabulary()
+        # Set once a full backfill has been upserted; kept across save/load
+        self.backfilled = False
+        self.changes = 0
+        self.saved_changes = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def ann_trained(self):
+        return self._centroids is not None
+
+    @property
+    def unsaved_changes(self):
+        return self.changes - self.saved_changes
+
+    def mark_backfilled(self):
+        with self._lock:
+            self.backfilled = True
+            self.changes += 1
+
+    def _grow(self, needed):
+        capacity = self._ids.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        for name in self._columns:
+            old = getattr(self, name)
+            new = np.zeros((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _store_rows(self, rows, vectors):
+        if self.storage == "int8":
+            self._codes[rows], self._scales[rows] = quantize_int8(vectors)
+        else:
+            self._vectors[rows] = vectors
+        if self._centroids is not None:
+            self._lists[rows] = assign_lists(vectors, self._centroids)
+
+    def vectors(self, rows=None):
+        """Stored (normalized) embeddings as float32, for all or selected rows."""
+        rows = slice(0, self._size) if rows is None else rows
+        if self.storage == "int8":
+            return dequantize_int8(self._codes[rows], self._scales[rows])
+        return self._vectors[rows]
+
+    def _score(self, rows, query):
+        """Cosine scores of the query against all rows (rows=None) or a subset."""
+        if self.storage == "int8":
+            return self._score_int8(rows, query)
+        return (self._vectors[:self._size] if rows is None else self._vectors[rows]) @ query
+
+    def _score_int8(self, rows, query):
+        """
+        int8 scores, SCORE_BLOCK_ROWS codes at a time: each block is widened
+        into one reused float32 buffer, so a query never materializes the
+        dequantized matrix (and the block stays in cache for the matmul).
+        """
+        n = self._size if rows is None else len(rows)
+        scores = np.empty(n, dtype=np.float32)
+        buffer = np.empty((min(n, SCORE_BLOCK_ROWS), self.dim), dtype=np.float32)
+        for start in range(0, n, SCORE_BLOCK_ROWS):
+            stop = min(start + SCORE_BLOCK_ROWS, n)
+            block = slice(start, stop) if rows is None else rows[start:stop]
+            widened = buffer[:stop - start]
+            np.copyto(widened, self._codes[block], casting="unsafe")
+            np.matmul(widened, query, out=scores[start:stop])
+        scores *= self._scales[:self._size] if rows is None else self._scales[rows]
+        return scores
+
+    def upsert(self, ids, vectors, categories, wards, created_at_ms):
+        """
+        Insert or replace complaints. New rows are assigned to their IVF
+        list immediately (incremental insertion).
+
+        Args:
+            ids: List of complaint ids (strings)
+            vectors: Embeddings, shape (len(ids), dim); normalized here
+            categories: Category label per complaint
+            wards: Ward label per complaint
+            created_at_ms: createdAt per complaint, epoch milliseconds
+
+        Returns:
+            Number of newly inserted complaints
+        """
+        vectors = _normalize_rows(vectors)
+        inserted = 0
+        with self._lock:
+            self._grow(self._size + len(ids))
+            rows = np.empty(len(ids), dtype=np.int64)
+            for i, complaint_id in enumerate(ids):
+                row = self._row_of.get(complaint_id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._row_of[complaint_id] = row
+                    inserted += 1
+                rows[i] = row
+                self._ids[row] = complaint_id
+                self._categories[row] = self._category_vocab.encode(categories[i])
+                self._wards[row] = self._ward_vocab.encode(wards[i])
+                self._created_at[row] = created_at_ms[i]
+            # Duplicate ids in one call: the last occurrence wins
+            self._store_rows(rows, vectors)
+            self.changes += 1
+
+            if self.mode == "ivf" and self._centroids is None and self._size >= self.ann_min_size:
+                self.train_ann()
+        return inserted
+
+    def delete(self, ids):
+        """
+        Remove complaints; the last row is moved into each hole so the
+        matrix stays contiguous.
+
+        Returns:
+            Number of complaints removed
+        """
+        removed = 0
+        with self._lock:
+            for complaint_id in ids:
+                row = self._row_of.pop(complaint_id, None)
+                if row is None:
+                    continue
+                last = self._size - 1
+                if row != last:
+                    for name in self._columns:
+                        array = getattr(self, name)
+                        array[row] = array[last]
+                    self._row_of[self._ids[row]] = row
+                self._ids[last] = None
+                self._size -= 1
+                removed += 1
+            if removed:
+                self.changes += 1
+        return removed
+
+    def train_ann(self, n_lists=None, n_iter=20, seed=42):
+        """
+        Train IVF coarse centroids on the indexed vectors and assign every
+        row to its list. Called automatically in "ivf" mode once the index
+        reaches ann_min_size rows; call again to retrain after heavy growth.
+
+        Returns:
+            Number of lists trained
+        """
+        with self._lock:
+            n = self._size
+            n_lists = n_lists or self.n_lists or max(1, int(4 * np.sqrt(n)))
+            data = self.vectors()
+            centroids = spherical_kmeans(
+                data, n_lists, n_iter=n_iter,
+                max_train_points=n_lists * TRAIN_POINTS_PER_LIST, seed=seed,
+            )
+            self._lists[:n] = assign_lists(data, centroids)
+            self._centroids = centroids
+            return len(centroids)
+
+    def _filter_mask(self, category, ward, since_ms, until_ms, exclude_ids, lists):
+        """Boolean mask of rows passing the filters, or None if unfiltered."""
+        n = self._size
+        mask = None
+
+        def narrow(condition):
+            nonlocal mask
+            mask = condition if mask is None else (mask & condition)
+
+        if lists is not None:
+            probed = np.zeros(len(self._centroids) + 1, dtype=bool)
+            probed[lists] = True
+            narrow(probed[self._lists[:n]])
+        if category is not None:
+            narrow(self._categories[:n] == self._category_vocab.lookup(category))
+        if ward is not None:
+            narrow(self._wards[:n] == self._ward_vocab.lookup(ward))
+        if since_ms is not None:
+            narrow(self._created_at[:n] >= since_ms)
+        if until_ms is not None:
+            narrow(self._created_at[:n] < until_ms)
+        if exclude_ids:
+            rows = [self._row_of[i] for i in exclude_ids if i in self._row_of]
+            if rows:
+                if mask is None:
+                    mask = np.ones(n, dtype=bool)
+                mask[rows] = False
+        return mask
+
+    def search(self, query, k=10, category=None, ward=None, since_ms=None,
+               until_ms=None, exclude_ids=None, min_score=None, nprobe=None, exact=None):
+        """
+        Top-k cosine search with filters applied inside the index.
+
+        Args:
+            query: Query embedding, shape (dim,)
+            k: Number of results
+            category / ward: Exact label filters
+            since_ms / until_ms: createdAt window [since, until) in epoch ms
+            exclude_ids: Complaint ids to skip (e.g. the complaint itself)
+            min_score: Drop results below this cosine similarity
+            nprobe: IVF lists to probe (defaults to the index setting)
+            exact: Force brute-force search even when IVF is trained
+
+        Returns:
+            List of dicts (id, score, category, ward, createdAt), best first
+        """
+        query = _normalize_rows(query)[0]
+        with self._lock:
+            lists = None
+            use_ann = self._centroids is not None and not exact and (self.mode == "ivf" or nprobe)
+            if use_ann:
+                lists = probe_lists(query, self._centroids, nprobe or self.nprobe)
+
+            mask = self._filter_mask(category, ward, since_ms, until_ms, exclude_ids, lists)
+            rows = None if mask is None else np.flatnonzero(mask)
+            scores = self._score(rows, query)
+
+            if min_score is not None:
+                keep = np.flatnonzero(scores >= min_score)
+                scores = scores[keep]
+                rows = keep if rows is None else rows[keep]
+
+            k = min(k, len(scores))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            result_rows = top if rows is None else rows[top]
+
+            return [
+                {
+                    "id": self._ids[row],
+                    "score": float(scores[i]),
+                    "category": self._category_vocab.labels[self._categories[row]],
+                    "ward": self._ward_vocab.labels[self._wards[row]],
+                    "createdAt": int(self._created_at[row]),
+                }
+                for i, row in zip(top, result_rows)
+            ]
+
+    def stats(self):
+        with self._lock:
+            n = self._size
+            if self.storage == "int8":
+                memory = self._codes[:n].nbytes + self._scales[:n].nbytes
+            else:
+                memory = self._vectors[:n].nbytes
+            stats = {
+                "count": n,
+                "dim": self.dim,
+                "capacity": int(self._ids.shape[0]),
+                "categories": len(self._category_vocab.labels),
+                "wards": len(self._ward_vocab.labels),
+                "storage": self.storage,
+                "mode": self.mode,
+                "memoryBytes": int(memory),
+                "annTrained": self.ann_trained,
+                "backfilled": self.backfilled,
+                "unsavedChanges": self.unsaved_changes,
+            }
+            if self._centroids is not None:
+                list_sizes = np.bincount(self._lists[:n], minlength=len(self._centroids))
+                stats.update({
+                    "nLists": len(self._centroids),
+                    "nprobe": self.nprobe,
+                    "maxListSize": int(list_sizes.max()) if n else 0,
+                })
+            return stats
+
+    def save(self, path):
+        """
+        Persist the index to a .npz file (written atomically). The rows are
+        copied under the lock and written outside it, so searches and
+        upserts only wait for the copy.
+        """
+        with self._save_lock:
+            with self._lock:
+                n = self._size
+                arrays = {
+                    "ids": np.array(self._ids[:n].tolist(), dtype=str),
+                    "categories": self._categories[:n].copy(),
+                    "wards": self._wards[:n].copy(),
+                    "created_at": self._created_at[:n].copy(),
+                    "category_labels": np.array(self._category_vocab.labels, dtype=str),
+                    "ward_labels": np.array(self._ward_vocab.labels, dtype=str),
+                    "backfilled": np.array(self.backfilled),
+                }
+                if self.storage == "int8":
+                    arrays["codes"] = self._codes[:n].copy()
+                    arrays["scales"] = self._scales[:n].copy()
+                else:
+                    arrays["vectors"] = self._vectors[:n].copy()
+                if self._centroids is not None:
+                    arrays["centroids"] = self._centroids
+                changes = self.changes
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, path)
+            self.saved_changes = changes
+
+    @classmethod
+    def load(cls, path, **settings):
+        """Load an index written by save(); settings override the defaults."""
+        data = np.load(path, allow_pickle=False)
+        if "codes" in data:
+            vectors = dequantize_int8(data["codes"], data["scales"])
+        else:
+            vectors = data["vectors"]
+        index = cls(vectors.shape[1], initial_capacity=max(len(vectors), 1024), **settings)
+        if "centroids" in data:
+            index._centroids = data["centroids"]
+        category_labels = data["category_labels"].tolist()
+        ward_labels = data["ward_labels"].tolist()
+        index.upsert(
+            data["ids"].tolist(),
+            vectors,
+            [category_labels[c] for c in data["categories"]],
+            [ward_labels[w] for w in data["wards"]],
+            data["created_at"],
+        )
+        # Indexes saved before the flag existed count as not backfilled
+        index.backfilled = bool(data["backfilled"]) if "backfilled" in data else False
+        index.changes = index.saved_changes = 0
+        return index
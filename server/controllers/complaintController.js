@@ -1,6 +1,8 @@
 import Complaint from "../models/Complaint.js";
-import { predictComplaint } from "../services/aiService.js";
+import { predictComplaint, recordComplaintAnalytics } from "../services/aiService.js";
 import { evaluateConfidence } from "../services/confidenceGovernance.js";
+import { syncResolvedIndex } from "../embeddings/embeddingService.js";
+import { isResolvedIndexReadOnly, markResolvedIndexStale } from "../embeddings/similarityService.js";
 
 /**
  * =======================================
@@ -163,6 +165,11 @@ export const createComplaint = async (req, res) => {
       createdAt: now,
     });
 
+    // Keep the AI service's analytics cube current (non-blocking, advisory only)
+    recordComplaintAnalytics(complaint).catch((error) => {
+      console.error("⚠️ Analytics cube update failed:", error.message);
+    });
+
     return res.status(201).json({
       success: true,
       complaint,
@@ -303,6 +310,15 @@ export const updateComplaintStatus = async (req, res) => {
       });
     }
 
+    // Keep the repeat-detection vector index in step (non-blocking, advisory only;
+    // a read-only index is covered by comparing against recent complaints)
+    if (!isResolvedIndexReadOnly()) {
+      syncResolvedIndex(updatedComplaint).catch((error) => {
+        markResolvedIndexStale();
+        console.error("⚠️ Vector index sync failed:", error.message);
+      });
+    }
+
     return res.json({
       success: true,
       complaint: updatedComplaint,
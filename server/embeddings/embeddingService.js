@@ -54,3 +54,158 @@ export const generateEmbedding = async (text) => {
     );
   }
 };
+
+const EMBEDDING_BATCH_SERVICE_URL = `${getAiBaseUrl()}/embed/batch`;
+
+/**
+ * Generate embedding vectors for many texts in ONE request
+ *
+ * The AI service encodes the whole batch in a single forward pass and
+ * returns the vectors as a packed float32 matrix (base64).
+ *
+ * @param {string[]} texts
+ * @returns {Promise<Float32Array[]>} One vector per input text, in order
+ */
+export const generateEmbeddings = async (texts) => {
+  try {
+    if (
+      !Array.isArray(texts) ||
+      texts.some((t) => !t || typeof t !== "string" || t.trim().length === 0)
+    ) {
+      throw new Error("Texts must be an array of non-empty strings");
+    }
+
+    if (texts.length === 0) return [];
+
+    const response = await axios.post(
+      EMBEDDING_BATCH_SERVICE_URL,
+      { texts: texts.map((t) => t.trim()), format: "base64" },
+      { timeout: 10000 }
+    );
+
+    const { count, dim, data } = response.data || {};
+    if (count !== texts.length || !dim || typeof data !== "string") {
+      throw new Error("Invalid batch embedding response");
+    }
+
+    // Copy into an aligned buffer before viewing it as float32
+    const bytes = Buffer.from(data, "base64");
+    const matrix = new Float32Array(
+      bytes.buffer.slice(bytes.byteOffset, bytes.byteOffset + bytes.byteLength)
+    );
+
+    const vectors = [];
+    for (let i = 0; i < count; i++) {
+      vectors.push(matrix.subarray(i * dim, (i + 1) * dim));
+    }
+    return vectors;
+  } catch (error) {
+    console.error("❌ Embedding service error:", error.message);
+    throw new Error(
+      "Semantic analysis service is currently unavailable. Please try later."
+    );
+  }
+};
+
+/**
+ * RESOLVED COMPLAINT VECTOR INDEX (AI service)
+ *
+ * Resolved complaints are indexed in the AI service so repeat-pattern
+ * lookups can search the whole historical window, not just recent records.
+ */
+
+const INDEX_UPSERT_BATCH_SIZE = 256;
+
+/**
+ * Text used to embed a stored complaint (title + description)
+ *
+ * @param {{title?: string, description?: string}} complaint
+ * @returns {string}
+ */
+export const buildComplaintText = (complaint) =>
+  `${complaint.title || ""} ${complaint.description || ""}`.toLowerCase().trim();
+
+/**
+ * Add or replace resolved complaints in the vector index
+ *
+ * @param {Array} complaints - Complaint documents
+ * @returns {Promise<number>} Number of complaints sent
+ */
+export const upsertResolvedComplaints = async (complaints) => {
+  const items = complaints
+    .map((c) => ({
+      id: c._id.toString(),
+      text: buildComplaintText(c),
+      category: c.category,
+      ward: c.ward,
+      createdAt: c.createdAt,
+    }))
+    .filter((item) => item.text.length > 0);
+
+  for (let i = 0; i < items.length; i += INDEX_UPSERT_BATCH_SIZE) {
+    await axios.post(
+      `${getAiBaseUrl()}/index/upsert`,
+      { items: items.slice(i, i + INDEX_UPSERT_BATCH_SIZE) },
+      { timeout: 30000 }
+    );
+  }
+  return items.length;
+};
+
+/**
+ * Keep the index in step with a complaint's status:
+ * Resolved complaints are indexed, any other status is removed.
+ *
+ * @param {Object} complaint - Complaint document
+ */
+export const syncResolvedIndex = async (complaint) => {
+  if (complaint.status === "Resolved") {
+    await upsertResolvedComplaints([complaint]);
+  } else {
+    await axios.post(
+      `${getAiBaseUrl()}/index/delete`,
+      { ids: [complaint._id.toString()] },
+      { timeout: 10000 }
+    );
+  }
+};
+
+/**
+ * Mark the index as backfilled (every resolved complaint in the window
+ * has been upserted), so searches stop falling back to recent records
+ */
+export const markResolvedIndexBackfilled = async () => {
+  await axios.post(`${getAiBaseUrl()}/index/backfilled`, {}, { timeout: 30000 });
+};
+
+/**
+ * Top-k semantic search over indexed resolved complaints
+ *
+ * @param {Object} params
+ * @param {string} params.text
+ * @param {number} params.k
+ * @param {string|null} params.category
+ * @param {Date} params.since
+ * @param {string[]} params.excludeIds
+ * @param {number} params.minScore
+ * @returns {Promise<{indexedCount: number, backfilled: boolean, readOnly: boolean, results: Array}>}
+ */
+export const searchResolvedIndex = async ({
+  text,
+  k,
+  category = null,
+  since = null,
+  excludeIds = [],
+  minScore = null,
+}) => {
+  const response = await axios.post(
+    `${getAiBaseUrl()}/search`,
+    { text: text.trim(), k, category, since, excludeIds, minScore },
+    { timeout: 10000 }
+  );
+
+  if (!response.data || !Array.isArray(response.data.results)) {
+    throw new Error("Invalid search response");
+  }
+  return response.data;
+};
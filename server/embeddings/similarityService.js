@@ -1,5 +1,11 @@
 import Complaint from "../models/Complaint.js";
-import { generateEmbedding } from "./embeddingService.js";
+import {
+  buildComplaintText,
+  generateEmbeddings,
+  markResolvedIndexBackfilled,
+  searchResolvedIndex,
+  upsertResolvedComplaints,
+} from "./embeddingService.js";
 
 /**
  * PHASE-2 ADVISORY SIMILARITY SERVICE (GOVERNMENT-GRADE)
@@ -20,8 +26,12 @@ const SEMANTIC_MIN_THRESHOLD = 0.60;
 const SEMANTIC_STRONG_THRESHOLD = 0.75;
 
 const MAX_COMPARISONS = 20;
+const MAX_INDEX_RESULTS = 50;
 const HISTORICAL_WINDOW_MS = 6 * 30 * 24 * 60 * 60 * 1000;
 
+// Wait this long before retrying a failed index backfill
+const BACKFILL_RETRY_MS = 5 * 60 * 1000;
+
 /**
  * Category-specific anchor keywords
  * (Explainable rule layer)
@@ -64,18 +74,168 @@ const cosineSimilarity = (a, b) => {
 };
 
 /**
- * Find semantically similar resolved complaints (ADVISORY)
+ * Candidate eligibility checks shared by the index and recent-records paths
+ */
+const isEligibleCandidate = (complaint, predictedCategory, excludeComplaintId) => {
+  // Defensive self-check
+  if (
+    excludeComplaintId &&
+    complaint._id.toString() === excludeComplaintId.toString()
+  ) {
+    return false;
+  }
+
+  // ENHANCEMENT #3: False Positive Reduction - Category Mismatch Protection
+  // If category is provided, ensure it matches before proceeding
+  // This prevents false positives from category-only matches with weak semantic similarity
+  if (predictedCategory && complaint.category !== predictedCategory) {
+    return false;
+  }
+
+  return true;
+};
+
+/**
+ * RESOLVED COMPLAINT INDEX BACKFILL
  *
- * SINGLE SOURCE OF TRUTH
+ * The AI-service index only answers for the whole window once every
+ * resolved complaint has been upserted (it reports backfilled=false
+ * until then, e.g. after a restart without a saved index). A missed
+ * status sync also leaves it stale. Either way a backfill is started
+ * in the background, at most one at a time.
+ *
+ * Under a multi-worker AI service (scripts/serve.py) the index is
+ * read-only: it reports readOnly=true and rejects writes with 409. No
+ * backfill or sync is attempted then, and its hits are merged with the
+ * most recent resolved complaints, which it does not contain.
  */
-export const findSimilarResolvedComplaints = async (
+let backfillInFlight = null;
+let lastBackfillFailure = 0;
+let indexStale = false;
+let indexReadOnly = false;
+
+/**
+ * Upsert every resolved complaint in the window, then mark the index backfilled
+ *
+ * @returns {Promise<number>} Number of complaints sent
+ */
+export const backfillResolvedIndex = async () => {
+  // Syncs that fail from here on mark the index stale again
+  indexStale = false;
+  const sinceDate = new Date(Date.now() - HISTORICAL_WINDOW_MS);
+  const complaints = await Complaint.find({
+    status: "Resolved",
+    createdAt: { $gte: sinceDate },
+  }).select("_id title description category ward createdAt");
+
+  const sent = await upsertResolvedComplaints(complaints);
+  await markResolvedIndexBackfilled();
+  return sent;
+};
+
+/**
+ * Start a background backfill unless one is running or one failed recently
+ */
+export const ensureResolvedIndex = () => {
+  if (indexReadOnly) return null;
+  if (backfillInFlight) return backfillInFlight;
+  if (Date.now() - lastBackfillFailure < BACKFILL_RETRY_MS) return null;
+
+  backfillInFlight = backfillResolvedIndex()
+    .then((sent) => console.log(`✅ Vector index backfilled with ${sent} resolved complaints`))
+    .catch((error) => {
+      if (error.response?.status === 409) {
+        indexReadOnly = true;
+        console.log("ℹ️ Vector index is read-only (multi-worker AI service); merging with recent complaints");
+        return;
+      }
+      indexStale = true;
+      lastBackfillFailure = Date.now();
+      console.error("⚠️ Vector index backfill failed:", error.message);
+    })
+    .finally(() => {
+      backfillInFlight = null;
+    });
+  return backfillInFlight;
+};
+
+/**
+ * Record that a status change did not reach the index
+ */
+export const markResolvedIndexStale = () => {
+  indexStale = true;
+};
+
+/**
+ * True once the AI service reported a read-only index (status syncs are skipped)
+ */
+export const isResolvedIndexReadOnly = () => indexReadOnly;
+
+/**
+ * Candidates from the AI-service vector index (whole historical window)
+ *
+ * Returns null when the index is unavailable or not backfilled yet, so
+ * the caller can fall back to comparing against the most recent
+ * resolved complaints; otherwise { candidates, readOnly } (a read-only
+ * index misses complaints resolved since it was saved).
+ */
+const findIndexedCandidates = async (
   description,
-  ward = null,
-  predictedCategory = null,
-  excludeComplaintId = null
+  predictedCategory,
+  excludeComplaintId,
+  sinceDate
 ) => {
-  const sinceDate = new Date(Date.now() - HISTORICAL_WINDOW_MS);
+  let search;
+  try {
+    search = await searchResolvedIndex({
+      text: description,
+      k: MAX_INDEX_RESULTS,
+      category: predictedCategory,
+      since: sinceDate,
+      excludeIds: excludeComplaintId ? [excludeComplaintId.toString()] : [],
+      minScore: SEMANTIC_MIN_THRESHOLD,
+    });
+  } catch (error) {
+    console.error("⚠️ Vector index unavailable, using recent complaints:", error.message);
+    return null;
+  }
+
+  indexReadOnly = Boolean(search.readOnly);
+  if (!search.backfilled || indexStale) ensureResolvedIndex();
+  // An index holding only what was upserted since a restart would hide older history
+  if (!search.backfilled) return null;
+  if (search.results.length === 0) return { candidates: [], readOnly: indexReadOnly };
+
+  const scores = new Map(search.results.map((r) => [r.id, r.score]));
 
+  // AUDIT CHECK #2: Complaint set validation
+  // Re-check status and window against the database (the index may lag behind)
+  const complaints = await Complaint.find({
+    _id: { $in: [...scores.keys()] },
+    status: "Resolved",
+    createdAt: { $gte: sinceDate },
+  }).select("_id title description category ward createdAt");
+
+  const candidates = complaints
+    .filter((c) => isEligibleCandidate(c, predictedCategory, excludeComplaintId))
+    .map((complaint) => ({
+      complaint,
+      complaintText: buildComplaintText(complaint),
+      similarity: scores.get(complaint._id.toString()),
+    }))
+    .filter((c) => c.complaintText);
+  return { candidates, readOnly: indexReadOnly };
+};
+
+/**
+ * Candidates from the MAX_COMPARISONS most recent resolved complaints
+ */
+const findRecentCandidates = async (
+  description,
+  predictedCategory,
+  excludeComplaintId,
+  sinceDate
+) => {
   // AUDIT CHECK #2: Complaint set validation
   // CRITICAL: Only compare against RESOLVED complaints
   // NEW and IN-PROGRESS complaints are excluded to prevent false positives
@@ -101,44 +261,10 @@ export const findSimilarResolvedComplaints = async (
     .sort({ createdAt: -1 })
     .limit(MAX_COMPARISONS);
 
-  if (resolvedComplaints.length === 0) {
-    return { isRepeatPattern: false, similarComplaints: [] };
-  }
-
-  // ENHANCEMENT #1: Semantic Stability
-  // Cache embeddings within request scope to avoid unnecessary regeneration
-  // This improves performance and ensures consistent embeddings for the same text
-  const embeddingCache = new Map();
-
-  // Input text processing: description is primary semantic signal
-  // Note: If title was included in description parameter, it's already combined
-  // This ensures consistency: we compare input (description or title+description) 
-  // against resolved complaints (title + description)
-  const inputText = description.toLowerCase();
-  
-  // Generate input embedding once and cache it
-  const inputEmbeddingKey = `input:${description}`;
-  let inputEmbedding = embeddingCache.get(inputEmbeddingKey);
-  if (!inputEmbedding) {
-    inputEmbedding = await generateEmbedding(description);
-    embeddingCache.set(inputEmbeddingKey, inputEmbedding);
-  }
-
-  const matches = [];
+  const candidates = [];
 
   for (const complaint of resolvedComplaints) {
-    // Defensive self-check
-    if (
-      excludeComplaintId &&
-      complaint._id.toString() === excludeComplaintId.toString()
-    ) {
-      continue;
-    }
-
-    // ENHANCEMENT #3: False Positive Reduction - Category Mismatch Protection
-    // If category is provided, ensure it matches before proceeding
-    // This prevents false positives from category-only matches with weak semantic similarity
-    if (predictedCategory && complaint.category !== predictedCategory) {
+    if (!isEligibleCandidate(complaint, predictedCategory, excludeComplaintId)) {
       continue;
     }
 
@@ -146,24 +272,77 @@ export const findSimilarResolvedComplaints = async (
     // Use BOTH title and description for comparison (description is primary semantic signal)
     // This ensures comprehensive semantic matching against historical complaints
     // Title provides context, description provides detailed semantic meaning
-    const complaintText = `${complaint.title || ""} ${complaint.description || ""}`
-      .toLowerCase()
-      .trim();
+    const complaintText = buildComplaintText(complaint);
 
     // Defensive check: Skip if complaint has no text content
     if (!complaintText) continue;
 
-    // ENHANCEMENT #1: Semantic Stability - Reuse cached embeddings
-    // Generate embedding only if not already cached
-    const complaintEmbeddingKey = `complaint:${complaint._id.toString()}:${complaintText}`;
-    let complaintEmbedding = embeddingCache.get(complaintEmbeddingKey);
-    if (!complaintEmbedding) {
-      complaintEmbedding = await generateEmbedding(complaintText);
-      embeddingCache.set(complaintEmbeddingKey, complaintEmbedding);
-    }
+    candidates.push({ complaint, complaintText });
+  }
 
-    const similarity = cosineSimilarity(inputEmbedding, complaintEmbedding);
+  if (candidates.length === 0) return [];
+
+  // ENHANCEMENT #1: Semantic Stability
+  // Embed the input and every candidate in ONE batch request
+  // (one round-trip and one encoder pass instead of one call per complaint)
+  const [inputEmbedding, ...candidateEmbeddings] = await generateEmbeddings([
+    description,
+    ...candidates.map((c) => c.complaintText),
+  ]);
+
+  return candidates.map((c, i) => ({
+    ...c,
+    similarity: cosineSimilarity(inputEmbedding, candidateEmbeddings[i]),
+  }));
+};
+
+/**
+ * Find semantically similar resolved complaints (ADVISORY)
+ *
+ * SINGLE SOURCE OF TRUTH
+ */
+export const findSimilarResolvedComplaints = async (
+  description,
+  ward = null,
+  predictedCategory = null,
+  excludeComplaintId = null
+) => {
+  const sinceDate = new Date(Date.now() - HISTORICAL_WINDOW_MS);
+
+  // Prefer the vector index (searches the whole window); fall back to
+  // the most recent resolved complaints when the index is not available,
+  // and add them to the hits of a read-only index (which lacks them)
+  const indexed = await findIndexedCandidates(
+    description,
+    predictedCategory,
+    excludeComplaintId,
+    sinceDate
+  );
+  let candidates = indexed ? indexed.candidates : [];
+  if (indexed === null || indexed.readOnly) {
+    const recent = await findRecentCandidates(
+      description,
+      predictedCategory,
+      excludeComplaintId,
+      sinceDate
+    );
+    const seen = new Set(candidates.map((c) => c.complaint._id.toString()));
+    candidates = candidates.concat(recent.filter((c) => !seen.has(c.complaint._id.toString())));
+  }
+
+  if (candidates.length === 0) {
+    return { isRepeatPattern: false, similarComplaints: [] };
+  }
+
+  // Input text processing: description is primary semantic signal
+  // Note: If title was included in description parameter, it's already combined
+  // This ensures consistency: we compare input (description or title+description) 
+  // against resolved complaints (title + description)
+  const inputText = description.toLowerCase();
+
+  const matches = [];
 
+  for (const { complaint, complaintText, similarity } of candidates) {
     // ENHANCEMENT #3: False Positive Reduction - Strict Semantic Requirement
     // AUDIT CHECK #3: Semantic priority enforcement
     // PRIMARY SIGNAL: Semantic similarity (MANDATORY - hard requirement)
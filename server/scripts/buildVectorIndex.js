@@ -0,0 +1,33 @@
+import mongoose from "mongoose";
+import dotenv from "dotenv";
+import { backfillResolvedIndex } from "../embeddings/similarityService.js";
+
+dotenv.config();
+
+const MONGO_URI = process.env.MONGO_URI;
+
+if (!MONGO_URI) {
+  console.error("❌ MONGO_URI missing in .env");
+  process.exit(1);
+}
+
+// The server also runs this backfill on startup and whenever the AI
+// service reports an index that is not backfilled
+async function buildVectorIndex() {
+  try {
+    console.log("🔌 Connecting to MongoDB...");
+    await mongoose.connect(MONGO_URI);
+
+    console.log("📦 Indexing resolved complaints from the repeat-detection window...");
+    const sent = await backfillResolvedIndex();
+
+    console.log(`✅ Indexed ${sent} resolved complaints`);
+  } catch (error) {
+    console.error("❌ Index build failed:", error.message);
+  } finally {
+    await mongoose.disconnect();
+    console.log("🔌 MongoDB connection closed");
+  }
+}
+
+buildVectorIndex();
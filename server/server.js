@@ -15,6 +15,7 @@ import alertRoutes from "./routes/alertRoutes.js";
 import embeddingRoutes from "./embeddings/embeddingRoutes.js";
 import wardRouter from "./routes/wardRoutes.js";
 import { getCities } from "./controllers/wardController.js";
+import { ensureResolvedIndex } from "./embeddings/similarityService.js";
 
 
 const app = express();
@@ -46,4 +47,7 @@ connectDB().then(() => {
   app.listen(PORT, () => {
     console.log(`Server is running on PORT: ${PORT}`);
   });
+
+  // Backfill the repeat-detection vector index if the AI service lost it (advisory, non-blocking)
+  ensureResolvedIndex();
 });
@@ -11,3 +11,36 @@ export const predictComplaint = async (text) => {
   );
   return response.data;
 };
+
+const getAiBaseUrl = () => {
+  try {
+    return new URL(AI_SERVICE_URL).origin;
+  } catch {
+    return "http://127.0.0.1:8000";
+  }
+};
+
+/**
+ * Count a new complaint in the AI service's spike / hotspot cube
+ * (/analytics/complaints), which is rebuilt from an export and then kept
+ * current from here
+ *
+ * @param {Object} complaint - Saved complaint document
+ */
+export const recordComplaintAnalytics = async (complaint) => {
+  await axios.post(
+    `${getAiBaseUrl()}/analytics/complaints`,
+    {
+      items: [
+        {
+          id: complaint._id.toString(),
+          ward: complaint.ward ?? null,
+          category: complaint.category ?? null,
+          priority: complaint.priority ?? null,
+          createdAt: complaint.createdAt,
+        },
+      ],
+    },
+    { timeout: 10000 }
+  );
+};